@@ -1,39 +1,71 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from bson.objectid import ObjectId
 
 from app.core.config import settings
-from app.core.security import verify_password
+from app.core.events import EVENTS_TOKEN_SCOPE
+from app.core.security import verify_token
 from app.db.database import get_database
+from app.db.repositories.users import UserRepository
+from app.db.user_cache import get_cached_user, cache_user
 from app.models.user import TokenData
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    """Obtener usuario actual a partir del token JWT"""
+async def _user_from_token(token: str, scope: Optional[str] = None):
+    """Usuario del token JWT; el `scope` del token debe coincidir (None = token de sesión)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id)
-    except JWTError:
+    payload = verify_token(token)
+    if payload is None or payload.get("scope") != scope:
+        raise credentials_exception
+    user_id: str = payload.get("sub")
+    if user_id is None:
+        raise credentials_exception
+    token_data = TokenData(user_id=user_id)
+    if not ObjectId.is_valid(token_data.user_id):
         raise credentials_exception
     
-    db = get_database()
-    user = await db.users.find_one({"_id": ObjectId(token_data.user_id)})
+    # Cache en proceso: la mayoría de peticiones no necesitan ir a MongoDB
+    user = get_cached_user(token_data.user_id)
+    if user is not None:
+        return user
+
+    # Solo los campos de perfil (sin contraseña ni quizResponses)
+    user = await UserRepository(get_database()).get_profile(token_data.user_id)
     if user is None:
         raise credentials_exception
+    cache_user(token_data.user_id, user)
     return user
 
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """Obtener usuario actual a partir del token JWT"""
+    return await _user_from_token(token)
+
+async def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+):
+    """
+    Usuario de una conexión de streaming. EventSource no permite cabeceras, así que en la
+    URL se acepta solo el token de corta duración de POST /api/events/token, nunca el de sesión
+    """
+    if token is not None:
+        return await _user_from_token(token)
+    if access_token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No se pudo validar las credenciales",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await _user_from_token(access_token, scope=EVENTS_TOKEN_SCOPE)
+
 async def get_current_active_user(current_user = Depends(get_current_user)):
     """Verificar si el usuario está activo"""
     # Aquí podrías añadir lógica para verificar si un usuario está activo
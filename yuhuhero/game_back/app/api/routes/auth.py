@@ -3,8 +3,10 @@ from fastapi.security import OAuth2PasswordRequestForm
 from bson.objectid import ObjectId
 from datetime import datetime
 
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import verify_password_async, get_password_hash_async, create_access_token
 from app.db.database import get_database
+from app.db.repositories.users import UserRepository, profile_view
+from app.db.user_cache import cache_user
 from app.models.user import UserCreate, Token, UserResponse
 
 router = APIRouter()
@@ -12,17 +14,17 @@ router = APIRouter()
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(user_data: UserCreate):
     """Registrar un nuevo usuario"""
-    db = get_database()
+    users = UserRepository(get_database())
     
     # Verificar si el teléfono ya está registrado
-    if await db.users.find_one({"phone": user_data.phone}):
+    if await users.phone_exists(user_data.phone):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El número de teléfono ya está registrado",
         )
     
     # Crear usuario
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = {
         "name": user_data.name,
         "phone": user_data.phone,
@@ -32,27 +34,25 @@ async def register_user(user_data: UserCreate):
         "created_at": datetime.utcnow()
     }
     
-    result = await db.users.insert_one(new_user)
+    inserted_id = await users.create(new_user)
     
-    # Obtener el usuario creado
-    created_user = await db.users.find_one({"_id": result.inserted_id})
+    # La respuesta se construye con lo insertado, sin releer el documento
+    cache_user(str(inserted_id), profile_view(new_user))
     
     return {
-        "id": str(created_user["_id"]),
-        "name": created_user["name"],
-        "phone": created_user["phone"],
-        "quizCompleted": created_user["quizCompleted"],
-        "created_at": created_user["created_at"]
+        "id": str(inserted_id),
+        "name": new_user["name"],
+        "phone": new_user["phone"],
+        "quizCompleted": new_user["quizCompleted"],
+        "created_at": new_user["created_at"]
     }
 
 @router.post("/login", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """Obtener token de acceso"""
-    db = get_database()
-    
-    # Buscar usuario por teléfono
-    user = await db.users.find_one({"phone": form_data.username})
-    if not user or not verify_password(form_data.password, user["password"]):
+    # Buscar usuario por teléfono (solo _id, teléfono y hash)
+    user = await UserRepository(get_database()).get_credentials(form_data.username)
+    if not user or not await verify_password_async(form_data.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Teléfono o contraseña incorrectos",
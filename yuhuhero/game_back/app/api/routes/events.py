@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.dependencies import get_current_user, get_stream_user
+from app.core.config import settings
+from app.core.events import EVENTS_TOKEN_SCOPE, stream_events
+from app.core.security import create_access_token
+
+router = APIRouter()
+
+@router.get("")
+async def get_events(request: Request, current_user = Depends(get_stream_user)):
+    """Canal SSE con los eventos del usuario (notificaciones y progreso), en lugar de consultar periódicamente"""
+    return StreamingResponse(
+        stream_events(request, str(current_user["_id"])),
+        media_type="text/event-stream",
+        # Sin buffering en proxies (nginx) para que cada evento llegue al momento
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/token")
+async def create_events_token(current_user = Depends(get_current_user)):
+    """Token de corta duración para abrir el canal con ?access_token= (solo sirve para el canal)"""
+    access_token = create_access_token(
+        subject=str(current_user["_id"]),
+        expires_delta=timedelta(seconds=settings.EVENTS_TOKEN_EXPIRE_SECONDS),
+        data={"scope": EVENTS_TOKEN_SCOPE},
+    )
+    return {"access_token": access_token, "token_type": "bearer", "expires_in": settings.EVENTS_TOKEN_EXPIRE_SECONDS}
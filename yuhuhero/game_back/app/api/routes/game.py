@@ -1,20 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import Dict, Any, Literal
 from bson.objectid import ObjectId
 
 from app.api.dependencies import get_current_user
+from app.core.catalog import catalog_response, encode_catalog
 from app.db.database import get_database
+from app.db.game_map_store import game_map_store
+from app.db.leaderboard import leaderboard
+from app.db.level_bits import UnknownLevelError, compact_levels, level_index
+from app.db.repositories.leaderboard import LeaderboardRepository
+from app.db.repositories.progress import ProgressRepository
 from app.models.game import GameProgressUpdate
 
 router = APIRouter()
 
+LevelsFormat = Literal["list", "compact"]
+
+async def _progress_response(progress: Dict[str, Any], levels: str) -> Dict[str, Any]:
+    """Respuesta de progreso con los niveles como lista o como bitset en base64"""
+    response = {
+        "current_level": progress["current_level"],
+        "coins": progress["coins"],
+        "version": progress.get("version", 0),
+    }
+    if levels == "compact":
+        response["completed_levels_bits"] = await compact_levels(get_database(), progress["completed_levels"])
+    else:
+        response["completed_levels"] = progress["completed_levels"]
+    return response
+
 @router.get("/progress")
-async def get_game_progress(current_user = Depends(get_current_user)):
+async def get_game_progress(levels: LevelsFormat = "list", current_user = Depends(get_current_user)):
     """Obtener el progreso del juego para el usuario actual"""
-    db = get_database()
+    progress_repository = ProgressRepository(get_database())
     
     # Buscar progreso existente
-    progress = await db.game_progress.find_one({"user_id": str(current_user["_id"])})
+    progress = await progress_repository.get(str(current_user["_id"]))
     
     # Si no existe, crear uno nuevo
     if not progress:
@@ -25,121 +46,72 @@ async def get_game_progress(current_user = Depends(get_current_user)):
             "completed_levels": []
         }
         
-        result = await db.game_progress.insert_one(progress_data)
-        progress = await db.game_progress.find_one({"_id": result.inserted_id})
+        # Solo se inserta si sigue sin existir: un PUT concurrente no se pisa
+        progress = await progress_repository.seed(str(current_user["_id"]), progress_data)
     
-    return {
-        "current_level": progress["current_level"],
-        "coins": progress["coins"],
-        "completed_levels": progress["completed_levels"]
-    }
+    return await _progress_response(progress, levels)
+
+@router.get("/progress/changes")
+async def get_game_progress_changes(since: int = Query(..., ge=0), current_user = Depends(get_current_user)):
+    """Solo los campos y niveles que cambiaron desde la versión `since`; 304 si no hay cambios"""
+    changes = await ProgressRepository(get_database()).changes_since(str(current_user["_id"]), since)
+    if changes is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    return changes
 
 @router.put("/progress")
 async def update_game_progress(
     progress_update: GameProgressUpdate,
+    levels: LevelsFormat = "list",
     current_user = Depends(get_current_user)
 ):
     """Actualizar el progreso del juego para el usuario actual"""
-    db = get_database()
-    
-    # Preparar los campos a actualizar
-    update_data = {}
-    if progress_update.current_level is not None:
-        update_data["current_level"] = progress_update.current_level
-    if progress_update.coins is not None:
-        update_data["coins"] = progress_update.coins
-    if progress_update.completed_levels is not None:
-        update_data["completed_levels"] = progress_update.completed_levels
+    progress_repository = ProgressRepository(get_database())
     
-    if not update_data:
+    if (
+        progress_update.current_level is None
+        and progress_update.coins is None
+        and progress_update.completed_levels is None
+    ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No se proporcionaron datos para actualizar"
         )
     
-    # Buscar y actualizar progreso
-    await db.game_progress.update_one(
-        {"user_id": str(current_user["_id"])},
-        {"$set": update_data},
-        upsert=True
-    )
-    
-    # Obtener progreso actualizado
-    progress = await db.game_progress.find_one({"user_id": str(current_user["_id"])})
+    # Actualizar y obtener el progreso resultante en una sola operación
+    try:
+        progress = await progress_repository.apply_update(
+            str(current_user["_id"]),
+            set_level=progress_update.current_level,
+            set_coins=progress_update.coins,
+            set_completed_levels=progress_update.completed_levels
+        )
+    except UnknownLevelError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    return {
-        "current_level": progress["current_level"],
-        "coins": progress["coins"],
-        "completed_levels": progress["completed_levels"]
-    }
+    return await _progress_response(progress, levels)
+
+@router.get("/levels/index")
+async def get_level_index(request: Request, current_user = Depends(get_current_user)):
+    """Posición de cada casilla en el bitset de niveles (para decodificar ?levels=compact)"""
+    return catalog_response(request, encode_catalog(await level_index.load(get_database())))
 
 @router.get("/map")
-async def get_game_map(current_user = Depends(get_current_user)):
-    """Obtener el mapa del juego"""
-    db = get_database()
-    
-    # Buscar mapa existente
-    game_map = await db.game_maps.find_one({"active": True})
-    
-    # Si no existe, crear uno de ejemplo
-    if not game_map:
-        map_data = {
-            "active": True,
-            "tiles": [
-                {
-                    "id": "tile-1",
-                    "title": "Introducción a Finanzas",
-                    "description": "Aprende los conceptos básicos de finanzas",
-                    "position_x": 0,
-                    "position_y": 0,
-                    "type": "quiz",
-                    "rewards": 50,
-                    "mission_id": "finance-intro"
-                },
-                {
-                    "id": "tile-2",
-                    "title": "Presupuesto Personal",
-                    "description": "Aprende a crear un presupuesto personal",
-                    "position_x": 1,
-                    "position_y": 1,
-                    "type": "lesson",
-                    "rewards": 30,
-                    "mission_id": "personal-budget"
-                },
-                {
-                    "id": "tile-3",
-                    "title": "Ahorro",
-                    "description": "Descubre estrategias de ahorro efectivas",
-                    "position_x": 2,
-                    "position_y": 0,
-                    "type": "challenge",
-                    "rewards": 70,
-                    "mission_id": "saving-strategies"
-                },
-                {
-                    "id": "tile-4",
-                    "title": "Inversión Básica",
-                    "description": "Conoce los fundamentos de la inversión",
-                    "position_x": 3,
-                    "position_y": 1,
-                    "type": "lesson",
-                    "rewards": 40,
-                    "mission_id": "investment-basics"
-                },
-                {
-                    "id": "tile-5",
-                    "title": "Deudas Inteligentes",
-                    "description": "Aprende a manejar tus deudas",
-                    "position_x": 4,
-                    "position_y": 0,
-                    "type": "quiz",
-                    "rewards": 60,
-                    "mission_id": "smart-debt"
-                }
-            ]
-        }
-        
-        result = await db.game_maps.insert_one(map_data)
-        game_map = await db.game_maps.find_one({"_id": result.inserted_id})
-    
-    return {"tiles": game_map["tiles"]} 
\ No newline at end of file
+async def get_game_map(request: Request, current_user = Depends(get_current_user)):
+    """Obtener el mapa del juego (desde memoria, con ETag; 304 si no cambió)"""
+    # El mapa activo se carga una vez por worker y se recarga al cambiar su versión
+    entry = await game_map_store.get_entry(get_database())
+    return catalog_response(request, entry)
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    current_user = Depends(get_current_user)
+):
+    """Mejores jugadores por monedas (consulta cubierta por el índice de monedas)"""
+    return await LeaderboardRepository(get_database()).top(limit)
+
+@router.get("/leaderboard/me")
+async def get_my_rank(current_user = Depends(get_current_user)):
+    """Posición del usuario actual en el ranking por monedas"""
+    return await leaderboard.rank(get_database(), str(current_user["_id"]))
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+
+from app.api.dependencies import get_admin_user
+from app.core.metrics import collect_metrics
+
+router = APIRouter()
+
+@router.get("", response_model=Dict[str, Dict[str, Any]])
+async def get_metrics(current_user = Depends(get_admin_user)):
+    """Obtener estadísticas internas del proceso (solo admin)"""
+    return collect_metrics()
@@ -1,21 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
+from datetime import datetime
 from bson.objectid import ObjectId
 
 from app.api.dependencies import get_current_user, get_admin_user
+from app.db.broadcasts import broadcast_engine
 from app.db.database import get_database
-from app.models.notification import NotificationCreate, NotificationResponse, NotificationUpdate
+from app.db.repositories.notifications import NotificationRepository
+from app.models.notification import (
+    MAX_BULK_IDS, BroadcastCreate, NotificationCreate, NotificationIds, NotificationResponse, NotificationUpdate
+)
 
 router = APIRouter()
 
 @router.get("", response_model=List[NotificationResponse])
-async def get_notifications(current_user = Depends(get_current_user)):
-    """Obtener notificaciones del usuario actual"""
-    db = get_database()
-    
-    notifications = await db.notifications.find(
-        {"user_id": str(current_user["_id"])}
-    ).sort("created_at", -1).to_list(20)  # Últimas 20 notificaciones
+async def get_notifications(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    """Obtener una página de notificaciones; la siguiente se pide con el cursor de X-Next-Cursor"""
+    try:
+        notifications, next_cursor = await NotificationRepository(get_database()).list_page(
+            str(current_user["_id"]), limit, cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return [
         {
@@ -29,34 +42,89 @@ async def get_notifications(current_user = Depends(get_current_user)):
         for notification in notifications
     ]
 
+@router.get("/unread-count")
+async def get_unread_count(current_user = Depends(get_current_user)):
+    """Número de notificaciones no leídas (lectura de un contador, sin recorrer la bandeja)"""
+    return {"unread": await NotificationRepository(get_database()).unread_count(str(current_user["_id"]))}
+
 @router.post("", status_code=status.HTTP_201_CREATED, response_model=NotificationResponse)
 async def create_notification(
     notification: NotificationCreate,
     current_user = Depends(get_admin_user)
 ):
     """Crear una nueva notificación (solo admin)"""
-    db = get_database()
+    notifications = NotificationRepository(get_database())
     
     notification_data = {
         "user_id": notification.user_id,
         "title": notification.title,
         "message": notification.message,
         "type": notification.type,
-        "read": False
+        "read": False,
+        "created_at": datetime.utcnow()
     }
     
-    result = await db.notifications.insert_one(notification_data)
-    created = await db.notifications.find_one({"_id": result.inserted_id})
+    # La respuesta se construye con lo insertado, sin releer el documento
+    inserted_id = await notifications.create(notification_data)
     
     return {
-        "id": str(created["_id"]),
-        "title": created["title"],
-        "message": created["message"],
-        "type": created["type"],
-        "read": created["read"],
-        "created_at": created["created_at"]
+        "id": str(inserted_id),
+        "title": notification_data["title"],
+        "message": notification_data["message"],
+        "type": notification_data["type"],
+        "read": notification_data["read"],
+        "created_at": notification_data["created_at"]
     }
 
+@router.post("/broadcast", status_code=status.HTTP_202_ACCEPTED)
+async def create_broadcast(broadcast: BroadcastCreate, current_user = Depends(get_admin_user)):
+    """Enviar una notificación a todos los usuarios que cumplan el filtro (solo admin, en segundo plano)"""
+    job_id = await broadcast_engine.submit(
+        get_database(),
+        {"title": broadcast.title, "message": broadcast.message, "type": broadcast.type},
+        broadcast.filter.dict(exclude_none=True),
+    )
+    return {"job_id": str(job_id), "status": "queued"}
+
+@router.get("/broadcast/{job_id}")
+async def get_broadcast(job_id: str, current_user = Depends(get_admin_user)):
+    """Estado, avance y velocidad de un envío masivo (solo admin)"""
+    job = await broadcast_engine.get(get_database(), job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Envío no encontrado"
+        )
+    job["id"] = str(job.pop("_id"))
+    return job
+
+def _check_bulk_size(ids: List[str]) -> None:
+    if len(ids) > MAX_BULK_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {MAX_BULK_IDS} notificaciones por operación"
+        )
+
+@router.post("/read-all")
+async def mark_all_as_read(current_user = Depends(get_current_user)):
+    """Marcar todas las notificaciones del usuario como leídas (un solo update_many)"""
+    modified = await NotificationRepository(get_database()).mark_all_read(str(current_user["_id"]))
+    return {"modified": modified}
+
+@router.post("/read")
+async def mark_many_as_read(body: NotificationIds, current_user = Depends(get_current_user)):
+    """Marcar como leídas las notificaciones indicadas (solo las del usuario)"""
+    _check_bulk_size(body.ids)
+    modified = await NotificationRepository(get_database()).mark_read(str(current_user["_id"]), body.ids)
+    return {"modified": modified}
+
+@router.post("/delete")
+async def delete_many(body: NotificationIds, current_user = Depends(get_current_user)):
+    """Borrar las notificaciones indicadas (solo las del usuario)"""
+    _check_bulk_size(body.ids)
+    deleted = await NotificationRepository(get_database()).delete_for_user(str(current_user["_id"]), body.ids)
+    return {"deleted": deleted}
+
 @router.put("/{notification_id}", response_model=NotificationResponse)
 async def update_notification(
     notification_id: str,
@@ -64,33 +132,23 @@ async def update_notification(
     current_user = Depends(get_current_user)
 ):
     """Actualizar una notificación (marcar como leída)"""
-    db = get_database()
+    notifications = NotificationRepository(get_database())
     
-    # Verificar que la notificación existe y pertenece al usuario
-    notification = await db.notifications.find_one({
-        "_id": ObjectId(notification_id),
-        "user_id": str(current_user["_id"])
-    })
-    
-    if not notification:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Notificación no encontrada"
-        )
-    
-    # Actualizar notificación
     update_data = {}
     if notification_update.read is not None:
         update_data["read"] = notification_update.read
     
+    # Verificar pertenencia, actualizar y obtener el resultado en una sola operación
     if update_data:
-        await db.notifications.update_one(
-            {"_id": ObjectId(notification_id)},
-            {"$set": update_data}
-        )
+        updated = await notifications.update_for_user(notification_id, str(current_user["_id"]), update_data)
+    else:
+        updated = await notifications.get_for_user(notification_id, str(current_user["_id"]))
     
-    # Obtener notificación actualizada
-    updated = await db.notifications.find_one({"_id": ObjectId(notification_id)})
+    if not updated:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Notificación no encontrada"
+        )
     
     return {
         "id": str(updated["_id"]),
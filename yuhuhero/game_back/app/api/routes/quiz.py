@@ -1,19 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from bson.objectid import ObjectId
 
 from app.api.dependencies import get_current_user
+from app.core.catalog import catalog_cache, catalog_response, encode_catalog
+from app.db.answer_keys import answer_keys
 from app.db.database import get_database
+from app.db.repositories.quizzes import QuizRepository
+from app.db.repositories.quiz_results import QuizResultRepository
+from app.db.repositories.users import UserRepository
+from app.db.user_cache import invalidate_user
 from app.models.quiz import QuizResponse, QuizSubmission, QuizResult
 
 router = APIRouter()
 
-@router.get("/financial", response_model=QuizResponse)
-async def get_financial_quiz(current_user = Depends(get_current_user)):
-    """Obtener el quiz financiero"""
-    db = get_database()
+FINANCIAL_QUIZ_CATALOG_KEY = "quiz:financial"
+
+async def _load_financial_quiz() -> dict:
+    """Cargar (o crear) el quiz financiero y construir la respuesta de la API"""
+    quizzes = QuizRepository(get_database())
     
     # Buscar el quiz financiero (en una implementación real habría más tipos)
-    quiz = await db.quizzes.find_one({"title": "Quiz Financiero Básico"})
+    quiz = await quizzes.get_by_title("Quiz Financiero Básico")
     
     if not quiz:
         # Si no existe el quiz, crear uno de ejemplo
@@ -60,8 +67,12 @@ async def get_financial_quiz(current_user = Depends(get_current_user)):
             ]
         }
         
-        result = await db.quizzes.insert_one(quiz_data)
-        quiz = await db.quizzes.find_one({"_id": result.inserted_id})
+        # insert_one agrega "_id" a quiz_data: no hace falta releerlo
+        await quizzes.create(quiz_data)
+        quiz = quiz_data
+    
+    # Mantener compilada la clave de respuestas (se recompila si cambió el contenido)
+    answer_keys.put(quiz)
     
     # Mantener el campo correct_option_id que es requerido por el modelo QuizResponse
     quiz_without_answers = {
@@ -82,32 +93,37 @@ async def get_financial_quiz(current_user = Depends(get_current_user)):
     
     return quiz_without_answers
 
+@router.get("/financial", response_model=QuizResponse)
+async def get_financial_quiz(request: Request, current_user = Depends(get_current_user)):
+    """Obtener el quiz financiero (bytes precodificados con ETag; 304 si no cambió)"""
+    entry = catalog_cache.get(FINANCIAL_QUIZ_CATALOG_KEY)
+    if entry is None:
+        entry = encode_catalog(await _load_financial_quiz())
+        catalog_cache.set(FINANCIAL_QUIZ_CATALOG_KEY, entry)
+    return catalog_response(request, entry)
+
 @router.post("/submit", response_model=QuizResult)
 async def submit_quiz(submission: QuizSubmission, current_user = Depends(get_current_user)):
     """Enviar respuestas del quiz y obtener resultados"""
     db = get_database()
     
-    # Obtener el quiz
-    quiz = await db.quizzes.find_one({"_id": ObjectId(submission.quiz_id)})
-    if not quiz:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Quiz no encontrado"
-        )
-    
-    # Verificar respuestas
-    correct_answers = 0
-    total_questions = len(quiz["questions"])
+    # Clave de respuestas compilada en memoria; solo se lee de MongoDB si no está en cache
+    answer_key = answer_keys.get(submission.quiz_id)
+    if answer_key is None:
+        quiz = await QuizRepository(db).get_answer_key(submission.quiz_id)
+        if not quiz:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Quiz no encontrado"
+            )
+        answer_key = answer_keys.put(quiz)
     
-    for answer in submission.answers:
-        for question in quiz["questions"]:
-            if question["id"] == answer.question_id:
-                if question["correct_option_id"] == answer.selected_option_id:
-                    correct_answers += 1
-                break
+    # Verificar respuestas (O(respuestas))
+    correct_answers = answer_key.grade(submission.answers)
+    total_questions = answer_key.total_questions
     
     # Calcular puntuación
-    score = (correct_answers / total_questions) * 100
+    score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
     passed = score >= 60  # Aprobar con 60% o más
     
     # Calcular recompensas
@@ -116,10 +132,8 @@ async def submit_quiz(submission: QuizSubmission, current_user = Depends(get_cur
         rewards = 50 + (correct_answers * 10)  # Recompensa base + extra por respuestas correctas
         
         # Actualizar estado del quiz del usuario si aprobó
-        await db.users.update_one(
-            {"_id": current_user["_id"]},
-            {"$set": {"quizCompleted": True}}
-        )
+        await UserRepository(db).set_quiz_completed(current_user["_id"], True)
+        invalidate_user(str(current_user["_id"]))
     
     # Guardar resultado en la base de datos
     result_data = {
@@ -133,7 +147,7 @@ async def submit_quiz(submission: QuizSubmission, current_user = Depends(get_cur
         "rewards": rewards
     }
     
-    await db.quiz_results.insert_one(result_data)
+    await QuizResultRepository(db).create(result_data)
     
     # Retornar resultado
     return {
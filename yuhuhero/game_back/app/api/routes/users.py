@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Dict, Any, Literal, Optional
 from bson.objectid import ObjectId
 from pydantic import BaseModel
 
 from app.api.dependencies import get_current_user, get_admin_user
 from app.db.database import get_database
+from app.db.repositories.quiz_responses import ONBOARDING_QUIZ_ID, QuizResponseRepository
+from app.db.repositories.users import EXPORT_FIELDS, UserRepository
+from app.db.user_cache import invalidate_user
 from app.models.user import UserResponse
 
 class QuizResponseItem(BaseModel):
@@ -16,9 +24,13 @@ class QuizResponseItem(BaseModel):
 class QuizStatusUpdate(BaseModel):
     quizCompleted: bool
     quizResponses: List[QuizResponseItem]
+    quizId: str = ONBOARDING_QUIZ_ID
 
 router = APIRouter()
 
+# Usuarios por bloque escrito en la respuesta de exportación
+EXPORT_BATCH_SIZE = 1000
+
 @router.get("/me", response_model=UserResponse)
 async def get_user_me(current_user = Depends(get_current_user)):
     """Obtener información del usuario actual"""
@@ -33,12 +45,8 @@ async def get_user_me(current_user = Depends(get_current_user)):
 @router.put("/me/quiz-status")
 async def update_quiz_status(completed: bool, current_user = Depends(get_current_user)):
     """Actualizar el estado del quiz para el usuario actual"""
-    db = get_database()
-    
-    await db.users.update_one(
-        {"_id": current_user["_id"]},
-        {"$set": {"quizCompleted": completed}}
-    )
+    await UserRepository(get_database()).set_quiz_completed(current_user["_id"], completed)
+    invalidate_user(str(current_user["_id"]))
     
     return {"success": True}
 
@@ -51,24 +59,44 @@ async def update_quiz_status_with_responses(
     Actualizar el estado del quiz y guardar las respuestas detalladas del usuario
     """
     db = get_database()
-    
-    # Actualizar el estado del quiz
-    await db.users.update_one(
-        {"_id": current_user["_id"]},
-        {"$set": {
-            "quizCompleted": data.quizCompleted,
-            "quizResponses": [response.dict() for response in data.quizResponses]
-        }}
+    # Las respuestas van a `quiz_responses` (un documento por intento), no al usuario
+    await QuizResponseRepository(db).create(
+        current_user["_id"],
+        data.quizId,
+        [response.dict() for response in data.quizResponses],
+        data.quizCompleted,
     )
+    await UserRepository(db).set_quiz_completed(current_user["_id"], data.quizCompleted)
+    invalidate_user(str(current_user["_id"]))
     
     return {"success": True}
 
+@router.get("/me/quiz-responses")
+async def get_my_quiz_responses(
+    quiz_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user = Depends(get_current_user)
+):
+    """Historial de intentos de quiz del usuario actual (el más reciente primero)"""
+    attempts = await QuizResponseRepository(get_database()).list_for_user(current_user["_id"], quiz_id, limit)
+    for attempt in attempts:
+        attempt["id"] = str(attempt.pop("_id"))
+    return attempts
+
 @router.get("", response_model=List[UserResponse])
-async def get_all_users(skip: int = 0, limit: int = 100, current_user = Depends(get_admin_user)):
-    """Obtener todos los usuarios (solo admin)"""
-    db = get_database()
-    
-    users = await db.users.find().skip(skip).limit(limit).to_list(limit)
+async def get_all_users(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_admin_user)
+):
+    """Obtener una página de usuarios (solo admin); la siguiente se pide con el cursor de X-Next-Cursor"""
+    try:
+        users, next_cursor = await UserRepository(get_database()).list_page(limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return [
         {
@@ -79,4 +107,43 @@ async def get_all_users(skip: int = 0, limit: int = 100, current_user = Depends(
             "created_at": user.get("created_at")
         }
         for user in users
-    ] 
\ No newline at end of file
+    ]
+
+def _export_row(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": str(user["_id"]), **{field: user.get(field) for field in EXPORT_FIELDS}}
+
+async def _export_chunks(format: str) -> AsyncIterator[str]:
+    """Filas de la exportación agrupadas en bloques: nunca se guarda el resultado completo en memoria"""
+    buffer = io.StringIO()
+    writer = None
+    if format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=["id", *EXPORT_FIELDS])
+        writer.writeheader()
+
+    rows = 0
+    async for user in UserRepository(get_database()).iter_export(EXPORT_BATCH_SIZE):
+        row = _export_row(user)
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(jsonable_encoder(row), ensure_ascii=False) + "\n")
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get("/export")
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user = Depends(get_admin_user)
+):
+    """Exportar todos los usuarios en NDJSON o CSV, transmitidos a medida que se leen (solo admin)"""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_chunks(format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
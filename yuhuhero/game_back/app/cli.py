@@ -0,0 +1,149 @@
+"""
+Comandos de mantenimiento del backend de YuhuHero.
+
+Uso:
+    python -m app.cli indexes ensure
+    python -m app.cli indexes verify
+    python -m app.cli migrate canonical-user-ids [--dry-run]
+    python -m app.cli migrate completed-levels-bitset [--dry-run]
+    python -m app.cli migrate quiz-responses-collection [--dry-run]
+    python -m app.cli migrate notifications-created-at [--dry-run]
+    python -m app.cli migrate notifications-read-at [--dry-run]
+    python -m app.cli game-map publish mapa.json
+    python -m app.cli game-map bump
+    python -m app.cli progress compact
+    python -m app.cli notifications recount
+    python -m app.cli notifications archive [--days 90]
+    python -m app.cli users import usuarios.csv [--format csv|ndjson] [--batch-size 1000] [--workers 8]
+"""
+import argparse
+import asyncio
+import json
+
+from app.db.database import connect_to_mongo, close_mongo_connection, get_database
+from app.db.game_map_store import GAME_MAP_MARKER_ID, publish_game_map
+from app.db.indexes import ensure_indexes, verify_indexes
+from app.db.notification_archiver import notification_archiver
+from app.db.progress_compactor import progress_compactor
+from app.db.repositories.notifications import NotificationRepository
+from app.db.user_import import MissingUniqueIndexError, UserImporter
+from app.db.migrations.canonical_user_ids import migrate_canonical_user_ids
+from app.db.migrations.completed_levels_bitset import migrate_completed_levels_bitset
+from app.db.migrations.notifications_created_at import migrate_notifications_created_at
+from app.db.migrations.notifications_read_at import migrate_notifications_read_at
+from app.db.migrations.quiz_responses_collection import migrate_quiz_responses_collection
+
+MIGRATIONS = {
+    "canonical-user-ids": migrate_canonical_user_ids,
+    "completed-levels-bitset": migrate_completed_levels_bitset,
+    "quiz-responses-collection": migrate_quiz_responses_collection,
+    "notifications-created-at": migrate_notifications_created_at,
+    "notifications-read-at": migrate_notifications_read_at,
+}
+
+
+async def _indexes(args) -> dict:
+    db = get_database()
+    if args.action == "ensure":
+        return await ensure_indexes(db)
+    return await verify_indexes(db)
+
+
+async def _migrate(args) -> dict:
+    return await MIGRATIONS[args.name](get_database(), dry_run=args.dry_run)
+
+
+async def _game_map(args) -> dict:
+    db = get_database()
+    if args.action == "publish":
+        if not args.file:
+            raise SystemExit("game-map publish requiere el archivo JSON del mapa")
+        with open(args.file, encoding="utf-8") as f:
+            content = json.load(f)
+        tiles = content["tiles"] if isinstance(content, dict) else content
+        return {"version": await publish_game_map(db, tiles), "tiles": len(tiles)}
+
+    # Tras editar `game_maps` a mano: forzar que los workers recarguen el mapa
+    result = await db.catalog_versions.update_one(
+        {"_id": GAME_MAP_MARKER_ID}, {"$inc": {"version": 1}}, upsert=True
+    )
+    return {"bumped": bool(result.modified_count or result.upserted_id)}
+
+
+async def _progress(args) -> dict:
+    return await progress_compactor.compact(get_database())
+
+
+async def _notifications(args) -> dict:
+    if args.action == "archive":
+        if args.days is not None:
+            notification_archiver.after_days = args.days
+        if notification_archiver.after_days <= 0:
+            raise SystemExit("notifications archive requiere --days o NOTIFICATIONS_ARCHIVE_AFTER_DAYS")
+        return await notification_archiver.archive(get_database())
+    return {"counters": await NotificationRepository(get_database()).recount_unread()}
+
+
+async def _users(args) -> dict:
+    importer = UserImporter(get_database(), batch_size=args.batch_size, workers=args.workers)
+    try:
+        return await importer.run(args.file, args.format, args.duplicates)
+    except MissingUniqueIndexError as e:
+        raise SystemExit(str(e))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Mantenimiento de YuhuHero")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    indexes = commands.add_parser("indexes", help="Crear o verificar los índices de MongoDB")
+    indexes.add_argument("action", choices=["ensure", "verify"])
+    indexes.set_defaults(handler=_indexes)
+
+    migrate = commands.add_parser("migrate", help="Ejecutar una migración de datos")
+    migrate.add_argument("name", choices=sorted(MIGRATIONS))
+    migrate.add_argument("--dry-run", action="store_true", help="Solo reportar los cambios")
+    migrate.set_defaults(handler=_migrate)
+
+    game_map = commands.add_parser("game-map", help="Publicar el mapa del juego o forzar su recarga")
+    game_map.add_argument("action", choices=["publish", "bump"])
+    game_map.add_argument("file", nargs="?", help="JSON con la lista de casillas (o {\"tiles\": [...]})")
+    game_map.set_defaults(handler=_game_map)
+
+    progress = commands.add_parser("progress", help="Compactar los eventos de progreso en snapshots")
+    progress.add_argument("action", choices=["compact"])
+    progress.set_defaults(handler=_progress)
+
+    notifications = commands.add_parser("notifications", help="Mantenimiento de notificaciones")
+    notifications.add_argument("action", choices=["recount", "archive"])
+    notifications.add_argument("--days", type=int, help="Archivar las de más de N días (por defecto NOTIFICATIONS_ARCHIVE_AFTER_DAYS)")
+    notifications.set_defaults(handler=_notifications)
+
+    users = commands.add_parser("users", help="Alta masiva de usuarios")
+    users.add_argument("action", choices=["import"])
+    users.add_argument("file", help="CSV o NDJSON con name, phone y password")
+    users.add_argument("--format", choices=["csv", "ndjson"], help="Por defecto, según la extensión")
+    users.add_argument("--batch-size", type=int, default=1000, help="Usuarios por insert_many")
+    users.add_argument("--workers", type=int, help="Procesos para hashear (por defecto, uno por CPU)")
+    users.add_argument("--duplicates", help="Archivo donde escribir todos los teléfonos duplicados")
+    users.set_defaults(handler=_users)
+
+    return parser
+
+
+async def _run(args) -> dict:
+    await connect_to_mongo()
+    try:
+        return await args.handler(args)
+    finally:
+        await close_mongo_connection()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    result = asyncio.run(_run(args))
+    print(json.dumps(result, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
+from typing import Iterable, List, Optional
 from dotenv import load_dotenv
-from bson import ObjectId
+from app.db.client import create_mongo_client
+from app.db.level_bits import UnknownLevelError
+from app.db.repositories.users import UserRepository, profile_view
+from app.db.repositories.progress import ProgressRepository
+from app.db.repositories.notifications import NotificationRepository
+from app.db.user_cache import get_cached_user, cache_user, invalidate_user
 
 # Cargar variables de entorno
 load_dotenv()
@@ -9,8 +14,8 @@ load_dotenv()
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "yuhuhero_db")
 
-# Cliente MongoDB
-client = AsyncIOMotorClient(MONGODB_URL)
+# Cliente MongoDB (perfil de pool y timeouts en app.core.config)
+client = create_mongo_client(MONGODB_URL)
 database = client[DATABASE_NAME]
 
 # Colecciones
@@ -19,39 +24,45 @@ quiz_collection = database.quizzes
 game_collection = database.game_progress
 notifications_collection = database.notifications
 
+# Repositorios (cada consulta proyecta solo los campos que necesita)
+users_repository = UserRepository(database)
+progress_repository = ProgressRepository(database)
+notifications_repository = NotificationRepository(database)
+
 async def get_user_by_phone(phone: str):
-    return await users_collection.find_one({"phone": phone})
+    """Perfil del usuario por teléfono (sin contraseña)"""
+    return await users_repository.get_profile_by_phone(phone)
+
+async def get_user_credentials(phone: str):
+    """Solo _id, teléfono y hash de contraseña, para el login"""
+    return await users_repository.get_credentials(phone)
+
+# Tras la migración canonical_user_ids (python -m app.cli migrate canonical-user-ids)
+# users._id es siempre ObjectId y game_progress.user_id siempre str(_id):
+# cada operación es una sola consulta indexada, sin reintentos con otra forma de ID.
 
 async def get_user_by_id(user_id: str):
-    try:
-        return await users_collection.find_one({"_id": ObjectId(user_id)})
-    except:
-        # Si hay error al convertir a ObjectId, intentar buscar por id como string
-        return await users_collection.find_one({"id": user_id})
+    # Primero la cache en proceso: evita ir a MongoDB en cada petición autenticada
+    user = get_cached_user(user_id)
+    if user is not None:
+        return user
+
+    user = await users_repository.get_profile(user_id)
+    if user is not None:
+        cache_user(user_id, user)
+    return user
 
 async def create_user(user_data: dict):
-    result = await users_collection.insert_one(user_data)
-    return result.inserted_id
+    inserted_id = await users_repository.create(user_data)
+    # insert_one agrega "_id" a user_data: se precarga la cache con el perfil del usuario nuevo
+    cache_user(str(inserted_id), profile_view(user_data))
+    return inserted_id
 
 async def update_quiz_status(user_id: str, completed: bool):
     try:
-        # Try to update using the "id" field
-        result = await users_collection.update_one(
-            {"id": user_id}, 
-            {"$set": {"quizCompleted": completed}}
-        )
-        
-        # If no document was modified, try with _id as ObjectId
-        if result.modified_count == 0:
-            try:
-                result = await users_collection.update_one(
-                    {"_id": ObjectId(user_id)}, 
-                    {"$set": {"quizCompleted": completed}}
-                )
-            except:
-                # If conversion to ObjectId fails, keep the original id approach
-                pass
-                
+        if not await users_repository.set_quiz_completed(user_id, completed):
+            return False
+        invalidate_user(user_id)
         return True
     except Exception as e:
         print(f"Error updating quiz status: {e}")
@@ -59,56 +70,93 @@ async def update_quiz_status(user_id: str, completed: bool):
 
 async def update_game_progress(user_id: str, progress_data: dict):
     try:
-        # Try first with user_id as is
-        result = await game_collection.update_one(
-            {"user_id": user_id},
-            {"$set": progress_data},
-            upsert=True
-        )
-        
-        # If no document was modified and upsert didn't happen, try with ObjectId
-        if result.modified_count == 0 and result.upserted_id is None:
-            try:
-                # Try converting to ObjectId
-                object_id = ObjectId(user_id)
-                result = await game_collection.update_one(
-                    {"user_id": str(object_id)}, # Use the string representation just to be safe
-                    {"$set": progress_data},
-                    upsert=True
-                )
-            except:
-                # If conversion fails, that's okay - we already tried the original approach
-                pass
-                
+        await progress_repository.set_fields(user_id, progress_data)
         return True
     except Exception as e:
         print(f"Error updating game progress: {e}")
         return False
 
+async def create_game_progress(user_id: str, progress_data: dict):
+    """Crear el progreso inicial si no existe; devuelve el progreso guardado (None si falla)"""
+    try:
+        return await progress_repository.seed(user_id, progress_data)
+    except Exception as e:
+        print(f"Error creating game progress: {e}")
+        return None
+
+async def apply_progress_update(
+    user_id: str,
+    set_level: Optional[int] = None,
+    set_coins: Optional[int] = None,
+    add_coins: Optional[int] = None,
+    complete_levels: Optional[Iterable[str]] = None,
+    reason: Optional[str] = None,
+):
+    """
+    Aplicar cambios de progreso en una sola operación atómica ($inc / $addToSet)
+    y devolver el documento actualizado (lo crea si no existe).
+    Las peticiones concurrentes no pierden monedas ni niveles.
+    """
+    try:
+        return await progress_repository.apply_update(
+            user_id,
+            set_level=set_level,
+            set_coins=set_coins,
+            add_coins=add_coins,
+            complete_levels=complete_levels,
+            reason=reason,
+        )
+    except UnknownLevelError:
+        raise  # Error del cliente (nivel fuera del mapa), no de la base de datos
+    except Exception as e:
+        print(f"Error applying game progress update: {e}")
+        return None
+
+async def add_coins(user_id: str, amount: int, reason: Optional[str] = None):
+    """Sumar monedas de forma atómica"""
+    return await apply_progress_update(user_id, add_coins=amount, reason=reason)
+
+async def complete_level(user_id: str, level_id: str):
+    """Marcar un nivel como completado de forma atómica"""
+    return await apply_progress_update(user_id, complete_levels=[level_id])
+
+async def set_level(user_id: str, level: int):
+    """Fijar el nivel actual"""
+    return await apply_progress_update(user_id, set_level=level)
+
 async def get_game_progress(user_id: str):
     try:
-        # First try with user_id as is
-        progress = await game_collection.find_one({"user_id": user_id})
-        
-        # If not found, try with ObjectId conversion
-        if progress is None:
-            try:
-                # Try converting to ObjectId
-                object_id = ObjectId(user_id)
-                progress = await game_collection.find_one({"user_id": str(object_id)})
-            except:
-                # If conversion fails, return None
-                pass
-                
-        return progress
+        return await progress_repository.get(user_id)
     except Exception as e:
         print(f"Error getting game progress: {e}")
         return None
 
+async def get_progress_changes(user_id: str, since: int):
+    """Cambios del progreso desde la versión `since` (None si no hay cambios)"""
+    return await progress_repository.changes_since(user_id, since)
+
 async def create_notification(notification_data: dict):
-    result = await notifications_collection.insert_one(notification_data)
-    return result.inserted_id
+    return await notifications_repository.create(notification_data)
+
+async def get_notifications(user_id: str, limit: int = 20, cursor: Optional[str] = None):
+    """Una página de notificaciones (con `id` en lugar de `_id`) y el cursor de la siguiente"""
+    notifications, next_cursor = await notifications_repository.list_page(user_id, limit, cursor)
+    for notification in notifications:
+        notification["id"] = str(notification.pop("_id"))
+    return notifications, next_cursor
+
+async def get_unread_count(user_id: str) -> int:
+    return await notifications_repository.unread_count(user_id)
+
+async def update_notification(notification_id: str, user_id: str, fields: dict):
+    """Actualizar una notificación del usuario (None si no existe o no es suya)"""
+    return await notifications_repository.update_for_user(notification_id, user_id, fields)
+
+async def mark_all_notifications_read(user_id: str) -> int:
+    return await notifications_repository.mark_all_read(user_id)
+
+async def mark_notifications_read(user_id: str, notification_ids: List[str]) -> int:
+    return await notifications_repository.mark_read(user_id, notification_ids)
 
-async def get_notifications(user_id: str):
-    cursor = notifications_collection.find({"user_id": user_id})
-    return await cursor.to_list(length=100) 
\ No newline at end of file
+async def delete_notifications(user_id: str, notification_ids: List[str]) -> int:
+    return await notifications_repository.delete_for_user(user_id, notification_ids)
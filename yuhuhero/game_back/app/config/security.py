@@ -1,9 +1,13 @@
 import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
+from app.core.cache import LRUCache
+from app.core.hashing import password_hasher
+from app.core.metrics import register_metrics
 
 # Cargar variables de entorno
 load_dotenv()
@@ -12,10 +16,15 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "insecure_default_key_please_change_in_production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
 
 # Contexto para hashing de contraseñas
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Payloads ya verificados, indexados por token; cada entrada caduca con su `exp`
+token_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE)
+register_metrics("config_token_cache", token_cache.stats)
+
 def verify_password(plain_password, hashed_password):
     """Verificar si la contraseña es correcta"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -24,6 +33,14 @@ def get_password_hash(password):
     """Generar hash de contraseña"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    """Verificar contraseña en el pool de hashing sin bloquear el event loop"""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    """Generar hash de contraseña en el pool de hashing sin bloquear el event loop"""
+    return await password_hasher.hash(password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crear token JWT de acceso"""
     to_encode = data.copy()
@@ -38,12 +55,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_token(token: str):
-    """Verificar y decodificar un token JWT"""
+    """Verificar y decodificar un token JWT (con cache de tokens ya verificados)"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            return None
-        return payload
     except JWTError:
-        return None 
\ No newline at end of file
+        return None
+
+    user_id = payload.get("sub")
+    if user_id is None:
+        return None
+
+    # Solo se cachean tokens con expiración, y nunca más allá de ella
+    exp = payload.get("exp")
+    if exp is not None and exp - time.time() > 0:
+        token_cache.set(token, payload, ttl=exp - time.time())
+    return payload 
\ No newline at end of file
@@ -0,0 +1,45 @@
+import hashlib
+import json
+from typing import Any, NamedTuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import register_metrics
+
+
+class CatalogEntry(NamedTuple):
+    """Respuesta de catálogo ya serializada, con su ETag fuerte"""
+    body: bytes
+    etag: str
+
+
+def encode_catalog(content: Any) -> CatalogEntry:
+    """Serializar una sola vez el contenido; el ETag es el hash de los bytes"""
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return CatalogEntry(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def catalog_response(request: Request, entry: CatalogEntry) -> Response:
+    """Devolver los bytes precodificados o 304 si el cliente ya tiene esta versión"""
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"private, max-age={settings.CATALOG_MAX_AGE_SECONDS}, must-revalidate",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# Catálogos leídos de MongoDB (quiz, mapa), ya codificados. El TTL acota cuánto tarda
+# un worker en ver un cambio; al recargar, un contenido distinto produce otro ETag.
+catalog_cache = LRUCache(maxsize=64, ttl=settings.CATALOG_CACHE_TTL_SECONDS)
+register_metrics("catalog_cache", catalog_cache.stats)
@@ -11,10 +11,90 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your_secret_key_here"  # Debe cambiarse en producción
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 días
-    
+
+    # Pool de hashing de contraseñas (bcrypt fuera del event loop)
+    PASSWORD_HASHING_EXECUTOR: str = "thread"  # thread | process
+    PASSWORD_HASHING_WORKERS: int = 4
+    PASSWORD_HASHING_MAX_QUEUE: int = 64  # Peticiones en espera antes de responder 503
+
+    # Cache de JWT verificados (evita repetir la verificación de firma)
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Cache de usuarios autenticados (por proceso)
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 60
+
+    # Write-behind de game_progress: combina cambios por usuario y los escribe en lote
+    PROGRESS_WRITE_BEHIND: bool = False
+    PROGRESS_FLUSH_INTERVAL_MS: int = 500
+    PROGRESS_WRITE_BEHIND_MAX_PENDING: int = 5000  # Usuarios pendientes que fuerzan un vaciado
+
+    # Claves de respuestas de quizzes compiladas en memoria
+    QUIZ_ANSWER_KEY_TTL_SECONDS: int = 300
+
+    # Catálogos (quiz, mapa) servidos como bytes precodificados con ETag
+    CATALOG_CACHE_TTL_SECONDS: int = 60  # Cada cuánto se vuelve a leer de MongoDB
+    CATALOG_MAX_AGE_SECONDS: int = 60  # Cache-Control max-age para el cliente
+
+    # Mapa del juego en memoria: cómo detectar cambios de versión entre workers
+    GAME_MAP_WATCH_MODE: str = "auto"  # "auto", "change_stream" o "polling"
+    GAME_MAP_POLL_INTERVAL_SECONDS: float = 5.0
+
+    # Registro de eventos de progreso: cada escritura es un insert en `progress_events`
+    # y un compactador los integra periódicamente en el snapshot de `game_progress`
+    PROGRESS_EVENT_LOG: bool = False
+    PROGRESS_COMPACT_INTERVAL_SECONDS: float = 30.0
+    PROGRESS_COMPACT_BATCH_SIZE: int = 1000
+    PROGRESS_COMPACT_MIN_AGE_SECONDS: float = 30.0  # Solo se compactan eventos más antiguos
+
+    # Niveles completados como bitset (`completed_bits`) en lugar de la lista de IDs;
+    # ejecutar antes `python -m app.cli migrate completed-levels-bitset`
+    PROGRESS_LEVELS_BITSET: bool = False
+
+    # Historial de cambios para GET /api/game/progress/changes (pasado este tiempo,
+    # el cliente recibe el progreso completo)
+    PROGRESS_CHANGES_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Retención de notificaciones (0 = desactivado): las leídas se borran por TTL N días
+    # después de leerse; las de más de N días (leídas o no) pasan a `notifications_archive`
+    NOTIFICATIONS_READ_TTL_DAYS: int = 0
+    NOTIFICATIONS_ARCHIVE_AFTER_DAYS: int = 0
+    NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS: float = 3600.0
+    NOTIFICATIONS_ARCHIVE_BATCH_SIZE: int = 1000
+
+    # Envíos masivos de notificaciones (en segundo plano)
+    BROADCAST_BATCH_SIZE: int = 1000  # Notificaciones por insert_many
+    BROADCAST_MAX_CONCURRENT_JOBS: int = 1  # Trabajos simultáneos por proceso
+
+    # Canal de eventos (GET /api/events): "local" reparte solo dentro del proceso;
+    # "mongo" comparte los eventos entre workers con una colección capada
+    EVENTS_BROKER: str = "local"
+    EVENTS_CAPPED_SIZE_BYTES: int = 16 * 1024 * 1024
+    EVENTS_QUEUE_SIZE: int = 100  # Eventos pendientes por conexión antes de descartar
+    EVENTS_KEEPALIVE_SECONDS: float = 15.0
+    EVENTS_TOKEN_EXPIRE_SECONDS: int = 60  # Vigencia del token para ?access_token= (POST /api/events/token)
+
+    # Ranking por monedas: posición en memoria (O(log n)) o, si está desactivado, con count en MongoDB
+    LEADERBOARD_IN_MEMORY: bool = True
+    LEADERBOARD_POLL_INTERVAL_SECONDS: float = 5.0  # Cada cuánto se recogen cambios de otros workers
+
     # Configuración de la base de datos
     MONGODB_URL: str = "mongodb://localhost:27017"
     DATABASE_NAME: str = "yuhuhero"
+    ENSURE_INDEXES_ON_STARTUP: bool = True
+
+    # Pool de conexiones y perfil del driver de MongoDB
+    MONGO_APP_NAME: str = "yuhuhero-api"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None  # None: sin límite
+    MONGO_MAX_CONNECTING: int = 2  # Conexiones estableciéndose a la vez por servidor
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGO_CONNECT_TIMEOUT_MS: int = 20000
+    MONGO_SOCKET_TIMEOUT_MS: Optional[int] = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None  # Espera máxima por una conexión libre
+    MONGO_COMPRESSORS: str = ""  # p. ej. "zstd,snappy,zlib" (zstd/snappy requieren sus paquetes)
+    MONGO_ZLIB_COMPRESSION_LEVEL: int = -1
     
     class Config:
         env_file = ".env"
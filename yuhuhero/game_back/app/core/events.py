@@ -0,0 +1,153 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+from app.core.metrics import register_metrics
+
+# Un evento es {"user_id": ..., "type": ..., "data": {...}}
+Event = Dict[str, Any]
+
+# `scope` de los tokens de corta duración para abrir el canal: son los únicos que se aceptan
+# en la URL (queda en logs de proxies) y no sirven para el resto de la API
+EVENTS_TOKEN_SCOPE = "events"
+
+
+class Broker(ABC):
+    """
+    Transporte de eventos entre workers. `publish` envía los eventos y el broker los
+    entrega (a este y a los demás procesos) llamando a la función recibida en `start`.
+    """
+
+    @abstractmethod
+    async def start(self, deliver: Callable[[List[Event]], None]) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, events: List[Event]) -> None:
+        ...
+
+    async def stop(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class LocalBroker(Broker):
+    """Entrega directa en el mismo proceso (un solo worker, o pruebas)"""
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[List[Event]], None]] = None
+
+    async def start(self, deliver: Callable[[List[Event]], None]) -> None:
+        self._deliver = deliver
+
+    async def publish(self, events: List[Event]) -> None:
+        if self._deliver is not None:
+            self._deliver(events)
+
+
+class EventHub:
+    """
+    Pub/sub en proceso para el canal de eventos (SSE). Cada conexión abierta es una cola
+    acotada por usuario; las escrituras de notificaciones y progreso publican aquí y el
+    broker reparte los eventos entre workers. Los eventos son avisos: si un cliente lento
+    llena su cola se descarta el más antiguo, y el cliente vuelve a leer el estado vía API.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._broker: Broker = LocalBroker()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._started = False
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self, broker: Optional[Broker] = None) -> None:
+        if broker is not None:
+            self._broker = broker
+        await self._broker.start(self._deliver)
+        self._started = True
+
+    async def stop(self) -> None:
+        await self._broker.stop()
+        self._started = False
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(str(user_id), set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(str(user_id))
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[str(user_id)]
+
+    async def publish(self, user_id: str, event_type: str, data: Optional[Dict[str, Any]] = None) -> None:
+        await self.publish_many([user_id], event_type, [data or {}])
+
+    async def publish_many(
+        self, user_ids: Iterable[str], event_type: str, data: Iterable[Dict[str, Any]]
+    ) -> None:
+        """Publicar un evento por usuario (`data` en el mismo orden que `user_ids`)"""
+        if not self._started:
+            return
+        events = [
+            {"user_id": str(user_id), "type": event_type, "data": payload}
+            for user_id, payload in zip(user_ids, data)
+        ]
+        if not events:
+            return
+        self.published += len(events)
+        await self._broker.publish(events)
+
+    def _deliver(self, events: List[Event]) -> None:
+        for event in events:
+            for queue in self._subscribers.get(event["user_id"], ()):
+                if queue.full():
+                    queue.get_nowait()
+                    self.dropped += 1
+                queue.put_nowait(event)
+                self.delivered += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "broker": type(self._broker).__name__,
+            "users": len(self._subscribers),
+            "connections": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            **self._broker.stats(),
+        }
+
+
+async def stream_events(request: Request, user_id: str) -> AsyncIterator[str]:
+    """Eventos del usuario en formato SSE, con comentarios de keep-alive mientras no hay nada"""
+    queue = event_hub.subscribe(user_id)
+    try:
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            data = json.dumps(jsonable_encoder(event["data"]))
+            yield f"event: {event['type']}\ndata: {data}\n\n"
+    finally:
+        event_hub.unsubscribe(user_id, queue)
+
+
+event_hub = EventHub(queue_size=settings.EVENTS_QUEUE_SIZE)
+register_metrics("events", event_hub.stats)
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.metrics import register_metrics
+
+# bcrypt tarda cientos de ms por operación: nunca debe ejecutarse en el event loop
+_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return _pwd_context.hash(password)
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hashear varias contraseñas en una sola tarea (importaciones masivas en un pool de procesos)"""
+    return [_hash(password) for password in passwords]
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return _pwd_context.verify(plain_password, hashed_password)
+
+
+def _call_timed(fn: Callable, *args):
+    # time.monotonic usa un reloj del sistema, comparable también entre procesos
+    return time.monotonic(), fn(*args)
+
+
+class HashingQueueFullError(Exception):
+    """La cola del pool de hashing está llena"""
+
+
+class PasswordHasher:
+    """Pool acotado (hilos o procesos) para hashear y verificar contraseñas"""
+
+    def __init__(self, executor_kind: str = "thread", max_workers: int = 4, max_queue: int = 64):
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de executor no soportado: {executor_kind}")
+        self.executor_kind = executor_kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+
+        self._in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="password-hasher"
+                )
+        return self._executor
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise HashingQueueFullError("Demasiadas operaciones de contraseña en espera")
+
+        self._in_flight += 1
+        self.submitted += 1
+        enqueued_at = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            started_at, result = await loop.run_in_executor(
+                self._get_executor(), _call_timed, fn, *args
+            )
+        finally:
+            self._in_flight -= 1
+
+        wait = max(0.0, started_at - enqueued_at)
+        self.completed += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        self._total_run += time.monotonic() - started_at
+        return result
+
+    async def hash(self, password: str) -> str:
+        """Generar hash de contraseña en el pool"""
+        return await self._run(_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verificar contraseña en el pool"""
+        return await self._run(_verify, plain_password, hashed_password)
+
+    @property
+    def queue_depth(self) -> int:
+        """Operaciones esperando un worker libre"""
+        return max(0, self._in_flight - self.max_workers)
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self.completed or 1
+        return {
+            "executor": self.executor_kind,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self._total_wait / completed * 1000, 2),
+            "max_wait_ms": round(self._max_wait * 1000, 2),
+            "avg_run_ms": round(self._total_run / completed * 1000, 2),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor_kind=settings.PASSWORD_HASHING_EXECUTOR,
+    max_workers=settings.PASSWORD_HASHING_WORKERS,
+    max_queue=settings.PASSWORD_HASHING_MAX_QUEUE,
+)
+register_metrics("password_hashing", password_hasher.stats)
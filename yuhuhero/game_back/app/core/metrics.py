@@ -0,0 +1,14 @@
+from typing import Any, Callable, Dict
+
+# Proveedores de estadísticas en proceso (caches, pools, colas...)
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """Registrar una función que devuelve las estadísticas de un subsistema"""
+    _providers[name] = provider
+
+
+def collect_metrics() -> Dict[str, Dict[str, Any]]:
+    """Obtener una instantánea de todas las estadísticas registradas"""
+    return {name: provider() for name, provider in _providers.items()}
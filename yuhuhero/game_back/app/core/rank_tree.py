@@ -0,0 +1,145 @@
+import random
+from typing import Any, Iterable, Iterator, List, Optional
+
+
+class _Node:
+    __slots__ = ("key", "priority", "left", "right", "size")
+
+    def __init__(self, key: Any, priority: float):
+        self.key = key
+        self.priority = priority
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+        self.size = 1
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node is not None else 0
+
+
+def _update(node: _Node) -> _Node:
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+
+def _split(node: Optional[_Node], key: Any):
+    """Separar en (claves < key, claves >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        return _update(node), right
+    left, right = _split(node.left, key)
+    node.left = right
+    return left, _update(node)
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    """Unir dos treaps donde todas las claves de `left` son menores que las de `right`"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+class RankTree:
+    """
+    Conjunto ordenado con estadística de orden (treap con tamaño de subárbol):
+    insertar, eliminar y contar claves menores que una dada en O(log n) esperado.
+    Las claves deben ser únicas y comparables entre sí.
+    """
+
+    def __init__(self, keys: Iterable[Any] = ()):
+        self._root: Optional[_Node] = None
+        self._random = random.Random()
+        self.build(keys)
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def build(self, keys: Iterable[Any]) -> None:
+        """Reconstruir en O(n) a partir de claves ya ordenadas y sin repetir"""
+        # Árbol cartesiano: se recorre el borde derecho con una pila
+        stack: List[_Node] = []
+        for key in keys:
+            node = _Node(key, self._random.random())
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+        self._root = stack[0] if stack else None
+        self._fix_sizes()
+
+    def _fix_sizes(self) -> None:
+        # Postorden iterativo: la recursión no cabe en árboles de millones de nodos mal balanceados
+        order: List[_Node] = []
+        pending = [self._root] if self._root is not None else []
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            if node.left is not None:
+                pending.append(node.left)
+            if node.right is not None:
+                pending.append(node.right)
+        for node in reversed(order):
+            _update(node)
+
+    def insert(self, key: Any) -> None:
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key, self._random.random())), right)
+
+    def remove(self, key: Any) -> bool:
+        """Eliminar una clave; devuelve False si no estaba"""
+        parents: List[_Node] = []
+        node = self._root
+        while node is not None and node.key != key:
+            parents.append(node)
+            node = node.left if key < node.key else node.right
+        if node is None:
+            return False
+
+        replacement = _merge(node.left, node.right)
+        if not parents:
+            self._root = replacement
+            return True
+        parent = parents[-1]
+        if parent.left is node:
+            parent.left = replacement
+        else:
+            parent.right = replacement
+        for ancestor in parents:
+            ancestor.size -= 1
+        return True
+
+    def count_less(self, key: Any) -> int:
+        """Número de claves estrictamente menores que `key`"""
+        count = 0
+        node = self._root
+        while node is not None:
+            if node.key < key:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def __iter__(self) -> Iterator[Any]:
+        """Claves en orden ascendente"""
+        stack: List[_Node] = []
+        node = self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.key
+            node = node.right
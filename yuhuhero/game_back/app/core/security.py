@@ -1,13 +1,21 @@
+import time
 from datetime import datetime, timedelta
 from typing import Any, Optional, Dict
 
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.hashing import password_hasher
+from app.core.metrics import register_metrics
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Payloads ya verificados, indexados por token; cada entrada caduca con su `exp`
+token_cache = LRUCache(maxsize=settings.TOKEN_CACHE_SIZE)
+register_metrics("token_cache", token_cache.stats)
+
 
 def create_access_token(subject: Any, expires_delta: Optional[timedelta] = None, data: Dict[str, Any] = None) -> str:
     if expires_delta:
@@ -34,10 +42,29 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verificar contraseña en el pool de hashing sin bloquear el event loop"""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Generar hash de contraseña en el pool de hashing sin bloquear el event loop"""
+    return await password_hasher.hash(password)
+
+
 def verify_token(token: str):
-    """Verificar y decodificar un token JWT"""
+    """Verificar y decodificar un token JWT (con cache de tokens ya verificados)"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
-        return None 
\ No newline at end of file
+        return None
+
+    # Solo se cachean tokens con expiración, y nunca más allá de ella
+    exp = payload.get("exp")
+    if exp is not None and exp - time.time() > 0:
+        token_cache.set(token, payload, ttl=exp - time.time())
+    return payload 
\ No newline at end of file
@@ -0,0 +1,79 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import register_metrics
+
+
+class AnswerKey(NamedTuple):
+    """Clave de respuestas compilada de un quiz"""
+    quiz_id: str
+    version: str
+    correct_options: Dict[str, str]  # ID de pregunta -> ID de opción correcta
+
+    @property
+    def total_questions(self) -> int:
+        return len(self.correct_options)
+
+    def grade(self, answers: Iterable[Any]) -> int:
+        """Contar respuestas correctas en O(respuestas); cada pregunta cuenta una sola vez"""
+        selected = {answer.question_id: answer.selected_option_id for answer in answers}
+        return sum(
+            1 for question_id, option_id in selected.items()
+            if self.correct_options.get(question_id) == option_id
+        )
+
+
+def quiz_content_version(quiz: Dict[str, Any]) -> str:
+    """Versión del contenido evaluable del quiz: cambia si cambia alguna respuesta correcta"""
+    if quiz.get("version") is not None:
+        return str(quiz["version"])
+    pairs = [(q["id"], q["correct_option_id"]) for q in quiz.get("questions", [])]
+    return hashlib.sha1(json.dumps(pairs).encode()).hexdigest()[:16]
+
+
+def compile_answer_key(quiz: Dict[str, Any]) -> AnswerKey:
+    quiz_id = str(quiz.get("_id", quiz.get("id")))
+    return AnswerKey(
+        quiz_id=quiz_id,
+        version=quiz_content_version(quiz),
+        correct_options={q["id"]: q["correct_option_id"] for q in quiz.get("questions", [])},
+    )
+
+
+class AnswerKeyCache:
+    """
+    Claves de respuestas compiladas por quiz (por proceso). Se recompilan cuando cambia
+    la versión del contenido; el TTL acota cuánto tarda otro worker en ver una edición.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.compilations = 0
+
+    def get(self, quiz_id: str) -> Optional[AnswerKey]:
+        return self._cache.get(str(quiz_id))
+
+    def put(self, quiz: Dict[str, Any]) -> AnswerKey:
+        """Registrar un quiz leído o escrito; solo se recompila si cambió su versión"""
+        quiz_id = str(quiz.get("_id", quiz.get("id")))
+        current = self._cache.get(quiz_id)
+        if current is not None and current.version == quiz_content_version(quiz):
+            return current
+
+        key = compile_answer_key(quiz)
+        self._cache.set(quiz_id, key)
+        self.compilations += 1
+        return key
+
+    def invalidate(self, quiz_id: str) -> None:
+        self._cache.pop(str(quiz_id))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "compilations": self.compilations}
+
+
+answer_keys = AnswerKeyCache(ttl=settings.QUIZ_ANSWER_KEY_TTL_SECONDS)
+register_metrics("quiz_answer_keys", answer_keys.stats)
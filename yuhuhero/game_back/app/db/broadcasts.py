@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.events import event_hub
+from app.core.metrics import register_metrics
+from app.db.repositories.notifications import event_payload
+
+logger = logging.getLogger(__name__)
+
+# Un trabajo "running" sin latido durante este tiempo se considera abandonado (worker caído)
+STALE_JOB_AFTER = timedelta(minutes=5)
+
+# Campos de `broadcast_jobs` que devuelve la API
+JOB_PROJECTION = {
+    "title": 1, "status": 1, "filter": 1, "sent": 1, "batches": 1, "rate_per_sec": 1,
+    "created_at": 1, "started_at": 1, "finished_at": 1, "error": 1,
+}
+
+
+def build_user_query(user_filter: Dict[str, Any]) -> Dict[str, Any]:
+    """Consulta de `users` a partir de un filtro con campos permitidos (nunca una consulta libre)"""
+    query: Dict[str, Any] = {}
+    if user_filter.get("quiz_completed") is not None:
+        query["quizCompleted"] = user_filter["quiz_completed"]
+    if user_filter.get("role") is not None:
+        query["role"] = user_filter["role"]
+    created: Dict[str, Any] = {}
+    if user_filter.get("created_after") is not None:
+        created["$gte"] = user_filter["created_after"]
+    if user_filter.get("created_before") is not None:
+        created["$lt"] = user_filter["created_before"]
+    if created:
+        query["created_at"] = created
+    return query
+
+
+class BroadcastEngine:
+    """
+    Envío de una notificación a muchos usuarios en segundo plano. Cada trabajo se guarda
+    en `broadcast_jobs` (estado, avance y último usuario procesado), recorre `users` por
+    `_id` solo con la proyección del ID y escribe las notificaciones con insert_many por
+    lotes. Corre como tarea de asyncio: las peticiones nunca esperan al envío.
+    Al retomar un trabajo interrumpido se puede repetir, como mucho, el último lote.
+    """
+
+    def __init__(self, batch_size: int = 1000, max_concurrent_jobs: int = 1):
+        self.batch_size = batch_size
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[ObjectId, asyncio.Task] = {}
+
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.notifications_sent = 0
+        self.last_rate_per_sec = 0.0
+
+    async def submit(self, db, notification: Dict[str, Any], user_filter: Dict[str, Any]) -> ObjectId:
+        """Registrar un trabajo y lanzarlo; devuelve su ID sin esperar al envío"""
+        job = {
+            **notification,
+            "filter": user_filter,
+            "status": "queued",
+            "sent": 0,
+            "batches": 0,
+            "last_user_id": None,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        }
+        result = await db.broadcast_jobs.insert_one(job)
+        self._launch(db, result.inserted_id)
+        return result.inserted_id
+
+    async def get(self, db, job_id: str) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(job_id):
+            return None
+        return await db.broadcast_jobs.find_one({"_id": ObjectId(job_id)}, JOB_PROJECTION)
+
+    async def resume(self, db) -> int:
+        """Retomar trabajos interrumpidos o abandonados (cada uno lo toma un solo worker)"""
+        resumed = 0
+        while True:
+            job = await db.broadcast_jobs.find_one_and_update(
+                {"$or": [
+                    {"status": "interrupted"},
+                    {"status": {"$in": ["queued", "running"]}, "updated_at": {"$lt": datetime.utcnow() - STALE_JOB_AFTER}},
+                ]},
+                {"$set": {"status": "queued", "updated_at": datetime.utcnow()}},
+                projection={"_id": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is None:
+                return resumed
+            self._launch(db, job["_id"])
+            resumed += 1
+
+    def _launch(self, db, job_id: ObjectId) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent_jobs)
+        task = asyncio.create_task(self._run(db, job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def stop(self) -> None:
+        """Cancelar los trabajos en curso; quedan como `interrupted` para retomarlos"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, db, job_id: ObjectId) -> None:
+        async with self._slots:
+            job = await db.broadcast_jobs.find_one_and_update(
+                {"_id": job_id, "status": "queued"},
+                {"$set": {"status": "running", "updated_at": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is None:
+                return
+            if job.get("started_at") is None:
+                await db.broadcast_jobs.update_one({"_id": job_id}, {"$set": {"started_at": datetime.utcnow()}})
+
+            try:
+                await self._send(db, job)
+            except asyncio.CancelledError:
+                await db.broadcast_jobs.update_one(
+                    {"_id": job_id}, {"$set": {"status": "interrupted", "updated_at": datetime.utcnow()}}
+                )
+                raise
+            except Exception as e:
+                # Cualquier error (no solo de MongoDB) deja el trabajo como fallido, no "running"
+                self.jobs_failed += 1
+                logger.error(f"Error en el envío masivo {job_id}: {e}")
+                await db.broadcast_jobs.update_one(
+                    {"_id": job_id},
+                    {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()}},
+                )
+                return
+
+            self.jobs_completed += 1
+            await db.broadcast_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "done", "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+            )
+
+    async def _send(self, db, job: Dict[str, Any]) -> None:
+        query = build_user_query(job["filter"])
+        if job.get("last_user_id") is not None:
+            # Reanudación: continuar después del último usuario ya procesado
+            query["_id"] = {"$gt": job["last_user_id"]}
+
+        cursor = db.users.find(query, {"_id": 1}, batch_size=self.batch_size).sort("_id", ASCENDING)
+        sent = job.get("sent", 0)
+        batches = job.get("batches", 0)
+        started = time.perf_counter()
+        sent_here = 0
+        user_ids: List[ObjectId] = []
+
+        async def flush() -> None:
+            nonlocal sent, batches, sent_here
+            created_at = datetime.utcnow()
+            notifications = [
+                {
+                    "user_id": str(user_id),
+                    "title": job["title"],
+                    "message": job["message"],
+                    "type": job["type"],
+                    "read": False,
+                    "created_at": created_at,
+                    "broadcast_id": job["_id"],
+                }
+                for user_id in user_ids
+            ]
+            error: Optional[BulkWriteError] = None
+            try:
+                # insert_many agrega "_id" a cada notificación
+                await db.notifications.insert_many(notifications, ordered=False)
+            except BulkWriteError as e:
+                # ordered=False: se insertó todo lo que no figura en writeErrors; los contadores
+                # se ajustan para esas y después el trabajo queda como fallido
+                failed = {write_error["index"] for write_error in e.details.get("writeErrors", [])}
+                notifications = [n for index, n in enumerate(notifications) if index not in failed]
+                error = e
+            if notifications:
+                # Contadores de no leídas: un solo bulk_write por lote
+                await db.notification_counters.bulk_write(
+                    [UpdateOne({"_id": n["user_id"]}, {"$inc": {"unread": 1}}, upsert=True) for n in notifications],
+                    ordered=False,
+                )
+                await event_hub.publish_many(
+                    [n["user_id"] for n in notifications],
+                    "notification",
+                    [event_payload(n["_id"], n) for n in notifications],
+                )
+            sent += len(notifications)
+            sent_here += len(notifications)
+            batches += 1
+            self.notifications_sent += len(notifications)
+            elapsed = time.perf_counter() - started
+            self.last_rate_per_sec = round(sent_here / elapsed, 1) if elapsed > 0 else 0.0
+            await db.broadcast_jobs.update_one(
+                {"_id": job["_id"]},
+                {"$set": {
+                    "sent": sent,
+                    "batches": batches,
+                    "last_user_id": user_ids[-1],
+                    "rate_per_sec": self.last_rate_per_sec,
+                    "updated_at": datetime.utcnow(),
+                }},
+            )
+            user_ids.clear()
+            if error is not None:
+                raise error
+
+        async for user in cursor:
+            user_ids.append(user["_id"])
+            if len(user_ids) >= self.batch_size:
+                await flush()
+        if user_ids:
+            await flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_jobs": len(self._tasks),
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+            "notifications_sent": self.notifications_sent,
+            "last_rate_per_sec": self.last_rate_per_sec,
+        }
+
+
+broadcast_engine = BroadcastEngine(
+    batch_size=settings.BROADCAST_BATCH_SIZE,
+    max_concurrent_jobs=settings.BROADCAST_MAX_CONCURRENT_JOBS,
+)
+register_metrics("broadcasts", broadcast_engine.stats)
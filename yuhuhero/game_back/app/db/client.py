@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from app.core.config import settings
+from app.core.metrics import register_metrics
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Estadísticas del pool de conexiones, en especial la espera para obtener una conexión.
+    Motor ejecuta cada operación de pymongo en un hilo: el checkout empieza y termina
+    en el mismo hilo, por eso el inicio se guarda en una variable thread-local.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.connections_open = 0
+        self.connections_in_use = 0
+        self.pool_clears = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._slow_waits = 0  # Esperas > 10 ms: señal de pool pequeño
+
+    def connection_check_out_started(self, event):
+        self._local.started_at = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started_at = getattr(self._local, "started_at", None)
+        wait = time.perf_counter() - started_at if started_at is not None else 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.connections_in_use += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            if wait > 0.010:
+                self._slow_waits += 1
+
+    def connection_check_out_failed(self, event):
+        reason = str(event.reason)
+        with self._lock:
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.connections_in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            checkouts = self.checkouts or 1
+            return {
+                "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+                "connections_open": self.connections_open,
+                "connections_in_use": self.connections_in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "avg_checkout_wait_ms": round(self._total_wait / checkouts * 1000, 3),
+                "max_checkout_wait_ms": round(self._max_wait * 1000, 3),
+                "slow_checkouts": self._slow_waits,
+                "pool_clears": self.pool_clears,
+            }
+
+
+pool_stats = PoolStatsListener()
+register_metrics("mongo_pool", pool_stats.stats)
+
+
+def mongo_client_options() -> Dict[str, Any]:
+    """Opciones del driver a partir de la configuración"""
+    options: Dict[str, Any] = {
+        "appname": settings.MONGO_APP_NAME,
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxConnecting": settings.MONGO_MAX_CONNECTING,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+    }
+    if settings.MONGO_MAX_IDLE_TIME_MS is not None:
+        options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_SOCKET_TIMEOUT_MS is not None:
+        options["socketTimeoutMS"] = settings.MONGO_SOCKET_TIMEOUT_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+        options["zlibCompressionLevel"] = settings.MONGO_ZLIB_COMPRESSION_LEVEL
+    return options
+
+
+def create_mongo_client(url: Optional[str] = None) -> AsyncIOMotorClient:
+    """Crear un cliente de MongoDB con el perfil de pool configurado"""
+    return AsyncIOMotorClient(
+        url or settings.MONGODB_URL,
+        event_listeners=[pool_stats],
+        **mongo_client_options()
+    )
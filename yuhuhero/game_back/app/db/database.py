@@ -1,5 +1,6 @@
-from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
+from app.db.client import create_mongo_client
+from app.db.repositories.users import UserRepository
 from bson.objectid import ObjectId
 
 client = None
@@ -15,7 +16,7 @@ async def connect_to_mongo():
     """Conectar a MongoDB al iniciar la aplicación"""
     global client, db, users_collection, quiz_collection, game_collection, notifications_collection
     try:
-        client = AsyncIOMotorClient(settings.MONGODB_URL)
+        client = create_mongo_client(settings.MONGODB_URL)
         db = client[settings.DATABASE_NAME]
         
         # Inicializar colecciones
@@ -43,11 +44,8 @@ def get_database():
 async def get_user_by_id(user_id: str):
     """Obtener usuario por ID"""
     try:
-        # Convertir string a ObjectId si es necesario
-        if ObjectId.is_valid(user_id):
-            return await users_collection.find_one({"_id": ObjectId(user_id)})
-        else:
-            return await users_collection.find_one({"id": user_id})
+        # Tras la migración canonical_user_ids el _id es siempre un ObjectId
+        return await UserRepository(db).get_profile(user_id)
     except Exception as e:
         print(f"Error obteniendo usuario por ID: {e}")
         return None 
\ No newline at end of file
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import DESCENDING, CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from app.core.config import settings
+from app.core.events import Broker, Event, LocalBroker
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = "events"
+
+
+class MongoEventBroker(Broker):
+    """
+    Broker entre workers sobre una colección capada de MongoDB: publicar es un insert y
+    cada proceso lee los eventos nuevos con un cursor tailable (sin consultas periódicas).
+    La colección capada descarta sola los eventos más antiguos.
+    El orden es el natural (el de inserción en el servidor), no el `_id`: los ObjectId los
+    genera cada cliente con su reloj, y un worker atrasado quedaría detrás del marcador.
+    El `_id` solo identifica el último evento entregado para retomar desde ahí.
+    """
+
+    def __init__(self, db, size_bytes: int = 16 * 1024 * 1024, retry_interval: float = 1.0):
+        self.db = db
+        self.size_bytes = size_bytes
+        self.retry_interval = retry_interval
+        self._deliver: Optional[Callable[[List[Event]], None]] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.received = 0
+        self.failures = 0
+
+    async def start(self, deliver: Callable[[List[Event]], None]) -> None:
+        self._deliver = deliver
+        try:
+            await self.db.create_collection(EVENTS_COLLECTION, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # Ya existe
+        if self._task is None:
+            self._task = asyncio.create_task(self._tail(await self._last_id()))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, events: List[Event]) -> None:
+        try:
+            await self.db[EVENTS_COLLECTION].insert_many(events, ordered=False)
+        except PyMongoError as e:
+            # Un aviso perdido no debe hacer fallar la escritura que lo originó
+            self.failures += 1
+            logger.error(f"Error publicando eventos: {e}")
+
+    async def _last_id(self) -> Optional[ObjectId]:
+        """`_id` del último evento en orden natural (None si la colección está vacía)"""
+        last = await self.db[EVENTS_COLLECTION].find_one({}, {"_id": 1}, sort=[("$natural", DESCENDING)])
+        return last["_id"] if last else None
+
+    async def _tail(self, after: Optional[ObjectId]) -> None:
+        """Entregar los eventos insertados después de `after` (en orden natural)"""
+        events = self.db[EVENTS_COLLECTION]
+        while True:
+            try:
+                if after is not None and await events.find_one({"_id": after}, {"_id": 1}) is None:
+                    # El último entregado ya salió de la colección capada: seguir desde el final actual
+                    after = await self._last_id()
+                # Sin filtro por `_id`: se saltan los eventos hasta encontrar `after`
+                skipping = after is not None
+                cursor = events.find({}, {"user_id": 1, "type": 1, "data": 1}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for event in cursor:
+                        event_id = event.pop("_id")
+                        if skipping:
+                            skipping = event_id != after
+                            continue
+                        after = event_id
+                        self.received += 1
+                        self._deliver([event])
+            except PyMongoError as e:
+                self.failures += 1
+                logger.error(f"Error leyendo eventos: {e}")
+            # El cursor muere si la colección está vacía o se pierde la conexión: reabrir
+            await asyncio.sleep(self.retry_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tailing": self._task is not None, "received": self.received, "broker_failures": self.failures}
+
+
+def make_broker(db) -> Broker:
+    """Broker configurado en EVENTS_BROKER"""
+    if settings.EVENTS_BROKER == "mongo":
+        return MongoEventBroker(db, size_bytes=settings.EVENTS_CAPPED_SIZE_BYTES)
+    return LocalBroker()
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from app.core.catalog import CatalogEntry, encode_catalog
+from app.core.config import settings
+from app.core.metrics import register_metrics
+from app.db.level_bits import level_index
+from app.db.repositories.game_maps import GameMapRepository
+
+logger = logging.getLogger(__name__)
+
+# Documento marcador en `catalog_versions`: se incrementa cada vez que cambia el mapa activo
+GAME_MAP_MARKER_ID = "game_map"
+
+# Mapa inicial; los IDs de casilla son fijos para que todos los workers coincidan
+DEFAULT_MAP_TILES: List[Dict[str, Any]] = [
+    {
+        "id": "tile-1",
+        "title": "Introducción a Finanzas",
+        "description": "Aprende los conceptos básicos de finanzas",
+        "position_x": 0,
+        "position_y": 0,
+        "type": "quiz",
+        "rewards": 50,
+        "mission_id": "finance-intro"
+    },
+    {
+        "id": "tile-2",
+        "title": "Presupuesto Personal",
+        "description": "Aprende a crear un presupuesto personal",
+        "position_x": 1,
+        "position_y": 1,
+        "type": "lesson",
+        "rewards": 30,
+        "mission_id": "personal-budget"
+    },
+    {
+        "id": "tile-3",
+        "title": "Ahorro",
+        "description": "Descubre estrategias de ahorro efectivas",
+        "position_x": 2,
+        "position_y": 0,
+        "type": "challenge",
+        "rewards": 70,
+        "mission_id": "saving-strategies"
+    },
+    {
+        "id": "tile-4",
+        "title": "Inversión Básica",
+        "description": "Conoce los fundamentos de la inversión",
+        "position_x": 3,
+        "position_y": 1,
+        "type": "lesson",
+        "rewards": 40,
+        "mission_id": "investment-basics"
+    },
+    {
+        "id": "tile-5",
+        "title": "Deudas Inteligentes",
+        "description": "Aprende a manejar tus deudas",
+        "position_x": 4,
+        "position_y": 0,
+        "type": "quiz",
+        "rewards": 60,
+        "mission_id": "smart-debt"
+    }
+]
+
+
+class GameMapStore:
+    """
+    Mapa activo en memoria (por proceso), ya codificado con su ETag. Se carga una vez
+    y se recarga solo cuando cambia la versión del marcador, observada con un change
+    stream o, en un mongod standalone, consultando el marcador cada pocos segundos.
+    """
+
+    def __init__(self, poll_interval: float = 5.0, watch_mode: str = "auto"):
+        self.poll_interval = poll_interval
+        self.watch_mode = watch_mode
+        self.entry: Optional[CatalogEntry] = None
+        self.version: Optional[int] = None
+        self.mode: Optional[str] = None  # "change_stream" o "polling" mientras observa
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        self.loads = 0
+        self.checks = 0
+        self.failures = 0
+
+    async def start(self, db) -> None:
+        """Cargar el mapa e iniciar la observación del marcador de versión"""
+        self._db = db
+        await self.reload()
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self.mode = None
+
+    async def get_entry(self, db) -> CatalogEntry:
+        """Mapa codificado; solo consulta MongoDB si aún no se ha cargado en este proceso"""
+        if self.entry is None:
+            async with self._lock:
+                if self.entry is None:
+                    self._db = self._db or db
+                    await self.reload()
+        return self.entry
+
+    async def reload(self) -> None:
+        """Leer versión y mapa activo (sembrándolo si no existe) y recodificar"""
+        version = await self._read_version()
+        repository = GameMapRepository(self._db)
+        game_map = await repository.get_active()
+        if game_map is None:
+            await repository.create({"tiles": DEFAULT_MAP_TILES, "active": True})
+            game_map = {"tiles": DEFAULT_MAP_TILES}
+
+        self.entry = encode_catalog({"tiles": game_map["tiles"]})
+        # Solo las casillas del mapa reciben posición en el bitset de niveles (al cargarlo)
+        await level_index.register_tiles(self._db, (tile["id"] for tile in game_map["tiles"] if "id" in tile))
+        self.version = version
+        self.loads += 1
+
+    async def _read_version(self) -> int:
+        marker = await self._db.catalog_versions.find_one({"_id": GAME_MAP_MARKER_ID}, {"version": 1})
+        return marker["version"] if marker else 0
+
+    async def _watch(self) -> None:
+        if self.watch_mode in ("auto", "change_stream"):
+            try:
+                await self._watch_change_stream()
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                # Los change streams requieren replica set: en standalone se consulta el marcador
+                if self.watch_mode == "change_stream":
+                    logger.error(f"Change stream del mapa no disponible: {e}")
+                    self.mode = None
+                    return
+                logger.info(f"Change stream del mapa no disponible, usando consulta periódica: {e}")
+        await self._poll()
+
+    async def _watch_change_stream(self) -> None:
+        pipeline = [{"$match": {"documentKey._id": GAME_MAP_MARKER_ID}}]
+        async with self._db.catalog_versions.watch(pipeline) as stream:
+            self.mode = "change_stream"
+            # Un cambio entre la carga inicial y la apertura del stream no se perdería de vista
+            await self._check()
+            async for _ in stream:
+                await self._check()
+
+    async def _poll(self) -> None:
+        self.mode = "polling"
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self._check()
+
+    async def _check(self) -> None:
+        self.checks += 1
+        try:
+            if await self._read_version() != self.version:
+                await self.reload()
+        except PyMongoError as e:
+            self.failures += 1
+            logger.error(f"Error recargando el mapa del juego: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.entry is not None,
+            "version": self.version,
+            "etag": self.entry.etag if self.entry else None,
+            "mode": self.mode,
+            "loads": self.loads,
+            "checks": self.checks,
+            "failures": self.failures,
+        }
+
+
+async def publish_game_map(db, tiles: List[Dict[str, Any]]) -> int:
+    """
+    Activar un mapa nuevo e incrementar la versión del marcador; cada worker lo recarga
+    al ver el cambio. Devuelve la nueva versión.
+    """
+    # Primero el mapa nuevo y después se desactivan los anteriores: nunca hay un instante
+    # sin mapa activo, y con publicaciones simultáneas queda activo solo el más reciente
+    new_id = await GameMapRepository(db).create({"tiles": tiles, "active": True})
+    await db.game_maps.update_many({"active": True, "_id": {"$lt": new_id}}, {"$set": {"active": False}})
+    marker = await db.catalog_versions.find_one_and_update(
+        {"_id": GAME_MAP_MARKER_ID},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return marker["version"]
+
+
+game_map_store = GameMapStore(
+    poll_interval=settings.GAME_MAP_POLL_INTERVAL_SECONDS,
+    watch_mode=settings.GAME_MAP_WATCH_MODE,
+)
+register_metrics("game_map", game_map_store.stats)
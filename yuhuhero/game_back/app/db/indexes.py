@@ -0,0 +1,162 @@
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec(NamedTuple):
+    """Índice requerido por las consultas de la aplicación"""
+    collection: str
+    keys: List[Tuple[str, int]]
+    name: str
+    unique: bool = False
+    options: Optional[Dict[str, Any]] = None
+
+    def to_model(self) -> IndexModel:
+        return IndexModel(self.keys, name=self.name, unique=self.unique, **(self.options or {}))
+
+
+# Registro declarativo de índices: cada consulta caliente debe tener aquí su índice
+INDEXES: List[IndexSpec] = [
+    # Login y registro: find_one({"phone": ...})
+    IndexSpec("users", [("phone", ASCENDING)], "users_phone_unique", unique=True),
+    # Progreso del juego: un documento por usuario
+    IndexSpec("game_progress", [("user_id", ASCENDING)], "game_progress_user_id_unique", unique=True),
+    # Ranking: top-N cubierto con sort coins desc, user_id asc; count de jugadores con más monedas
+    IndexSpec(
+        "game_progress",
+        [("coins", DESCENDING), ("user_id", ASCENDING)],
+        "game_progress_coins_user_id",
+    ),
+    # Ranking en memoria: cambios recientes de otros workers ({"last_updated": {"$gt": ...}})
+    IndexSpec("game_progress", [("last_updated", ASCENDING)], "game_progress_last_updated"),
+    # Sincronización incremental: cambios de un usuario posteriores a una versión
+    IndexSpec(
+        "progress_changes",
+        [("user_id", ASCENDING), ("version", ASCENDING)],
+        "progress_changes_user_id_version_unique",
+        unique=True,
+    ),
+    IndexSpec(
+        "progress_changes",
+        [("at", ASCENDING)],
+        "progress_changes_at_ttl",
+        options={"expireAfterSeconds": settings.PROGRESS_CHANGES_TTL_SECONDS},
+    ),
+    # Bitset de niveles: posición -> casilla al decodificar (la posición nunca se repite)
+    IndexSpec("level_indices", [("index", ASCENDING)], "level_indices_index_unique", unique=True),
+    # Registro de eventos: cola de eventos de un usuario posteriores a su snapshot
+    IndexSpec("progress_events", [("user_id", ASCENDING), ("_id", ASCENDING)], "progress_events_user_id_id"),
+    # Bandeja de notificaciones: paginación por cursor sobre (created_at, _id) descendente
+    IndexSpec(
+        "notifications",
+        [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        "notifications_user_id_created_at_id",
+    ),
+    IndexSpec("quiz_results", [("user_id", ASCENDING), ("quiz_id", ASCENDING)], "quiz_results_user_id_quiz_id"),
+    # Historial de respuestas: intentos de un usuario en un quiz del más reciente al más antiguo
+    IndexSpec(
+        "quiz_responses",
+        [("user_id", ASCENDING), ("quiz_id", ASCENDING), ("submitted_at", DESCENDING)],
+        "quiz_responses_user_id_quiz_id_submitted_at",
+    ),
+    # Historial sin filtrar por quiz: el índice anterior obligaría a ordenar en memoria
+    IndexSpec(
+        "quiz_responses",
+        [("user_id", ASCENDING), ("submitted_at", DESCENDING)],
+        "quiz_responses_user_id_submitted_at",
+    ),
+    IndexSpec("game_maps", [("active", ASCENDING)], "game_maps_active"),
+]
+
+if settings.NOTIFICATIONS_READ_TTL_DAYS > 0:
+    # Retención: MongoDB borra las notificaciones leídas N días después de `read_at`
+    # (parcial: las no leídas no tienen `read_at` y no ocupan el índice)
+    INDEXES.append(IndexSpec(
+        "notifications",
+        [("read_at", ASCENDING)],
+        "notifications_read_at_ttl",
+        options={
+            "expireAfterSeconds": settings.NOTIFICATIONS_READ_TTL_DAYS * 24 * 3600,
+            "partialFilterExpression": {"read": True},
+        },
+    ))
+
+# Código de MongoDB cuando el índice existe con otras opciones
+INDEX_OPTIONS_CONFLICT = 85
+
+
+def _key_pattern(keys) -> List[Tuple[str, Any]]:
+    return [(field, direction) for field, direction in keys]
+
+
+async def ensure_indexes(db, specs: List[IndexSpec] = INDEXES) -> Dict[str, List[str]]:
+    """Crear los índices del registro que falten (operación idempotente)"""
+    report: Dict[str, List[str]] = {"ensured": [], "failed": []}
+    for spec in specs:
+        try:
+            await db[spec.collection].create_indexes([spec.to_model()])
+            report["ensured"].append(f"{spec.collection}.{spec.name}")
+        except OperationFailure as e:
+            if e.code == INDEX_OPTIONS_CONFLICT and "expireAfterSeconds" in (spec.options or {}):
+                # Cambió el tiempo de expiración: se ajusta sin reconstruir el índice
+                try:
+                    await db.command(
+                        "collMod",
+                        spec.collection,
+                        index={"name": spec.name, "expireAfterSeconds": spec.options["expireAfterSeconds"]},
+                    )
+                    report["ensured"].append(f"{spec.collection}.{spec.name}")
+                    continue
+                except OperationFailure as coll_mod_error:
+                    e = coll_mod_error
+            # P. ej. duplicados que impiden un índice único: no se aborta el arranque
+            logger.error(f"No se pudo crear el índice {spec.collection}.{spec.name}: {e}")
+            report["failed"].append(f"{spec.collection}.{spec.name}")
+    return report
+
+
+async def verify_indexes(db, specs: List[IndexSpec] = INDEXES) -> Dict[str, List[str]]:
+    """
+    Comparar los índices existentes con el registro.
+    • missing: índices del registro que no existen
+    • unused: índices existentes sin accesos según $indexStats (desde el último reinicio)
+    • unregistered: índices existentes que no están en el registro
+    """
+    report: Dict[str, List[str]] = {"missing": [], "unused": [], "unregistered": []}
+    collections = sorted({spec.collection for spec in specs})
+
+    for collection in collections:
+        existing = await db[collection].index_information()
+        existing_patterns = {name: _key_pattern(info["key"]) for name, info in existing.items()}
+
+        registered_names = set()
+        for spec in (s for s in specs if s.collection == collection):
+            match = next(
+                (name for name, keys in existing_patterns.items() if keys == _key_pattern(spec.keys)),
+                None,
+            )
+            if match is None:
+                report["missing"].append(f"{collection}.{spec.name}")
+            else:
+                registered_names.add(match)
+
+        for name in existing_patterns:
+            if name != "_id_" and name not in registered_names:
+                report["unregistered"].append(f"{collection}.{name}")
+
+        try:
+            stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+        except OperationFailure as e:
+            logger.warning(f"No se pudieron leer $indexStats de {collection}: {e}")
+            continue
+        for stat in stats:
+            if stat["name"] != "_id_" and stat.get("accesses", {}).get("ops", 0) == 0:
+                report["unused"].append(f"{collection}.{stat['name']}")
+
+    return report
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.core.metrics import register_metrics
+from app.core.rank_tree import RankTree
+from app.db.progress_buffer import progress_buffer
+from app.db.repositories.leaderboard import LeaderboardRepository
+
+logger = logging.getLogger(__name__)
+
+# Margen al releer cambios: cubre escrituras en curso y diferencias de reloj entre servidores
+CATCH_UP_OVERLAP = timedelta(seconds=10)
+
+
+def _build_tree(coins: Dict[str, int]) -> RankTree:
+    return RankTree(sorted((-amount, user_id) for user_id, amount in coins.items()))
+
+
+class Leaderboard:
+    """
+    Ranking por monedas en memoria (por proceso). Las claves (-monedas, user_id) se
+    guardan en un árbol de estadística de orden: la posición de un jugador es el número
+    de claves menores + 1, en O(log n). Se carga una vez, recibe las escrituras de este
+    proceso desde ProgressRepository y recoge las de otros workers consultando
+    `last_updated` cada pocos segundos.
+    """
+
+    def __init__(self, poll_interval: float = 5.0):
+        self.poll_interval = poll_interval
+        self.loaded = False
+        self._tree = RankTree()
+        self._coins: Dict[str, int] = {}
+        self._pending: Optional[Dict[str, int]] = None  # Escrituras recibidas durante la carga
+        self._watermark: Optional[datetime] = None
+        self._repository: Optional[LeaderboardRepository] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.updates = 0
+        self.catch_ups = 0
+        self.failures = 0
+        self.load_ms = 0.0
+
+    def start(self, db) -> None:
+        """Cargar en segundo plano; mientras tanto `rank` consulta MongoDB"""
+        if self._task is None:
+            self._repository = LeaderboardRepository(db)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def record(self, user_id: str, coins: int) -> None:
+        """Registrar el saldo de monedas resultante de una escritura de progreso"""
+        if self.loaded:
+            self._set(str(user_id), coins)
+        elif self._pending is not None:
+            self._pending[str(user_id)] = coins
+
+    def _set(self, user_id: str, coins: int) -> None:
+        previous = self._coins.get(user_id)
+        if previous == coins:
+            return
+        if previous is not None:
+            self._tree.remove((-previous, user_id))
+        self._tree.insert((-coins, user_id))
+        self._coins[user_id] = coins
+        self.updates += 1
+
+    async def rank(self, db, user_id: str) -> Dict[str, Any]:
+        """Posición del jugador (empates comparten posición) y total de jugadores"""
+        user_id = str(user_id)
+        if self.loaded:
+            coins = self._coins.get(user_id, 0)
+            # (-monedas, "") es menor que cualquier clave con esas monedas: cuenta solo a quienes tienen más
+            richer = self._tree.count_less((-coins, ""))
+            total = len(self._tree)
+        else:
+            repository = LeaderboardRepository(db)
+            coins = await repository.get_coins(user_id)
+            richer = await repository.count_richer(coins)
+            total = await repository.count_players()
+        return {"user_id": user_id, "coins": coins, "rank": richer + 1, "total_players": total}
+
+    async def load(self) -> None:
+        self._pending = {}
+        started = datetime.utcnow()
+        timer = time.perf_counter()
+
+        coins = {row["user_id"]: row.get("coins", 0) async for row in self._repository.iter_coins()}
+        # Construir el árbol fuera del event loop (millones de nodos tardan unos segundos)
+        tree = await asyncio.get_event_loop().run_in_executor(None, _build_tree, coins)
+
+        self._tree, self._coins = tree, coins
+        pending, self._pending = self._pending, None
+        self.loaded = True
+        for user_id, amount in pending.items():
+            self._set(user_id, amount)
+        self._watermark = started - CATCH_UP_OVERLAP
+        self.load_ms = round((time.perf_counter() - timer) * 1000, 2)
+
+    async def catch_up(self) -> int:
+        """Aplicar los cambios hechos por otros workers desde la última consulta"""
+        started = datetime.utcnow()
+        applied = 0
+        async for row in self._repository.iter_coins(updated_since=self._watermark):
+            # Los cambios aún no escritos por este proceso tienen prioridad sobre lo leído
+            view = progress_buffer.overlay(row["user_id"], row)
+            self._set(row["user_id"], view.get("coins", 0))
+            applied += 1
+        self._watermark = started - CATCH_UP_OVERLAP
+        self.catch_ups += 1
+        return applied
+
+    async def _run(self) -> None:
+        while not self.loaded:
+            try:
+                await self.load()
+            except PyMongoError as e:
+                self.failures += 1
+                self._pending = None
+                logger.error(f"Error cargando el ranking: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.catch_up()
+            except PyMongoError as e:
+                self.failures += 1
+                logger.error(f"Error actualizando el ranking: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "players": len(self._tree),
+            "updates": self.updates,
+            "catch_ups": self.catch_ups,
+            "failures": self.failures,
+            "load_ms": self.load_ms,
+        }
+
+
+leaderboard = Leaderboard(poll_interval=settings.LEADERBOARD_POLL_INTERVAL_SECONDS)
+register_metrics("leaderboard", leaderboard.stats)
@@ -0,0 +1,193 @@
+import base64
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from bson.int64 import Int64
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.metrics import register_metrics
+
+# Niveles completados como bitset: cada casilla tiene una posición estable (colección
+# `level_indices`) y `completed_bits` guarda palabras de 64 bits {"w0": ..., "w1": ...}.
+# Marcar un nivel es un `$bit or` sobre una sola palabra: el costo de escritura no crece
+# con el número de niveles completados.
+WORD_BITS = 64
+BITS_FIELD = "completed_bits"
+LEVEL_COUNTER_ID = "level_index"
+
+
+def _word_key(word: int) -> str:
+    return f"w{word}"
+
+
+def _signed(value: int) -> Int64:
+    # MongoDB guarda enteros de 64 bits con signo: el bit 63 se representa como negativo
+    return Int64(value - (1 << WORD_BITS) if value >= 1 << (WORD_BITS - 1) else value)
+
+
+def encode_words(positions: Iterable[int]) -> Dict[str, Int64]:
+    words: Dict[int, int] = {}
+    for position in positions:
+        words[position // WORD_BITS] = words.get(position // WORD_BITS, 0) | (1 << (position % WORD_BITS))
+    return {_word_key(word): _signed(value) for word, value in sorted(words.items())}
+
+
+def bit_updates(positions: Iterable[int]) -> Dict[str, Dict[str, Int64]]:
+    """Operador `$bit` que enciende las posiciones indicadas (una entrada por palabra)"""
+    return {f"{BITS_FIELD}.{key}": {"or": value} for key, value in encode_words(positions).items()}
+
+
+def decode_words(words: Optional[Dict[str, Any]]) -> List[int]:
+    positions: List[int] = []
+    for key, value in (words or {}).items():
+        word = int(key[1:])
+        value = int(value) & ((1 << WORD_BITS) - 1)
+        while value:
+            low = value & -value
+            positions.append(word * WORD_BITS + low.bit_length() - 1)
+            value ^= low
+    return sorted(positions)
+
+
+def compact_bits(positions: Iterable[int]) -> str:
+    """Bitset en base64 (bit p = byte p // 8, bit p % 8), sin bytes finales a cero"""
+    positions = sorted(positions)
+    data = bytearray(positions[-1] // 8 + 1 if positions else 0)
+    for position in positions:
+        data[position // 8] |= 1 << (position % 8)
+    return base64.b64encode(bytes(data)).decode("ascii")
+
+
+class UnknownLevelError(ValueError):
+    """Casilla que no pertenece al mapa del juego"""
+
+
+class LevelIndex:
+    """
+    Posición estable de cada casilla en el bitset, compartida por todos los workers.
+    Las posiciones se asignan una sola vez con un contador en MongoDB y se guardan en
+    memoria; nunca se reutilizan ni cambian. Solo se asignan a casillas del mapa
+    (`allow_tiles`): un ID arbitrario enviado por un cliente no ocupa un bit para siempre.
+    """
+
+    def __init__(self):
+        self._positions: Dict[str, int] = {}
+        self._tiles: Dict[int, str] = {}
+        self._allowed: Set[str] = set()
+        self.allocations = 0
+        self.rejected = 0
+
+    def allow_tiles(self, tile_ids: Iterable[str]) -> None:
+        """Registrar casillas del mapa a las que se les puede asignar posición"""
+        self._allowed.update(str(tile_id) for tile_id in tile_ids)
+
+    async def register_tiles(self, db, tile_ids: Iterable[str]) -> None:
+        """
+        Permitir las casillas del mapa y asignarles posición ya (con o sin PROGRESS_LEVELS_BITSET):
+        así `?levels=compact` funciona también cuando los niveles se guardan como lista
+        """
+        tile_ids = [str(tile_id) for tile_id in tile_ids]
+        self.allow_tiles(tile_ids)
+        await self.positions(db, tile_ids, trusted=True)
+
+    def check(self, tile_ids: Iterable[str]) -> None:
+        """UnknownLevelError si alguna casilla no es del mapa ni tiene ya posición"""
+        unknown = [tile_id for tile_id in tile_ids if tile_id not in self._allowed and tile_id not in self._positions]
+        if unknown:
+            self.rejected += 1
+            raise UnknownLevelError(f"Niveles desconocidos: {', '.join(map(str, unknown[:5]))}")
+
+    def _remember(self, tile_id: str, position: int) -> None:
+        self._positions[tile_id] = position
+        self._tiles[position] = tile_id
+
+    async def load(self, db) -> Dict[str, int]:
+        async for entry in db.level_indices.find({}, {"index": 1}):
+            self._remember(entry["_id"], entry["index"])
+        return dict(self._positions)
+
+    async def _lookup(self, db, tile_ids: List[str]) -> None:
+        missing = [tile_id for tile_id in tile_ids if tile_id not in self._positions]
+        if missing:
+            async for entry in db.level_indices.find({"_id": {"$in": missing}}, {"index": 1}):
+                self._remember(entry["_id"], entry["index"])
+
+    async def positions(self, db, tile_ids: Iterable[str], trusted: bool = False) -> List[int]:
+        """
+        Posiciones de las casillas, asignando las que aún no tienen. Solo se asignan a
+        casillas del mapa (si no, UnknownLevelError); `trusted` es para datos ya guardados
+        (migración, compactador), que se convierten tal cual.
+        """
+        tile_ids = list(tile_ids)
+        await self._lookup(db, tile_ids)
+        missing = [tile_id for tile_id in dict.fromkeys(tile_ids) if tile_id not in self._positions]
+        if not trusted:
+            self.check(missing)
+        for tile_id in missing:
+            await self._allocate(db, tile_id)
+        return [self._positions[tile_id] for tile_id in tile_ids]
+
+    async def known_positions(self, db, tile_ids: Iterable[str]) -> List[int]:
+        """Posiciones de las casillas que ya tienen una (nunca asigna: apto para lecturas)"""
+        tile_ids = list(tile_ids)
+        await self._lookup(db, tile_ids)
+        return [self._positions[tile_id] for tile_id in tile_ids if tile_id in self._positions]
+
+    async def _allocate(self, db, tile_id: str) -> None:
+        counter = await db.counters.find_one_and_update(
+            {"_id": LEVEL_COUNTER_ID},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        try:
+            await db.level_indices.insert_one({"_id": tile_id, "index": counter["seq"] - 1})
+            self.allocations += 1
+        except DuplicateKeyError:
+            pass  # Otro worker la asignó antes: esa posición es la válida
+        entry = await db.level_indices.find_one({"_id": tile_id}, {"index": 1})
+        self._remember(tile_id, entry["index"])
+
+    async def tiles(self, db, positions: Iterable[int]) -> List[str]:
+        """IDs de casilla de las posiciones indicadas (en el mismo orden)"""
+        positions = list(positions)
+        unknown = [position for position in positions if position not in self._tiles]
+        if unknown:
+            async for entry in db.level_indices.find({"index": {"$in": unknown}}, {"index": 1}):
+                self._remember(entry["_id"], entry["index"])
+        return [self._tiles[position] for position in positions if position in self._tiles]
+
+    def cached_position(self, tile_id: str) -> Optional[int]:
+        return self._positions.get(tile_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tiles": len(self._positions),
+            "allowed": len(self._allowed),
+            "allocations": self.allocations,
+            "rejected": self.rejected,
+        }
+
+
+level_index = LevelIndex()
+register_metrics("level_index", level_index.stats)
+
+
+async def decode_progress(db, progress: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Vista con `completed_levels` expandido (bitset más la lista heredada, si la hay)"""
+    if progress is None or (BITS_FIELD not in progress and "completed_levels" in progress):
+        return progress
+    view = dict(progress)
+    completed = list(view.get("completed_levels") or [])
+    seen = set(completed)
+    for tile_id in await level_index.tiles(db, decode_words(view.pop(BITS_FIELD, None))):
+        if tile_id not in seen:
+            completed.append(tile_id)
+            seen.add(tile_id)
+    view["completed_levels"] = completed
+    return view
+
+
+async def compact_levels(db, tile_ids: Iterable[str]) -> str:
+    """Forma compacta (base64) de una lista de niveles completados (omite casillas sin posición)"""
+    return compact_bits(await level_index.known_positions(db, tile_ids))
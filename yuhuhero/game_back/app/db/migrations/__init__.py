@@ -0,0 +1 @@
+# Módulo migrations
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Canonicaliza los identificadores de usuario.
+
+Representación canónica tras la migración:
+• users._id es siempre un ObjectId y no existe el campo redundante `id`
+• game_progress.user_id (y las referencias en notifications / quiz_results)
+  es siempre str(users._id)
+• hay un único documento de game_progress por usuario
+
+Con esto la capa de datos usa una sola forma de consulta por operación.
+"""
+import logging
+from typing import Dict, List
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.db.migrations.history import mark_applied
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "canonical_user_ids"
+
+# Colecciones que referencian al usuario por `user_id`
+REFERENCING_COLLECTIONS = ["game_progress", "notifications", "quiz_results"]
+
+
+async def _flush(collection, ops: List[UpdateOne], dry_run: bool) -> None:
+    if ops and not dry_run:
+        await collection.bulk_write(ops, ordered=False)
+    ops.clear()
+
+
+async def _canonicalize_user_documents(db, aliases: Dict[str, str], report: dict, dry_run: bool) -> None:
+    # _id que no son ObjectId: se reinsertan con un ObjectId (el mismo valor si es hex válido)
+    async for user in db.users.find({"_id": {"$not": {"$type": "objectId"}}}):
+        old_id = user["_id"]
+        new_id = ObjectId(old_id) if isinstance(old_id, str) and ObjectId.is_valid(old_id) else ObjectId()
+        aliases[str(old_id)] = str(new_id)
+        report["users_id_converted"] += 1
+        if dry_run:
+            continue
+
+        user["_id"] = new_id
+        user.pop("id", None)
+        # Borrar antes de insertar: el índice único de `phone` impide tener ambos
+        await db.users.delete_one({"_id": old_id})
+        try:
+            await db.users.insert_one(user)
+        except Exception:
+            user["_id"] = old_id
+            await db.users.insert_one(user)
+            raise
+
+    # Campo `id` redundante: se registra como alias y se elimina
+    ops: List[UpdateOne] = []
+    async for user in db.users.find({"id": {"$exists": True}}, {"id": 1}):
+        if str(user["id"]) != str(user["_id"]):
+            aliases[str(user["id"])] = str(user["_id"])
+        ops.append(UpdateOne({"_id": user["_id"]}, {"$unset": {"id": ""}}))
+        report["users_id_field_removed"] += 1
+        if len(ops) >= 1000:
+            await _flush(db.users, ops, dry_run)
+    await _flush(db.users, ops, dry_run)
+
+
+async def _canonicalize_references(db, aliases: Dict[str, str], report: dict, dry_run: bool) -> None:
+    for name in REFERENCING_COLLECTIONS:
+        collection = db[name]
+
+        # user_id guardado como ObjectId (u otro tipo): pasar a string
+        ops: List[UpdateOne] = []
+        async for doc in collection.find({"user_id": {"$not": {"$type": "string"}}}, {"user_id": 1}):
+            if doc.get("user_id") is None:
+                continue
+            canonical = aliases.get(str(doc["user_id"]), str(doc["user_id"]))
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"user_id": canonical}}))
+            report["references_converted"] += 1
+            if len(ops) >= 1000:
+                await _flush(collection, ops, dry_run)
+        await _flush(collection, ops, dry_run)
+
+        # user_id que apuntaba a un identificador antiguo
+        for old_id, new_id in aliases.items():
+            if dry_run:
+                report["references_repointed"] += await collection.count_documents({"user_id": old_id})
+                continue
+            result = await collection.update_many({"user_id": old_id}, {"$set": {"user_id": new_id}})
+            report["references_repointed"] += result.modified_count
+
+
+async def _merge_duplicate_progress(db, aliases: Dict[str, str], report: dict, dry_run: bool) -> None:
+    # Las rutas antiguas con doble búsqueda pudieron crear más de un progreso por usuario
+    # (con user_id ObjectId y string, o con un ID antiguo). Se agrupan por el ID canónico y
+    # se conserva el progreso más alto sin duplicar monedas. Va antes de reescribir las
+    # referencias: si no, el índice único de `user_id` rechazaría la reescritura (E11000).
+    alias_keys = set(aliases) | set(aliases.values())
+    groups: Dict[str, List[ObjectId]] = {}
+    cursor = db.game_progress.aggregate(
+        [
+            {"$match": {"user_id": {"$ne": None}}},
+            {"$group": {"_id": {"$toString": "$user_id"}, "ids": {"$push": "$_id"}}},
+        ],
+        allowDiskUse=True,
+    )
+    async for group in cursor:
+        # Solo se guardan en memoria los grupos que pueden tener duplicados
+        if len(group["ids"]) > 1 or group["_id"] in alias_keys:
+            groups.setdefault(aliases.get(group["_id"], group["_id"]), []).extend(group["ids"])
+
+    for canonical, ids in groups.items():
+        if len(ids) < 2:
+            continue
+        report["progress_duplicates_merged"] += len(ids) - 1
+        if dry_run:
+            continue
+
+        docs = await db.game_progress.find({"_id": {"$in": ids}}).sort("_id", 1).to_list(None)
+        keep, rest = docs[0], docs[1:]
+        completed = list(keep.get("completed_levels", []))
+        for doc in rest:
+            completed.extend(level for level in doc.get("completed_levels", []) if level not in completed)
+
+        # Borrar antes de fijar el user_id canónico: el índice único impide tener ambos
+        await db.game_progress.delete_many({"_id": {"$in": [doc["_id"] for doc in rest]}})
+        await db.game_progress.update_one(
+            {"_id": keep["_id"]},
+            {"$set": {
+                "user_id": canonical,
+                "coins": max(doc.get("coins", 0) for doc in docs),
+                "current_level": max(doc.get("current_level", 1) for doc in docs),
+                "completed_levels": completed,
+            }},
+        )
+
+
+async def migrate_canonical_user_ids(db, dry_run: bool = False) -> dict:
+    """Ejecutar la migración (idempotente). Con dry_run solo se reporta lo que cambiaría."""
+    report = {
+        "dry_run": dry_run,
+        "users_id_converted": 0,
+        "users_id_field_removed": 0,
+        "references_converted": 0,
+        "references_repointed": 0,
+        "progress_duplicates_merged": 0,
+    }
+    aliases: Dict[str, str] = {}
+
+    await _canonicalize_user_documents(db, aliases, report, dry_run)
+    await _merge_duplicate_progress(db, aliases, report, dry_run)
+    await _canonicalize_references(db, aliases, report, dry_run)
+
+    if not dry_run:
+        await mark_applied(db, MIGRATION_ID, report)
+    logger.info(f"Migración {MIGRATION_ID}: {report}")
+    return report
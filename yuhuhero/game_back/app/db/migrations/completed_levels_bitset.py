@@ -0,0 +1,49 @@
+"""
+Convierte `game_progress.completed_levels` (lista de IDs de casilla) al bitset
+`completed_bits` usado con PROGRESS_LEVELS_BITSET.
+
+Cada documento se actualiza con `$bit or` (no pisa niveles marcados mientras tanto) y
+solo si su lista sigue igual a la leída; los que cambiaron se cuentan como omitidos y
+se convierten al volver a ejecutar la migración.
+"""
+from typing import List
+
+from pymongo import UpdateOne
+
+from app.db.level_bits import bit_updates, level_index
+from app.db.migrations.history import mark_applied
+
+MIGRATION_ID = "completed_levels_bitset"
+BATCH_SIZE = 1000
+
+
+async def _flush(collection, ops: List[UpdateOne], report: dict, dry_run: bool) -> None:
+    if ops and not dry_run:
+        result = await collection.bulk_write(ops, ordered=False)
+        report["skipped"] += len(ops) - result.matched_count
+    ops.clear()
+
+
+async def migrate_completed_levels_bitset(db, dry_run: bool = False) -> dict:
+    report = {"documents": 0, "levels": 0, "skipped": 0, "dry_run": dry_run}
+    ops: List[UpdateOne] = []
+
+    cursor = db.game_progress.find({"completed_levels": {"$exists": True}}, {"completed_levels": 1})
+    async for progress in cursor:
+        levels = list(progress.get("completed_levels") or [])
+        report["documents"] += 1
+        report["levels"] += len(levels)
+        if dry_run:
+            continue
+
+        update = {"$unset": {"completed_levels": ""}}
+        if levels:
+            update["$bit"] = bit_updates(await level_index.positions(db, levels, trusted=True))
+        ops.append(UpdateOne({"_id": progress["_id"], "completed_levels": progress["completed_levels"]}, update))
+        if len(ops) >= BATCH_SIZE:
+            await _flush(db.game_progress, ops, report, dry_run)
+
+    await _flush(db.game_progress, ops, report, dry_run)
+    if not dry_run:
+        await mark_applied(db, MIGRATION_ID, report)
+    return report
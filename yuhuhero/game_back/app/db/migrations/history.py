@@ -0,0 +1,16 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+async def get_applied(db, migration_id: str) -> Optional[Dict[str, Any]]:
+    """Obtener el registro de una migración aplicada, si existe"""
+    return await db.migrations.find_one({"_id": migration_id})
+
+
+async def mark_applied(db, migration_id: str, report: Dict[str, Any]) -> None:
+    """Registrar una migración aplicada en la colección `migrations`"""
+    await db.migrations.update_one(
+        {"_id": migration_id},
+        {"$set": {"applied_at": datetime.utcnow(), "report": report}},
+        upsert=True,
+    )
@@ -0,0 +1,21 @@
+"""
+Completa `created_at` en las notificaciones guardadas sin él (altas antiguas de la API
+heredada) con la hora de su `_id`. La bandeja pagina por (created_at, _id): sin el campo,
+esas notificaciones quedarían fuera de orden entre páginas.
+"""
+from app.db.migrations.history import mark_applied
+
+MIGRATION_ID = "notifications_created_at"
+
+
+async def migrate_notifications_created_at(db, dry_run: bool = False) -> dict:
+    query = {"created_at": {"$exists": False}}
+    report = {"documents": await db.notifications.count_documents(query), "dry_run": dry_run}
+    if dry_run:
+        return report
+
+    # Un solo update con pipeline: la fecha se calcula en el servidor a partir del ObjectId
+    result = await db.notifications.update_many(query, [{"$set": {"created_at": {"$toDate": "$_id"}}}])
+    report["updated"] = result.modified_count
+    await mark_applied(db, MIGRATION_ID, report)
+    return report
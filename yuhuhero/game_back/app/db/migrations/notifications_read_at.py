@@ -0,0 +1,24 @@
+"""
+Completa `read_at` en las notificaciones leídas antes de que se registrara (con su
+`created_at` o, si tampoco lo tienen, la hora de su `_id`). El índice TTL de retención
+expira por `read_at`: sin el campo, esas notificaciones no se borrarían nunca.
+"""
+from app.db.migrations.history import mark_applied
+
+MIGRATION_ID = "notifications_read_at"
+
+
+async def migrate_notifications_read_at(db, dry_run: bool = False) -> dict:
+    query = {"read": True, "read_at": {"$exists": False}}
+    report = {"documents": await db.notifications.count_documents(query), "dry_run": dry_run}
+    if dry_run:
+        return report
+
+    # La hora real de lectura no se conoce: se toma la de creación, así la retención
+    # las expira cuanto antes en lugar de conservarlas N días más desde hoy
+    result = await db.notifications.update_many(
+        query, [{"$set": {"read_at": {"$ifNull": ["$created_at", {"$toDate": "$_id"}]}}}]
+    )
+    report["updated"] = result.modified_count
+    await mark_applied(db, MIGRATION_ID, report)
+    return report
@@ -0,0 +1,74 @@
+"""
+Mueve el arreglo `quizResponses` de cada documento de `users` a la colección
+`quiz_responses` (un documento por usuario, como intento del cuestionario inicial).
+
+El intento se escribe con upsert marcado como `migrated`, así repetir la migración no
+lo duplica; el arreglo se quita del usuario solo si sigue igual al leído. Si cambió
+mientras tanto, el usuario lo conserva y la siguiente ejecución reescribe el intento
+con el arreglo vigente (`$set`, no `$setOnInsert`).
+"""
+from datetime import datetime
+from typing import List, Union
+
+from pymongo import DeleteOne, UpdateOne
+
+from app.db.migrations.history import mark_applied
+from app.db.repositories.quiz_responses import ONBOARDING_QUIZ_ID
+
+MIGRATION_ID = "quiz_responses_collection"
+BATCH_SIZE = 1000
+
+
+async def _flush(db, attempts: List[Union[UpdateOne, DeleteOne]], unsets: List[UpdateOne], report: dict) -> None:
+    # Primero los intentos: si algo falla, el usuario conserva su arreglo
+    if attempts:
+        await db.quiz_responses.bulk_write(attempts, ordered=False)
+    if unsets:
+        result = await db.users.bulk_write(unsets, ordered=False)
+        report["skipped"] += len(unsets) - result.matched_count
+    attempts.clear()
+    unsets.clear()
+
+
+async def migrate_quiz_responses_collection(db, dry_run: bool = False) -> dict:
+    report = {"users": 0, "responses": 0, "skipped": 0, "dry_run": dry_run}
+    attempts: List[Union[UpdateOne, DeleteOne]] = []
+    unsets: List[UpdateOne] = []
+
+    cursor = db.users.find(
+        {"quizResponses": {"$exists": True}},
+        {"quizResponses": 1, "quizCompleted": 1, "updated_at": 1, "created_at": 1},
+    )
+    async for user in cursor:
+        responses = user.get("quizResponses") or []
+        report["users"] += 1
+        report["responses"] += len(responses)
+        if dry_run:
+            continue
+
+        user_id = str(user["_id"])
+        migrated = {"user_id": user_id, "quiz_id": ONBOARDING_QUIZ_ID, "migrated": True}
+        if responses:
+            attempts.append(UpdateOne(
+                migrated,
+                {"$set": {
+                    "responses": responses,
+                    "completed": bool(user.get("quizCompleted", False)),
+                    "submitted_at": user.get("updated_at") or user.get("created_at") or datetime.utcnow(),
+                }},
+                upsert=True,
+            ))
+        else:
+            # Arreglo vaciado desde una ejecución anterior: no queda intento que conservar
+            attempts.append(DeleteOne(migrated))
+        unsets.append(UpdateOne(
+            {"_id": user["_id"], "quizResponses": user["quizResponses"]},
+            {"$unset": {"quizResponses": ""}},
+        ))
+        if len(unsets) >= BATCH_SIZE:
+            await _flush(db, attempts, unsets, report)
+
+    await _flush(db, attempts, unsets, report)
+    if not dry_run:
+        await mark_applied(db, MIGRATION_ID, report)
+    return report
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from app.core.config import settings
+from app.core.metrics import register_metrics
+from app.db.repositories.notifications import NotificationRepository
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "notifications_archive"
+
+# Lo que se conserva de cada notificación archivada
+ARCHIVE_PROJECTION = {"user_id": 1, "title": 1, "message": 1, "type": 1, "read": 1, "created_at": 1, "read_at": 1}
+
+
+class NotificationArchiver:
+    """
+    Mueve las notificaciones con más de `after_days` días de `notifications` a
+    `notifications_archive` (comprimida con zstd), por lotes y fuera de las peticiones.
+    La antigüedad se toma del `_id`, así la búsqueda usa el índice de `_id` sin otro índice.
+    Copiar es idempotente (replace con upsert), por lo que un lote interrumpido se repite sin
+    duplicados; las no leídas archivadas se descuentan de `notification_counters`.
+    """
+
+    def __init__(self, after_days: int = 0, interval: float = 3600.0, batch_size: int = 1000):
+        self.after_days = after_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.archived = 0
+        self.recounts = 0
+        self.failures = 0
+        self.last_run_ms = 0.0
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _ensure_archive(self, db) -> None:
+        try:
+            await db.create_collection(
+                ARCHIVE_COLLECTION,
+                storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}},
+            )
+        except CollectionInvalid:
+            pass  # Ya existe
+
+    async def archive(self, db) -> Dict[str, Any]:
+        """Archivar todas las notificaciones anteriores al corte, lote a lote"""
+        started = time.perf_counter()
+        await self._ensure_archive(db)
+        cutoff = ObjectId.from_datetime(datetime.utcnow() - timedelta(days=self.after_days))
+
+        report = {"archived": 0, "batches": 0, "recounted_users": 0}
+        while True:
+            batch = await db.notifications.find(
+                {"_id": {"$lt": cutoff}}, ARCHIVE_PROJECTION
+            ).sort("_id", ASCENDING).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+
+            archived_at = datetime.utcnow()
+            await db[ARCHIVE_COLLECTION].bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, {**doc, "archived_at": archived_at}, upsert=True) for doc in batch],
+                ordered=False,
+            )
+            report["archived"] += len(batch)
+            report["recounted_users"] += await self._delete_batch(db, batch)
+            report["batches"] += 1
+            if len(batch) < self.batch_size:
+                break
+
+        self.runs += 1
+        self.archived += report["archived"]
+        self.recounts += report["recounted_users"]
+        self.last_run_ms = round((time.perf_counter() - started) * 1000, 2)
+        return {**report, "elapsed_ms": self.last_run_ms}
+
+    async def _delete_batch(self, db, batch) -> int:
+        """Borrar el lote ya copiado y ajustar los contadores; devuelve los usuarios recontados"""
+        unread = [doc for doc in batch if not doc.get("read", False)]
+        read = [doc for doc in batch if doc.get("read", False)]
+        recount = set()
+
+        if read:
+            read_ids = [doc["_id"] for doc in read]
+            result = await db.notifications.delete_many({"_id": {"$in": read_ids}, "read": True})
+            if result.deleted_count != len(read):
+                # Alguna volvió a no leída entretanto: se borra igual y se recuentan esos usuarios
+                await db.notifications.delete_many({"_id": {"$in": read_ids}})
+                recount.update(doc["user_id"] for doc in read)
+
+        if unread:
+            unread_ids = [doc["_id"] for doc in unread]
+            result = await db.notifications.delete_many({"_id": {"$in": unread_ids}, "read": {"$ne": True}})
+            per_user = Counter(doc["user_id"] for doc in unread)
+            if result.deleted_count == len(unread):
+                await db.notification_counters.bulk_write(
+                    [UpdateOne({"_id": user_id}, {"$inc": {"unread": -count}}) for user_id, count in per_user.items()],
+                    ordered=False,
+                )
+            else:
+                # Alguna cambió a leída entretanto: se borra igual y se recuentan esos usuarios
+                await db.notifications.delete_many({"_id": {"$in": unread_ids}})
+                recount.update(per_user)
+
+        notifications = NotificationRepository(db)
+        for user_id in recount:
+            await notifications.recount_unread(user_id)
+        return len(recount)
+
+    async def _run(self, db) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.archive(db)
+            except PyMongoError as e:
+                self.failures += 1
+                logger.error(f"Error archivando notificaciones: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "runs": self.runs,
+            "archived": self.archived,
+            "recounted_users": self.recounts,
+            "failures": self.failures,
+            "last_run_ms": self.last_run_ms,
+        }
+
+
+notification_archiver = NotificationArchiver(
+    after_days=settings.NOTIFICATIONS_ARCHIVE_AFTER_DAYS,
+    interval=settings.NOTIFICATIONS_ARCHIVE_INTERVAL_SECONDS,
+    batch_size=settings.NOTIFICATIONS_ARCHIVE_BATCH_SIZE,
+)
+register_metrics("notification_archiver", notification_archiver.stats)
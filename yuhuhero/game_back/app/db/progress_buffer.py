@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.metrics import register_metrics
+from app.db.progress_change import DEFAULT_PROGRESS, ProgressChange
+
+logger = logging.getLogger(__name__)
+
+# Intentos de escritura de un usuario cuya operación falla (p. ej. validación) antes de descartarla
+MAX_FLUSH_ATTEMPTS = 5
+
+# Token del último lote aplicado a cada documento: reintentar un lote con el mismo token
+# no vuelve a sumar $inc (monedas y version) a los documentos que ya lo recibieron
+FLUSH_TOKEN_FIELD = "flush_token"
+
+
+class ProgressWriteBuffer:
+    """
+    Write-behind para `game_progress`: combina en memoria los cambios de cada usuario
+    durante una ventana y los escribe con un solo bulk_write. Las lecturas del mismo
+    proceso ven los cambios pendientes, y el lote en vuelo, a través de `overlay`.
+    Si la escritura falla sin saber si se aplicó (p. ej. un timeout), el lote se reintenta
+    tal cual con su token y solo en los documentos que aún no lo tienen.
+    """
+
+    def __init__(self, flush_interval_ms: int = 500, max_pending: int = 5000):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self._pending: Dict[str, ProgressChange] = {}
+        self._attempts: Dict[str, int] = {}
+        # Lote escrito y aún sin confirmar (token, cambios por usuario)
+        self._in_flight: Optional[Tuple[ObjectId, Dict[str, ProgressChange]]] = None
+        self._collection = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+
+        self.staged = 0
+        self.coalesced = 0  # Cambios absorbidos por otro pendiente del mismo usuario
+        self.flushes = 0
+        self.flushed_ops = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, collection) -> None:
+        """Iniciar el vaciado periódico contra la colección indicada"""
+        if self._task is None:
+            self._collection = collection
+            self._flush_requested = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Detener el vaciado periódico y escribir todo lo pendiente"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._in_flight is None and self._pending:
+            # El primer vaciado confirmó un lote en vuelo: falta lo pendiente
+            await self.flush()
+
+    def stage(
+        self,
+        user_id: str,
+        fields: Optional[Dict[str, Any]] = None,
+        add_coins: Optional[int] = None,
+        complete_levels: Optional[Iterable[str]] = None,
+    ) -> None:
+        """Encolar un cambio de progreso (se combina con los pendientes del usuario)"""
+        pending = self._pending.get(str(user_id))
+        if pending is None:
+            pending = self._pending[str(user_id)] = ProgressChange()
+        else:
+            self.coalesced += 1
+        pending.merge(fields, add_coins, complete_levels)
+        self.staged += 1
+        if len(self._pending) >= self.max_pending and self._flush_requested is not None:
+            self._flush_requested.set()
+
+    def overlay(self, user_id: str, progress: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Aplicar el lote en vuelo (si el documento aún no lo tiene) y los cambios pendientes del usuario"""
+        changes = []
+        if self._in_flight is not None:
+            token, batch = self._in_flight
+            in_flight = batch.get(str(user_id))
+            if in_flight is not None and (progress is None or progress.get(FLUSH_TOKEN_FIELD) != token):
+                changes.append(in_flight)
+        pending = self._pending.get(str(user_id))
+        if pending is not None:
+            changes.append(pending)
+        if not changes:
+            return progress
+        view = progress if progress is not None else {"user_id": str(user_id), **DEFAULT_PROGRESS}
+        for change in changes:
+            view = change.apply_to(view)
+        return view
+
+    async def flush(self) -> int:
+        """Escribir los cambios pendientes (o reintentar el lote sin confirmar) con un único bulk_write"""
+        if self._collection is None:
+            return 0
+        if self._in_flight is not None:
+            token, batch = self._in_flight
+            try:
+                # Los documentos que ya tienen el token recibieron el lote antes del error
+                applied = self._collection.find(
+                    {"user_id": {"$in": list(batch)}, FLUSH_TOKEN_FIELD: token}, {"user_id": 1}
+                )
+                async for doc in applied:
+                    batch.pop(doc["user_id"], None)
+                    self._attempts.pop(doc["user_id"], None)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Error comprobando el lote de progreso sin confirmar: {e}")
+                return 0
+            if not batch:
+                self._in_flight = None
+                return 0
+        elif self._pending:
+            token, batch = ObjectId(), self._pending
+            self._pending = {}
+            self._in_flight = (token, batch)
+        else:
+            return 0
+
+        user_ids = list(batch)
+        ops = []
+        for user_id in user_ids:
+            update = batch[user_id].to_update(bitset=settings.PROGRESS_LEVELS_BITSET)
+            update["$set"][FLUSH_TOKEN_FIELD] = token
+            ops.append(UpdateOne({"user_id": user_id, FLUSH_TOKEN_FIELD: {"$ne": token}}, update, upsert=True))
+        started = time.perf_counter()
+        try:
+            await self._collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Las operaciones sin error ya se aplicaron: repetirlas sumaría dos veces $inc y version
+            failed = [user_ids[error["index"]] for error in e.details.get("writeErrors", [])]
+            failed_set = set(failed)
+            self.failures += 1
+            logger.error(f"Error escribiendo progreso en lote ({len(failed)} de {len(ops)} usuarios): {e}")
+            self._in_flight = None
+            self._restage(batch, failed, count_attempt=True)
+            written = len(ops) - len(failed)
+        except Exception as e:
+            # Sin saber qué se aplicó (p. ej. conexión o timeout): el lote queda en vuelo y se
+            # reintenta igual en el siguiente ciclo, solo en los documentos sin su token
+            self.failures += 1
+            logger.error(f"Error escribiendo progreso en lote ({len(ops)} usuarios): {e}")
+            return 0
+        else:
+            self._in_flight = None
+            written = len(ops)
+            failed_set = set()
+
+        for user_id in user_ids:
+            if user_id not in failed_set:
+                self._attempts.pop(user_id, None)
+        self.flushes += 1
+        self.flushed_ops += written
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        return written
+
+    def _restage(self, batch: Dict[str, ProgressChange], user_ids: List[str], count_attempt: bool) -> None:
+        """Devolver cambios no escritos a pendientes, sin perder los llegados mientras tanto"""
+        for user_id in user_ids:
+            if count_attempt:
+                attempts = self._attempts[user_id] = self._attempts.get(user_id, 0) + 1
+                if attempts >= MAX_FLUSH_ATTEMPTS:
+                    self._attempts.pop(user_id)
+                    self.dropped += 1
+                    logger.error(f"Se descarta el progreso pendiente de {user_id} tras {attempts} intentos fallidos")
+                    continue
+            pending = batch[user_id]
+            newer = self._pending.get(user_id)
+            self._pending[user_id] = pending.merge_under(newer) if newer else pending
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending_users": len(self._pending),
+            "in_flight_users": len(self._in_flight[1]) if self._in_flight else 0,
+            "staged": self.staged,
+            "flushes": self.flushes,
+            "flushed_ops": self.flushed_ops,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+progress_buffer = ProgressWriteBuffer(
+    flush_interval_ms=settings.PROGRESS_FLUSH_INTERVAL_MS,
+    max_pending=settings.PROGRESS_WRITE_BEHIND_MAX_PENDING,
+)
+register_metrics("progress_write_behind", progress_buffer.stats)
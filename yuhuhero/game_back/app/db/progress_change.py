@@ -0,0 +1,117 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.db.level_bits import BITS_FIELD, bit_updates, encode_words, level_index
+
+DEFAULT_PROGRESS = {"current_level": 1, "coins": 0, "completed_levels": []}
+
+# `version` cuenta las escrituras lógicas del usuario: cada cambio combinado suma uno,
+# así un lote del write-behind o una compactación avanzan la versión lo mismo que
+# las escrituras individuales que contienen.
+VERSION_FIELD = "version"
+
+
+class ProgressChange:
+    """Cambios de progreso de un usuario, combinables y traducibles a un único update"""
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}  # $set
+        self.coins_delta = 0  # $inc de monedas
+        self.levels: List[str] = []  # $addToSet de niveles, en orden de llegada
+        self.ops = 0  # Escrituras lógicas combinadas (incremento de `version`)
+
+    def merge(self, fields: Optional[Dict[str, Any]], add_coins: Optional[int], levels: Optional[Iterable[str]]):
+        self.ops += 1
+        if fields:
+            fields = {field: value for field, value in fields.items() if field != VERSION_FIELD}
+            if "coins" in fields:
+                # Un valor absoluto reemplaza los incrementos anteriores
+                self.coins_delta = 0
+            if "completed_levels" in fields:
+                self.levels = []
+            self.fields.update(fields)
+        if add_coins:
+            if "coins" in self.fields:
+                self.fields["coins"] += add_coins
+            else:
+                self.coins_delta += add_coins
+        for level in levels or []:
+            if level not in self.levels:
+                self.levels.append(level)
+
+    def merge_under(self, newer: "ProgressChange") -> "ProgressChange":
+        """Combinar cambios más antiguos (self) por debajo de otros más recientes"""
+        merged = ProgressChange()
+        merged.merge(self.fields, self.coins_delta, self.levels)
+        merged.merge(newer.fields, newer.coins_delta, newer.levels)
+        merged.ops = self.ops + newer.ops
+        return merged
+
+    def to_update(self, bitset: bool = False) -> Dict[str, Any]:
+        """
+        Update de MongoDB equivalente. Con `bitset`, los niveles se guardan en
+        `completed_bits` (las casillas deben tener ya posición en `level_index`).
+        """
+        update: Dict[str, Any] = {"$set": {**self.fields, "last_updated": datetime.utcnow()}}
+        levels = [level for level in self.levels if level not in self.fields.get("completed_levels", [])]
+        if "completed_levels" in self.fields:
+            completed = list(self.fields["completed_levels"]) + levels
+            if bitset:
+                del update["$set"]["completed_levels"]
+                update["$set"][BITS_FIELD] = encode_words(self._positions(completed))
+                update["$unset"] = {"completed_levels": ""}
+            else:
+                update["$set"]["completed_levels"] = completed
+        elif levels:
+            if bitset:
+                update["$bit"] = bit_updates(self._positions(levels))
+            else:
+                update["$addToSet"] = {"completed_levels": {"$each": levels}}
+        update["$inc"] = {VERSION_FIELD: max(self.ops, 1)}
+        if self.coins_delta:
+            update["$inc"]["coins"] = self.coins_delta
+
+        defaults = dict(DEFAULT_PROGRESS)
+        if bitset:
+            del defaults["completed_levels"]
+            defaults[BITS_FIELD] = {}
+        touched = set(update["$set"]) | set(update.get("$inc", {})) | set(update.get("$addToSet", {}))
+        if "$bit" in update:
+            touched.add(BITS_FIELD)
+        on_insert = {field: value for field, value in defaults.items() if field not in touched}
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        return update
+
+    @staticmethod
+    def _positions(levels: Iterable[str]) -> List[int]:
+        positions = [level_index.cached_position(level) for level in levels]
+        if None in positions:
+            raise ValueError("Niveles sin posición en el bitset: resolverlos antes con level_index.positions")
+        return positions
+
+    def to_event(self) -> Dict[str, Any]:
+        """Forma compacta para `progress_events`: solo las claves con contenido"""
+        event: Dict[str, Any] = {}
+        if self.fields:
+            event["set"] = dict(self.fields)
+        if self.coins_delta:
+            event["inc"] = self.coins_delta
+        if self.levels:
+            event["levels"] = list(self.levels)
+        return event
+
+    def merge_event(self, event: Dict[str, Any]) -> None:
+        self.merge(event.get("set"), event.get("inc"), event.get("levels"))
+
+    def apply_to(self, progress: Dict[str, Any]) -> Dict[str, Any]:
+        """Vista del documento con los cambios pendientes aplicados"""
+        view = dict(progress)
+        view.update(self.fields)
+        view["coins"] = view.get("coins", 0) + self.coins_delta
+        view[VERSION_FIELD] = view.get(VERSION_FIELD, 0) + self.ops
+        completed = list(view.get("completed_levels", []))
+        seen = set(completed)
+        completed.extend(level for level in self.levels if level not in seen)
+        view["completed_levels"] = completed
+        return view
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.core.config import settings
+from app.core.metrics import register_metrics
+from app.db.level_bits import BITS_FIELD, decode_progress, encode_words, level_index
+from app.db.progress_change import DEFAULT_PROGRESS, VERSION_FIELD, ProgressChange
+from app.db.repositories.progress_events import ProgressEventRepository
+
+logger = logging.getLogger(__name__)
+
+# Marcador en `compactor_state`: último evento procesado
+COMPACTOR_STATE_ID = "progress_events"
+
+
+class ProgressCompactor:
+    """
+    Integra los eventos de `progress_events` en el snapshot de cada usuario
+    (`game_progress`, con `last_event_id`). Solo procesa eventos con más de
+    `min_age` segundos, para no adelantarse a inserciones de otros workers aún en curso.
+    Varias instancias pueden ejecutarse a la vez: el snapshot se actualiza solo si
+    nadie lo cambió desde que se leyó. Cada usuario se integra desde el `last_event_id`
+    de su snapshot (no solo con los eventos del lote), así los eventos de un usuario
+    que perdió la carrera se recogen en su siguiente compactación aunque el marcador avance.
+    """
+
+    def __init__(self, interval: float = 30.0, batch_size: int = 1000, min_age: float = 30.0):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.min_age = min_age
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.events_folded = 0
+        self.snapshots_written = 0
+        self.conflicts = 0
+        self.failures = 0
+        self.last_run_ms = 0.0
+
+    def start(self, db) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def compact(self, db) -> Dict[str, Any]:
+        """Procesar todos los eventos pendientes por lotes"""
+        started = time.perf_counter()
+        events_repository = ProgressEventRepository(db)
+        state = await db.compactor_state.find_one({"_id": COMPACTOR_STATE_ID})
+        after = state["last_event_id"] if state else None
+        before = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=self.min_age))
+
+        report = {"events": 0, "snapshots": 0, "conflicts": 0}
+        while True:
+            events = await events_repository.scan(after, before, self.batch_size)
+            if not events:
+                break
+
+            by_user: Dict[str, List[Dict[str, Any]]] = {}
+            for event in events:
+                by_user.setdefault(event["user_id"], []).append(event)
+            for user_id, user_events in by_user.items():
+                # Si otro compactador cambió el snapshot entretanto, se relee y se reintenta una vez
+                until = user_events[-1]["_id"]
+                written = await self._fold(db, events_repository, user_id, until) or await self._fold(
+                    db, events_repository, user_id, until
+                )
+                report["snapshots" if written else "conflicts"] += 1
+
+            after = events[-1]["_id"]
+            await db.compactor_state.update_one(
+                {"_id": COMPACTOR_STATE_ID},
+                {"$max": {"last_event_id": after}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            report["events"] += len(events)
+            if len(events) < self.batch_size:
+                break
+
+        self.runs += 1
+        self.events_folded += report["events"]
+        self.snapshots_written += report["snapshots"]
+        self.conflicts += report["conflicts"]
+        self.last_run_ms = round((time.perf_counter() - started) * 1000, 2)
+        return {**report, "elapsed_ms": self.last_run_ms}
+
+    async def _fold(self, db, events_repository: ProgressEventRepository, user_id: str, until: ObjectId) -> bool:
+        """Integrar en el snapshot los eventos del usuario posteriores a su `last_event_id`, hasta `until`"""
+        snapshot = await db.game_progress.find_one(
+            {"user_id": user_id},
+            {"current_level": 1, "coins": 1, "completed_levels": 1, BITS_FIELD: 1, VERSION_FIELD: 1, "last_event_id": 1},
+        )
+        snapshot = await decode_progress(db, snapshot)
+        last_event_id = snapshot.get("last_event_id") if snapshot else None
+        pending = await events_repository.tail(user_id, last_event_id, until)
+        if not pending:
+            return True
+
+        change = ProgressChange()
+        for event in pending:
+            change.merge_event(event)
+        view = change.apply_to(snapshot or {"user_id": user_id, **DEFAULT_PROGRESS})
+        fields = {
+            "current_level": view["current_level"],
+            "coins": view["coins"],
+            "completed_levels": view["completed_levels"],
+            VERSION_FIELD: view[VERSION_FIELD],
+            "last_event_id": pending[-1]["_id"],
+            "last_updated": datetime.utcnow(),
+        }
+        update: Dict[str, Any] = {"$set": fields}
+        if settings.PROGRESS_LEVELS_BITSET:
+            fields[BITS_FIELD] = encode_words(await level_index.positions(db, fields.pop("completed_levels"), trusted=True))
+            update["$unset"] = {"completed_levels": ""}
+
+        if snapshot is None:
+            try:
+                await db.game_progress.insert_one({"user_id": user_id, **fields})
+                return True
+            except DuplicateKeyError:
+                return False  # Otro compactador creó el snapshot antes
+
+        result = await db.game_progress.update_one(
+            {"_id": snapshot["_id"], "last_event_id": last_event_id},
+            update,
+        )
+        return result.matched_count == 1
+
+    async def _run(self, db) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.compact(db)
+            except PyMongoError as e:
+                self.failures += 1
+                logger.error(f"Error compactando eventos de progreso: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "runs": self.runs,
+            "events_folded": self.events_folded,
+            "snapshots_written": self.snapshots_written,
+            "conflicts": self.conflicts,
+            "failures": self.failures,
+            "last_run_ms": self.last_run_ms,
+        }
+
+
+progress_compactor = ProgressCompactor(
+    interval=settings.PROGRESS_COMPACT_INTERVAL_SECONDS,
+    batch_size=settings.PROGRESS_COMPACT_BATCH_SIZE,
+    min_age=settings.PROGRESS_COMPACT_MIN_AGE_SECONDS,
+)
+register_metrics("progress_compactor", progress_compactor.stats)
@@ -0,0 +1,19 @@
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from pymongo import DESCENDING
+
+
+class GameMapRepository:
+    """Acceso a la colección `game_maps`"""
+
+    def __init__(self, db):
+        self.collection = db.game_maps
+
+    async def get_active(self) -> Optional[Dict[str, Any]]:
+        # Mientras se publica puede haber dos activos un instante: vale el más reciente
+        return await self.collection.find_one({"active": True}, {"tiles": 1}, sort=[("_id", DESCENDING)])
+
+    async def create(self, game_map: Dict[str, Any]) -> ObjectId:
+        result = await self.collection.insert_one(game_map)
+        return result.inserted_id
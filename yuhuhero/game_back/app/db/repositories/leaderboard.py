@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+
+from app.db.progress_buffer import FLUSH_TOKEN_FIELD
+from app.db.repositories.users import UserRepository
+
+# Solo lo que necesita el ranking: con el índice (coins, user_id) el top-N es una consulta cubierta
+LEADERBOARD_PROJECTION = {"_id": 0, "user_id": 1, "coins": 1}
+
+# Recorrido del ranking en memoria: con el token del write-behind, `overlay` sabe si el
+# lote en vuelo ya está incluido en lo leído
+COINS_PROJECTION = {**LEADERBOARD_PROJECTION, FLUSH_TOKEN_FIELD: 1}
+
+
+class LeaderboardRepository:
+    """Consultas de ranking por monedas sobre `game_progress`"""
+
+    def __init__(self, db):
+        self.collection = db.game_progress
+        self.users = UserRepository(db)
+
+    async def top(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Mejores `limit` jugadores (índice coins desc), con nombre y posición"""
+        cursor = (
+            self.collection.find({}, LEADERBOARD_PROJECTION)
+            .sort([("coins", DESCENDING), ("user_id", ASCENDING)])
+            .limit(limit)
+        )
+        rows = await cursor.to_list(limit)
+        names = await self.users.get_names([row["user_id"] for row in rows])
+
+        entries: List[Dict[str, Any]] = []
+        for position, row in enumerate(rows, start=1):
+            coins = row.get("coins", 0)
+            # Empates comparten posición (1, 2, 2, 4...)
+            rank = entries[-1]["rank"] if entries and entries[-1]["coins"] == coins else position
+            entries.append({
+                "rank": rank,
+                "user_id": row["user_id"],
+                "name": names.get(row["user_id"]),
+                "coins": coins,
+            })
+        return entries
+
+    async def get_coins(self, user_id: str) -> int:
+        progress = await self.collection.find_one({"user_id": str(user_id)}, LEADERBOARD_PROJECTION)
+        return progress.get("coins", 0) if progress else 0
+
+    async def count_richer(self, coins: int) -> int:
+        """Jugadores con más monedas (recorre el tramo del índice por encima de `coins`)"""
+        return await self.collection.count_documents({"coins": {"$gt": coins}})
+
+    async def count_players(self) -> int:
+        return await self.collection.estimated_document_count()
+
+    def iter_coins(self, updated_since: Optional[datetime] = None):
+        """Cursor (user_id, coins) de todos los jugadores o de los modificados desde una fecha"""
+        query = {"last_updated": {"$gt": updated_since}} if updated_since is not None else {}
+        return self.collection.find(query, COINS_PROJECTION, batch_size=10000)
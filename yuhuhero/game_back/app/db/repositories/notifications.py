@@ -0,0 +1,220 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import DESCENDING, ReturnDocument
+
+from app.core.events import event_hub
+
+# Campos que devuelve la API
+NOTIFICATION_PROJECTION = {"user_id": 1, "title": 1, "message": 1, "type": 1, "read": 1, "created_at": 1}
+
+# Orden de la bandeja (índice user_id, created_at desc, _id desc)
+INBOX_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def created_at_of(notification: Dict[str, Any]) -> datetime:
+    """`created_at`, o la hora del `_id` en notificaciones antiguas guardadas sin él"""
+    created_at = notification.get("created_at")
+    if created_at is None:
+        created_at = notification["_id"].generation_time.replace(tzinfo=None)
+    return created_at
+
+
+def encode_cursor(notification: Dict[str, Any]) -> str:
+    """Cursor opaco con la posición (created_at, _id) de la última notificación devuelta"""
+    millis = (created_at_of(notification) - _EPOCH) // timedelta(milliseconds=1)
+    return f"{millis}_{notification['_id']}"
+
+
+def to_object_ids(notification_ids: Iterable[str]) -> List[ObjectId]:
+    """IDs válidos como ObjectId (los inválidos no pueden existir y se descartan)"""
+    return [ObjectId(value) for value in notification_ids if ObjectId.is_valid(value)]
+
+
+def _read_update(fields: Dict[str, Any]) -> Dict[str, Any]:
+    # `read_at` registra cuándo se leyó (lo usa la retención de notificaciones leídas)
+    update: Dict[str, Any] = {"$set": dict(fields)}
+    if fields.get("read") is True:
+        update["$set"]["read_at"] = datetime.utcnow()
+    elif fields.get("read") is False:
+        update["$unset"] = {"read_at": ""}
+    return update
+
+
+def event_payload(notification_id: ObjectId, notification: Dict[str, Any]) -> Dict[str, Any]:
+    """Datos del evento `notification` del canal de eventos"""
+    return {
+        "id": str(notification_id),
+        "title": notification["title"],
+        "message": notification["message"],
+        "type": notification["type"],
+        "read": notification.get("read", False),
+        "created_at": notification.get("created_at"),
+    }
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Posición de un cursor; ValueError si no es válido"""
+    millis, _, object_id = cursor.partition("_")
+    if not ObjectId.is_valid(object_id):
+        raise ValueError("Cursor inválido")
+    try:
+        return _EPOCH + timedelta(milliseconds=int(millis)), ObjectId(object_id)
+    except OverflowError:
+        raise ValueError("Cursor inválido")
+
+
+class NotificationRepository:
+    """
+    Acceso a la colección `notifications`. El número de no leídas de cada usuario se
+    mantiene en `notification_counters` ({_id: user_id, unread}) con cada escritura
+    que cambia el estado de lectura, así el contador es una lectura por clave.
+    Las notificaciones nuevas y los cambios del contador se publican en `event_hub`.
+    """
+
+    def __init__(self, db):
+        self.collection = db.notifications
+        self.counters = db.notification_counters
+
+    async def list_for_user(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        items, _ = await self.list_page(user_id, limit)
+        return items
+
+    async def list_page(
+        self, user_id: str, limit: int = 20, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Una página de la bandeja (más recientes primero) y el cursor de la siguiente"""
+        query: Dict[str, Any] = {"user_id": str(user_id)}
+        if cursor:
+            created_at, object_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": object_id}},
+            ]
+        # Se pide uno más para saber si hay otra página sin contar documentos
+        items = await self.collection.find(query, NOTIFICATION_PROJECTION).sort(INBOX_SORT).to_list(limit + 1)
+        for item in items:
+            # Sin la migración notifications-created-at, las antiguas no tienen `created_at`
+            item["created_at"] = created_at_of(item)
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, encode_cursor(items[-1])
+
+    async def create(self, notification: Dict[str, Any]) -> ObjectId:
+        result = await self.collection.insert_one(notification)
+        await event_hub.publish(notification["user_id"], "notification", event_payload(result.inserted_id, notification))
+        if not notification.get("read", False):
+            await self._add_unread(notification["user_id"], 1)
+        return result.inserted_id
+
+    async def get_for_user(self, notification_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(notification_id):
+            return None
+        return await self.collection.find_one(
+            {"_id": ObjectId(notification_id), "user_id": str(user_id)},
+            NOTIFICATION_PROJECTION,
+        )
+
+    async def update_for_user(
+        self, notification_id: str, user_id: str, fields: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Actualizar una notificación del usuario y devolverla ya actualizada (None si no existe)"""
+        if not ObjectId.is_valid(notification_id):
+            return None
+        query: Dict[str, Any] = {"_id": ObjectId(notification_id), "user_id": str(user_id)}
+        if "read" in fields:
+            # Solo coincide si el estado de lectura cambia: así se sabe cuándo ajustar el contador
+            query["read"] = {"$ne": fields["read"]}
+        updated = await self.collection.find_one_and_update(
+            query,
+            _read_update(fields),
+            projection=NOTIFICATION_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is None:
+            if "read" not in fields:
+                return None
+            # Ya tenía ese estado de lectura (o no existe): aplicar el resto sin tocar el contador
+            others = {field: value for field, value in fields.items() if field != "read"}
+            if not others:
+                return await self.get_for_user(notification_id, user_id)
+            del query["read"]
+            return await self.collection.find_one_and_update(
+                query, {"$set": others}, projection=NOTIFICATION_PROJECTION, return_document=ReturnDocument.AFTER
+            )
+        if "read" in fields:
+            await self._add_unread(user_id, -1 if fields["read"] else 1)
+        return updated
+
+    async def mark_all_read(self, user_id: str) -> int:
+        """Marcar como leídas todas las notificaciones del usuario (un update_many)"""
+        result = await self.collection.update_many(
+            {"user_id": str(user_id), "read": {"$ne": True}}, _read_update({"read": True})
+        )
+        if result.modified_count:
+            await self._add_unread(user_id, -result.modified_count)
+        return result.modified_count
+
+    async def mark_read(self, user_id: str, notification_ids: Iterable[str]) -> int:
+        """Marcar como leídas varias notificaciones del usuario (un update_many)"""
+        object_ids = to_object_ids(notification_ids)
+        if not object_ids:
+            return 0
+        result = await self.collection.update_many(
+            {"_id": {"$in": object_ids}, "user_id": str(user_id), "read": {"$ne": True}},
+            _read_update({"read": True}),
+        )
+        if result.modified_count:
+            await self._add_unread(user_id, -result.modified_count)
+        return result.modified_count
+
+    async def delete_for_user(self, user_id: str, notification_ids: Iterable[str]) -> int:
+        """Borrar varias notificaciones del usuario (un delete_many) y recalcular su contador"""
+        object_ids = to_object_ids(notification_ids)
+        if not object_ids:
+            return 0
+        result = await self.collection.delete_many({"_id": {"$in": object_ids}, "user_id": str(user_id)})
+        if result.deleted_count:
+            # delete_many no dice cuántas eran no leídas: se recuenta la bandeja del usuario
+            # (un rango del índice user_id), que además corrige cualquier desvío previo
+            unread = await self.recount_unread(user_id)
+            await event_hub.publish(user_id, "unread", {"unread": unread})
+        return result.deleted_count
+
+    async def unread_count(self, user_id: str) -> int:
+        counter = await self.counters.find_one({"_id": str(user_id)}, {"unread": 1})
+        return max(counter["unread"], 0) if counter else 0
+
+    async def _add_unread(self, user_id: str, amount: int) -> None:
+        counter = await self.counters.find_one_and_update(
+            {"_id": str(user_id)},
+            {"$inc": {"unread": amount}},
+            projection={"unread": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        await event_hub.publish(user_id, "unread", {"unread": max(counter["unread"], 0)})
+
+    async def recount_unread(self, user_id: Optional[str] = None) -> int:
+        """Recalcular los contadores desde `notifications` (uno o todos los usuarios)"""
+        match: Dict[str, Any] = {"read": {"$ne": True}}
+        if user_id is not None:
+            match["user_id"] = str(user_id)
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$user_id", "unread": {"$sum": 1}}},
+        ]
+        if user_id is None:
+            # Todos los usuarios: se reemplaza la colección de contadores de una vez
+            pipeline.append({"$out": "notification_counters"})
+            await self.collection.aggregate(pipeline).to_list(None)
+            return await self.counters.count_documents({})
+
+        counts = await self.collection.aggregate(pipeline).to_list(None)
+        unread = counts[0]["unread"] if counts else 0
+        await self.counters.update_one({"_id": str(user_id)}, {"$set": {"unread": unread}}, upsert=True)
+        return unread
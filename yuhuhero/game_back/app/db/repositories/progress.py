@@ -0,0 +1,218 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.events import event_hub
+from app.db.leaderboard import leaderboard
+from app.db.level_bits import BITS_FIELD, decode_progress, level_index
+from app.db.progress_buffer import FLUSH_TOKEN_FIELD, progress_buffer
+from app.db.progress_change import DEFAULT_PROGRESS, VERSION_FIELD, ProgressChange
+from app.db.repositories.progress_changes import ProgressChangeLogRepository
+from app.db.repositories.progress_events import ProgressEventRepository
+
+PROGRESS_PROJECTION = {
+    "user_id": 1,
+    "current_level": 1,
+    "coins": 1,
+    "completed_levels": 1,
+    BITS_FIELD: 1,
+    VERSION_FIELD: 1,
+    "last_updated": 1,
+    "last_event_id": 1,
+    FLUSH_TOKEN_FIELD: 1,
+}
+
+
+class ProgressRepository:
+    """
+    Acceso a la colección `game_progress` (un documento por usuario).
+    Si el write-behind está activo (PROGRESS_WRITE_BEHIND), las escrituras se encolan en
+    `progress_buffer` y las lecturas incluyen los cambios pendientes.
+    Con el registro de eventos (PROGRESS_EVENT_LOG) cada escritura es un insert en
+    `progress_events`, y la lectura es el snapshot más los eventos aún no compactados.
+    Con PROGRESS_LEVELS_BITSET los niveles completados se guardan como bitset
+    (`completed_bits`); las lecturas siempre devuelven `completed_levels` expandido.
+    Cada escritura incrementa `version`; sin write-behind ni registro de eventos, además
+    queda en `progress_changes` lo que cambió, para `changes_since`.
+    Cada escritura informa al ranking en memoria del saldo de monedas resultante y
+    publica un evento `progress` (con la versión, si se conoce) en `event_hub`.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.game_progress
+        self.bitset = settings.PROGRESS_LEVELS_BITSET
+        self.events = ProgressEventRepository(db) if settings.PROGRESS_EVENT_LOG else None
+        self.change_log = ProgressChangeLogRepository(db)
+
+    @property
+    def buffer(self):
+        return progress_buffer if progress_buffer.running else None
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        progress = await self.collection.find_one({"user_id": str(user_id)}, PROGRESS_PROJECTION)
+        progress = await decode_progress(self.db, progress)
+        if self.events is not None:
+            return await self._with_tail(user_id, progress)
+        if self.buffer is not None:
+            progress = self.buffer.overlay(user_id, progress)
+        return progress
+
+    async def _with_tail(self, user_id: str, progress: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Aplicar al snapshot los eventos posteriores a su `last_event_id`"""
+        events = await self.events.tail(user_id, progress.get("last_event_id") if progress else None)
+        if not events:
+            return progress
+        change = ProgressChange()
+        for event in events:
+            change.merge_event(event)
+        return change.apply_to(progress if progress is not None else {"user_id": str(user_id), **DEFAULT_PROGRESS})
+
+    async def _resolve_levels(self, levels: Iterable[str]) -> None:
+        # El bitset necesita la posición de cada casilla antes de construir el update;
+        # una casilla fuera del mapa es UnknownLevelError (también con el registro de eventos,
+        # cuyo compactador asigna posiciones a lo ya guardado)
+        if self.bitset:
+            await level_index.positions(self.db, levels)
+
+    async def set_fields(self, user_id: str, fields: Dict[str, Any]) -> Optional[int]:
+        """Fijar campos del progreso; devuelve la versión guardada (None si la escritura es diferida)"""
+        change = ProgressChange()
+        change.merge(fields, None, None)
+        written = None
+        await self._resolve_levels(fields.get("completed_levels", []))
+        if self.events is not None:
+            await self.events.append(user_id, change)
+        elif self.buffer is not None:
+            self.buffer.stage(user_id, fields=fields)
+        else:
+            written = await self.collection.find_one_and_update(
+                {"user_id": str(user_id)},
+                change.to_update(bitset=self.bitset),
+                projection={VERSION_FIELD: 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            await self.change_log.record(user_id, written[VERSION_FIELD], change)
+        if "coins" in fields:
+            leaderboard.record(user_id, fields["coins"])
+        version = written[VERSION_FIELD] if written else None
+        await event_hub.publish(user_id, "progress", {VERSION_FIELD: version})
+        return version
+
+    async def seed(self, user_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Crear el progreso inicial solo si no existe ($setOnInsert, sin tocar un documento
+        existente) y devolver el progreso resultante. Si otra petición lo creó antes
+        (p. ej. un PUT concurrente), se devuelve el suyo en lugar de pisarlo.
+        """
+        change = ProgressChange()
+        change.merge(fields, None, None)
+        await self._resolve_levels(fields.get("completed_levels", []))
+        update = change.to_update(bitset=self.bitset)
+        # Se escribe directo también con write-behind o eventos: no hay cambios que combinar
+        result = await self.collection.update_one(
+            {"user_id": str(user_id)},
+            {"$setOnInsert": {**update.get("$setOnInsert", {}), **update["$set"], VERSION_FIELD: 1}},
+            upsert=True,
+        )
+        if result.upserted_id is None:
+            return await self.get(user_id)
+
+        if self.events is None and self.buffer is None:
+            await self.change_log.record(user_id, 1, change)
+        if "coins" in fields:
+            leaderboard.record(user_id, fields["coins"])
+        await event_hub.publish(user_id, "progress", {VERSION_FIELD: 1})
+        return {**DEFAULT_PROGRESS, **fields, "user_id": str(user_id), VERSION_FIELD: 1}
+
+    async def apply_update(
+        self,
+        user_id: str,
+        set_level: Optional[int] = None,
+        set_coins: Optional[int] = None,
+        add_coins: Optional[int] = None,
+        complete_levels: Optional[Iterable[str]] = None,
+        set_completed_levels: Optional[List[str]] = None,
+        reason: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Aplicar cambios de progreso en una sola operación atómica ($inc / $addToSet)
+        y devolver el documento actualizado (lo crea si no existe).
+        `reason` queda registrado en el evento cuando el registro de eventos está activo.
+        """
+        fields: Dict[str, Any] = {}
+        if set_level is not None:
+            fields["current_level"] = set_level
+        if set_coins is not None:
+            fields["coins"] = set_coins
+        if set_completed_levels is not None:
+            fields["completed_levels"] = list(set_completed_levels)
+
+        change = ProgressChange()
+        change.merge(fields, add_coins, complete_levels)
+        await self._resolve_levels(change.levels + list(fields.get("completed_levels", [])))
+        if self.events is not None:
+            await self.events.append(user_id, change, reason)
+            progress = await self.get(user_id)
+        elif self.buffer is not None:
+            self.buffer.stage(user_id, fields=fields, add_coins=add_coins, complete_levels=complete_levels)
+            progress = await self.get(user_id)
+        else:
+            progress = await self.collection.find_one_and_update(
+                {"user_id": str(user_id)},
+                change.to_update(bitset=self.bitset),
+                projection=PROGRESS_PROJECTION,
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            progress = await decode_progress(self.db, progress)
+            await self.change_log.record(user_id, progress[VERSION_FIELD], change)
+
+        if set_coins is not None or add_coins:
+            leaderboard.record(user_id, progress["coins"])
+        await event_hub.publish(user_id, "progress", {VERSION_FIELD: progress.get(VERSION_FIELD)})
+        return progress
+
+    async def changes_since(self, user_id: str, since: int) -> Optional[Dict[str, Any]]:
+        """
+        Cambios del progreso posteriores a la versión `since`:
+        • None si el cliente ya tiene la versión actual
+        • {"full": False, ...} con solo los campos cambiados y los niveles agregados
+        • {"full": True, ...} con todo el progreso si el historial no alcanza (expiró,
+          hubo un reemplazo de la lista de niveles, o las escrituras van por lotes/eventos)
+        """
+        progress = await self.get(user_id)
+        if progress is None:
+            progress = {"user_id": str(user_id), **DEFAULT_PROGRESS}
+        version = progress.get(VERSION_FIELD, 0)
+        if since == version:
+            return None
+
+        full = {
+            "version": version,
+            "full": True,
+            "current_level": progress["current_level"],
+            "coins": progress["coins"],
+            "completed_levels": progress["completed_levels"],
+        }
+        if since > version or self.events is not None or self.buffer is not None:
+            return full
+
+        entries = await self.change_log.between(user_id, since, version)
+        fields = {field for entry in entries for field in entry["fields"]}
+        if len(entries) != version - since or "completed_levels" in fields:
+            return full
+
+        delta: Dict[str, Any] = {"version": version, "full": False}
+        for field in ("current_level", "coins"):
+            if field in fields:
+                delta[field] = progress[field]
+        completed = set(progress["completed_levels"])
+        added: List[str] = []
+        for entry in entries:
+            added.extend(level for level in entry["levels"] if level in completed and level not in added)
+        if added:
+            delta["completed_levels_added"] = added
+        return delta
@@ -0,0 +1,45 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from app.db.progress_change import ProgressChange
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressChangeLogRepository:
+    """
+    Acceso a `progress_changes`: qué cambió en cada versión del progreso de un usuario
+    (campos fijados, monedas sumadas, niveles agregados). Lo usa la sincronización
+    incremental; las entradas caducan por TTL.
+    """
+
+    def __init__(self, db):
+        self.collection = db.progress_changes
+
+    async def record(self, user_id: str, version: int, change: ProgressChange) -> None:
+        fields = sorted(change.fields)
+        if change.coins_delta and "coins" not in fields:
+            fields.append("coins")
+        try:
+            await self.collection.insert_one({
+                "user_id": str(user_id),
+                "version": version,
+                "fields": fields,
+                "levels": list(change.levels),
+                "at": datetime.utcnow(),
+            })
+        except PyMongoError as e:
+            # El progreso ya se guardó: una entrada faltante solo obliga a una sincronización completa
+            logger.error(f"No se pudo registrar el cambio {version} del usuario {user_id}: {e}")
+
+    async def between(self, user_id: str, after: int, until: int) -> List[Dict[str, Any]]:
+        """Entradas con after < version <= until, en orden (índice user_id, version)"""
+        cursor = self.collection.find(
+            {"user_id": str(user_id), "version": {"$gt": after, "$lte": until}},
+            {"_id": 0, "version": 1, "fields": 1, "levels": 1},
+        ).sort("version", ASCENDING)
+        return await cursor.to_list(None)
@@ -0,0 +1,47 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING
+
+from app.db.progress_change import ProgressChange
+
+# Un evento por escritura de progreso; `_id` (ObjectId) da el orden de aplicación
+EVENT_PROJECTION = {"user_id": 1, "set": 1, "inc": 1, "levels": 1}
+
+
+class ProgressEventRepository:
+    """Acceso a la colección `progress_events` (solo inserciones)"""
+
+    def __init__(self, db):
+        self.collection = db.progress_events
+
+    async def append(self, user_id: str, change: ProgressChange, reason: Optional[str] = None) -> ObjectId:
+        event = {"user_id": str(user_id), **change.to_event(), "at": datetime.utcnow()}
+        if reason:
+            event["reason"] = reason
+        result = await self.collection.insert_one(event)
+        return result.inserted_id
+
+    async def tail(
+        self, user_id: str, after: Optional[ObjectId] = None, until: Optional[ObjectId] = None
+    ) -> List[Dict[str, Any]]:
+        """Eventos del usuario aún no incluidos en su snapshot, hasta `until` inclusive (índice user_id, _id)"""
+        query: Dict[str, Any] = {"user_id": str(user_id)}
+        id_range: Dict[str, Any] = {}
+        if after is not None:
+            id_range["$gt"] = after
+        if until is not None:
+            id_range["$lte"] = until
+        if id_range:
+            query["_id"] = id_range
+        cursor = self.collection.find(query, EVENT_PROJECTION).sort("_id", ASCENDING)
+        return await cursor.to_list(None)
+
+    async def scan(self, after: Optional[ObjectId], before: ObjectId, limit: int) -> List[Dict[str, Any]]:
+        """Siguiente lote de eventos de todos los usuarios, en orden de `_id`"""
+        id_range: Dict[str, Any] = {"$lt": before}
+        if after is not None:
+            id_range["$gt"] = after
+        cursor = self.collection.find({"_id": id_range}, EVENT_PROJECTION).sort("_id", ASCENDING).limit(limit)
+        return await cursor.to_list(limit)
@@ -0,0 +1,47 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import DESCENDING
+
+# Cuestionario inicial (el que marca `quizCompleted` en el usuario)
+ONBOARDING_QUIZ_ID = "onboarding"
+
+RESPONSE_PROJECTION = {"quiz_id": 1, "responses": 1, "completed": 1, "submitted_at": 1}
+
+
+class QuizResponseRepository:
+    """
+    Acceso a la colección `quiz_responses` (un documento por intento). Las respuestas ya
+    no viven en el documento del usuario, que así mantiene un tamaño constante.
+    """
+
+    def __init__(self, db):
+        self.collection = db.quiz_responses
+
+    async def create(
+        self,
+        user_id: str,
+        quiz_id: str,
+        responses: List[Dict[str, Any]],
+        completed: bool,
+        submitted_at: Optional[datetime] = None,
+    ) -> ObjectId:
+        result = await self.collection.insert_one({
+            "user_id": str(user_id),
+            "quiz_id": quiz_id,
+            "responses": responses,
+            "completed": completed,
+            "submitted_at": submitted_at or datetime.utcnow(),
+        })
+        return result.inserted_id
+
+    async def list_for_user(
+        self, user_id: str, quiz_id: Optional[str] = None, limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Intentos del usuario, del más reciente al más antiguo"""
+        query: Dict[str, Any] = {"user_id": str(user_id)}
+        if quiz_id is not None:
+            query["quiz_id"] = quiz_id
+        cursor = self.collection.find(query, RESPONSE_PROJECTION).sort("submitted_at", DESCENDING).limit(limit)
+        return await cursor.to_list(limit)
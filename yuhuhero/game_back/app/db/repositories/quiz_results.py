@@ -0,0 +1,14 @@
+from typing import Any, Dict
+
+from bson import ObjectId
+
+
+class QuizResultRepository:
+    """Acceso a la colección `quiz_results` (un documento por intento)"""
+
+    def __init__(self, db):
+        self.collection = db.quiz_results
+
+    async def create(self, result: Dict[str, Any]) -> ObjectId:
+        inserted = await self.collection.insert_one(result)
+        return inserted.inserted_id
@@ -0,0 +1,26 @@
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+
+# Para corregir solo hacen falta los IDs de pregunta y la opción correcta; `version` para
+# que la clave cacheada se compare igual que la compilada desde el quiz completo
+ANSWER_KEY_PROJECTION = {"questions.id": 1, "questions.correct_option_id": 1, "version": 1}
+
+
+class QuizRepository:
+    """Acceso a la colección `quizzes`"""
+
+    def __init__(self, db):
+        self.collection = db.quizzes
+
+    async def get_by_title(self, title: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"title": title})
+
+    async def get_answer_key(self, quiz_id: str) -> Optional[Dict[str, Any]]:
+        if not ObjectId.is_valid(quiz_id):
+            return None
+        return await self.collection.find_one({"_id": ObjectId(quiz_id)}, ANSWER_KEY_PROJECTION)
+
+    async def create(self, quiz: Dict[str, Any]) -> ObjectId:
+        result = await self.collection.insert_one(quiz)
+        return result.inserted_id
@@ -0,0 +1,107 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from bson import ObjectId
+from pymongo import ASCENDING
+
+# Campos que necesita la autenticación y las respuestas de perfil (nunca la contraseña
+# ni arrays que crecen como quizResponses)
+PROFILE_PROJECTION = {
+    "name": 1,
+    "phone": 1,
+    "email": 1,
+    "role": 1,
+    "is_admin": 1,
+    "quizCompleted": 1,
+    "quiz_completed": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+# Login solo necesita el ID, el teléfono y el hash
+CREDENTIALS_PROJECTION = {"_id": 1, "phone": 1, "password": 1, "hashed_password": 1}
+
+# Listados de administración
+LISTING_PROJECTION = {"name": 1, "phone": 1, "quizCompleted": 1, "created_at": 1}
+
+# Exportación completa para reportes (sin contraseña ni respuestas del quiz)
+EXPORT_FIELDS = ["name", "phone", "email", "role", "quizCompleted", "created_at"]
+
+
+def to_object_id(user_id: Union[str, ObjectId]) -> Optional[ObjectId]:
+    """Convertir un ID de usuario canónico (str de ObjectId) o devolver None si no es válido"""
+    if isinstance(user_id, ObjectId):
+        return user_id
+    return ObjectId(user_id) if ObjectId.is_valid(user_id) else None
+
+
+def profile_view(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducir un documento de usuario completo a los campos de PROFILE_PROJECTION"""
+    return {field: value for field, value in user.items() if field == "_id" or field in PROFILE_PROJECTION}
+
+
+class UserRepository:
+    """Acceso a la colección `users`"""
+
+    def __init__(self, db):
+        self.collection = db.users
+
+    async def get_profile(self, user_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
+        object_id = to_object_id(user_id)
+        if object_id is None:
+            return None
+        return await self.collection.find_one({"_id": object_id}, PROFILE_PROJECTION)
+
+    async def get_profile_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"phone": phone}, PROFILE_PROJECTION)
+
+    async def get_credentials(self, phone: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"phone": phone}, CREDENTIALS_PROJECTION)
+
+    async def phone_exists(self, phone: str) -> bool:
+        return await self.collection.find_one({"phone": phone}, {"_id": 1}) is not None
+
+    async def create(self, user: Dict[str, Any]) -> ObjectId:
+        """Insertar un usuario (insert_one agrega `_id` al diccionario)"""
+        result = await self.collection.insert_one(user)
+        return result.inserted_id
+
+    async def set_quiz_completed(self, user_id: Union[str, ObjectId], completed: bool) -> bool:
+        object_id = to_object_id(user_id)
+        if object_id is None:
+            return False
+        await self.collection.update_one({"_id": object_id}, {"$set": {"quizCompleted": completed}})
+        return True
+
+    async def list_page(
+        self, limit: int = 100, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Página del listado por `_id` ascendente y el cursor de la siguiente (None si no hay más).
+        El cursor es el último `_id` devuelto: cada página es un rango del índice de `_id`,
+        con el mismo costo sin importar qué tan adelante esté. ValueError si no es válido.
+        """
+        query: Dict[str, Any] = {}
+        if cursor:
+            if not ObjectId.is_valid(cursor):
+                raise ValueError("Cursor inválido")
+            query["_id"] = {"$gt": ObjectId(cursor)}
+        # Se pide uno más para saber si hay otra página sin contar documentos
+        items = await self.collection.find(query, LISTING_PROJECTION).sort("_id", ASCENDING).limit(limit + 1).to_list(limit + 1)
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, str(items[-1]["_id"])
+
+    async def iter_export(self, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """Todos los usuarios con los campos de EXPORT_FIELDS, leídos del cursor por lotes"""
+        cursor = self.collection.find(
+            {}, {field: 1 for field in EXPORT_FIELDS}, batch_size=batch_size
+        ).sort("_id", ASCENDING)
+        async for user in cursor:
+            yield user
+
+    async def get_names(self, user_ids: List[str]) -> Dict[str, str]:
+        """Nombres de varios usuarios en una sola consulta (por `_id`)"""
+        object_ids = [object_id for object_id in map(to_object_id, user_ids) if object_id is not None]
+        cursor = self.collection.find({"_id": {"$in": object_ids}}, {"name": 1})
+        return {str(user["_id"]): user.get("name") async for user in cursor}
@@ -0,0 +1,26 @@
+from typing import Any, Dict, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import register_metrics
+
+# Documentos de usuario por ID (por proceso). El TTL acota lo desactualizado que
+# puede estar un worker cuando otro worker modifica el mismo usuario.
+user_cache = LRUCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+register_metrics("user_cache", user_cache.stats)
+
+
+def get_cached_user(user_id: str) -> Optional[Dict[str, Any]]:
+    """Obtener una copia del usuario cacheado o None"""
+    user = user_cache.get(str(user_id))
+    return dict(user) if user is not None else None
+
+
+def cache_user(user_id: str, user: Dict[str, Any]) -> None:
+    """Guardar (o refrescar) un usuario en la cache"""
+    user_cache.set(str(user_id), dict(user))
+
+
+def invalidate_user(user_id: str) -> None:
+    """Invalidar un usuario tras modificar su documento"""
+    user_cache.pop(str(user_id))
@@ -0,0 +1,155 @@
+"""
+Alta masiva de usuarios desde CSV o NDJSON (columnas `name`, `phone`, `password`).
+
+El archivo se lee en streaming; las contraseñas de cada lote se hashean en un pool de
+procesos mientras se inserta el lote anterior, y los usuarios se escriben con
+insert_many(ordered=False). Los teléfonos repetidos (en la base o en el propio archivo)
+los rechaza el índice único y se reportan sin detener la importación.
+"""
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from app.core.hashing import hash_passwords
+from app.db.indexes import INDEXES, ensure_indexes
+from app.models.user import create_user_dict
+
+DUPLICATE_KEY = 11000
+MAX_REPORTED = 100  # Ejemplos de duplicados / líneas inválidas en el reporte
+REQUIRED_FIELDS = ("name", "phone", "password")
+
+
+def read_records(path: str, format: Optional[str] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(número de línea, registro) del archivo, sin cargarlo completo en memoria"""
+    format = format or ("csv" if path.endswith(".csv") else "ndjson")
+    with open(path, encoding="utf-8", newline="") as f:
+        if format == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            # Una línea mal formada cuenta como inválida, sin detener la importación
+            yield line_number, record if isinstance(record, dict) else {}
+
+
+async def _hash_batch(executor: Executor, workers: int, passwords: List[str]) -> List[str]:
+    """Hashear un lote repartido en un trozo por proceso"""
+    loop = asyncio.get_running_loop()
+    size = max(1, -(-len(passwords) // workers))
+    chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    results = await asyncio.gather(*(loop.run_in_executor(executor, hash_passwords, chunk) for chunk in chunks))
+    return [hashed for chunk in results for hashed in chunk]
+
+
+class MissingUniqueIndexError(RuntimeError):
+    """No existe el índice único de `users.phone`: importar crearía teléfonos duplicados"""
+
+
+class UserImporter:
+    """Importación de un archivo; `report` acumula leídos, importados, duplicados e inválidos"""
+
+    def __init__(self, db, batch_size: int = 1000, workers: Optional[int] = None):
+        self.db = db
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.report: Dict[str, Any] = {
+            "read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "failed": 0,
+            "duplicate_phones": [], "invalid_lines": [],
+        }
+        self.duplicates_out = None
+
+    def _valid(self, line_number: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        record = {field: str(record.get(field) or "").strip() for field in REQUIRED_FIELDS}
+        if all(record.values()):
+            return record
+        self.report["invalid"] += 1
+        if len(self.report["invalid_lines"]) < MAX_REPORTED:
+            self.report["invalid_lines"].append(line_number)
+        return None
+
+    def _batches(self, path: str, format: Optional[str]) -> Iterator[List[Dict[str, Any]]]:
+        batch: List[Dict[str, Any]] = []
+        for line_number, record in read_records(path, format):
+            self.report["read"] += 1
+            record = self._valid(line_number, record)
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _insert(self, records: List[Dict[str, Any]], hashed: List[str]) -> None:
+        users = [create_user_dict(record, hashed_password=password) for record, password in zip(records, hashed)]
+        try:
+            result = await self.db.users.insert_many(users, ordered=False)
+            self.report["imported"] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            self.report["imported"] += e.details.get("nInserted", 0)
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != DUPLICATE_KEY:
+                    self.report["failed"] += 1
+                    continue
+                phone = users[error["index"]]["phone"]
+                self.report["duplicates"] += 1
+                if len(self.report["duplicate_phones"]) < MAX_REPORTED:
+                    self.report["duplicate_phones"].append(phone)
+                if self.duplicates_out is not None:
+                    self.duplicates_out.write(phone + "\n")
+
+    async def run(self, path: str, format: Optional[str] = None, duplicates_path: Optional[str] = None) -> Dict[str, Any]:
+        # Sin el índice único de `phone` no se detectarían los duplicados: no se importa nada
+        indexes = await ensure_indexes(self.db, [spec for spec in INDEXES if spec.name == "users_phone_unique"])
+        if indexes["failed"]:
+            raise MissingUniqueIndexError(
+                "No se pudo crear el índice único users.phone (¿teléfonos duplicados en la base?); "
+                "se cancela la importación"
+            )
+        started = time.perf_counter()
+        if duplicates_path:
+            self.duplicates_out = open(duplicates_path, "w", encoding="utf-8")
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                pending: Optional[asyncio.Task] = None
+                for records in self._batches(path, format):
+                    hashed = await _hash_batch(executor, self.workers, [record["password"] for record in records])
+                    # El lote anterior se inserta mientras se hashea este
+                    if pending is not None:
+                        await pending
+                    pending = asyncio.create_task(self._insert(records, hashed))
+                    self._progress(started)
+                if pending is not None:
+                    await pending
+        finally:
+            if self.duplicates_out is not None:
+                self.duplicates_out.close()
+
+        elapsed = time.perf_counter() - started
+        self.report["elapsed_s"] = round(elapsed, 2)
+        self.report["rate_per_sec"] = round(self.report["imported"] / elapsed, 1) if elapsed > 0 else 0.0
+        return self.report
+
+    def _progress(self, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        rate = self.report["read"] / elapsed if elapsed > 0 else 0.0
+        print(
+            f"leídos {self.report['read']}, importados {self.report['imported']}, "
+            f"duplicados {self.report['duplicates']} ({rate:.0f} usuarios/s)",
+            file=sys.stderr,
+        )
@@ -1,8 +1,11 @@
-from fastapi import Depends, HTTPException, status, Request
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from app.config.security import verify_token
 from app.config.database import get_user_by_id
+from app.core.events import EVENTS_TOKEN_SCOPE
 from app.models.user import TokenData, User, user_entity
 import logging
 
@@ -12,23 +15,24 @@ logger = logging.getLogger(__name__)
 
 # El token no necesita el / al inicio porque el cliente lo quita
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
 
-async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)) -> User:
-    """Obtener el usuario actual a partir del token JWT"""
+async def _user_from_token(token: str, scope: Optional[str] = None) -> User:
+    """Usuario del token JWT; el `scope` del token debe coincidir (None = token de sesión)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciales inválidas",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # Log headers para debug
-    logger.info(f"Authorization header: {request.headers.get('Authorization')}")
-    
     # Verificar y decodificar token
     payload = verify_token(token)
     if payload is None:
         logger.error(f"Token inválido: {token[:10]}...")
         raise credentials_exception
+    if payload.get("scope") != scope:
+        logger.error(f"Token con scope {payload.get('scope')!r} donde se esperaba {scope!r}")
+        raise credentials_exception
     
     user_id = payload.get("sub")
     if user_id is None:
@@ -50,6 +54,31 @@ async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)
     
     return user_data
 
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)) -> User:
+    """Obtener el usuario actual a partir del token JWT"""
+    # Log headers para debug
+    logger.info(f"Authorization header: {request.headers.get('Authorization')}")
+    return await _user_from_token(token)
+
+async def get_stream_user(
+    request: Request,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+) -> User:
+    """
+    Usuario de una conexión de streaming. EventSource no permite cabeceras, así que en la
+    URL se acepta solo el token de corta duración de POST /api/events/token, nunca el de sesión
+    """
+    if token is not None:
+        return await get_current_user(request, token)
+    if access_token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Credenciales inválidas",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await _user_from_token(access_token, scope=EVENTS_TOKEN_SCOPE)
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Verificar que el usuario está activo"""
     return current_user
@@ -1,7 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import auth, users, quiz, game, notifications
-from app.db.database import connect_to_mongo, close_mongo_connection
+from fastapi.responses import JSONResponse
+from app.api.routes import auth, users, quiz, game, notifications, metrics, events
+from app.core.hashing import HashingQueueFullError, password_hasher
+from app.core.config import settings
+from app.core.events import event_hub
+from app.db.broadcasts import broadcast_engine
+from app.db.database import connect_to_mongo, close_mongo_connection, get_database
+from app.db.game_map_store import game_map_store
+from app.db.event_broker import make_broker
+from app.db.indexes import ensure_indexes
+from app.db.leaderboard import leaderboard
+from app.db.notification_archiver import notification_archiver
+from app.db.progress_buffer import progress_buffer
+from app.db.progress_compactor import progress_compactor
 
 app = FastAPI(title="YuhuHero API", description="API para la aplicación de educación financiera gamificada")
 
@@ -18,10 +30,42 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
+    if settings.ENSURE_INDEXES_ON_STARTUP:
+        await ensure_indexes(get_database())
+    await event_hub.start(make_broker(get_database()))
+    if settings.PROGRESS_WRITE_BEHIND:
+        progress_buffer.start(get_database().game_progress)
+    if settings.PROGRESS_EVENT_LOG:
+        progress_compactor.start(get_database())
+    await game_map_store.start(get_database())
+    if settings.LEADERBOARD_IN_MEMORY:
+        leaderboard.start(get_database())
+    if settings.NOTIFICATIONS_ARCHIVE_AFTER_DAYS > 0:
+        notification_archiver.start(get_database())
+    # Retomar envíos masivos que quedaron a medias
+    await broadcast_engine.resume(get_database())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Escribir el progreso pendiente antes de cerrar la conexión
+    await progress_buffer.stop()
+    await progress_compactor.stop()
+    await game_map_store.stop()
+    await leaderboard.stop()
+    await notification_archiver.stop()
+    await broadcast_engine.stop()
+    await event_hub.stop()
     await close_mongo_connection()
+    password_hasher.shutdown()
+
+@app.exception_handler(HashingQueueFullError)
+async def hashing_queue_full_handler(request: Request, exc: HashingQueueFullError):
+    # El pool de bcrypt está saturado: pedir al cliente que reintente
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servicio ocupado, intenta de nuevo en unos segundos"},
+        headers={"Retry-After": "1"},
+    )
 
 # Incluir routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
@@ -29,6 +73,8 @@ app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(quiz.router, prefix="/api/quiz", tags=["quiz"])
 app.include_router(game.router, prefix="/api/game", tags=["game"])
 app.include_router(notifications.router, prefix="/api/notifications", tags=["notifications"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
 
 @app.get("/", tags=["root"])
 def read_root():
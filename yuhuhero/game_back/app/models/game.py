@@ -35,12 +35,36 @@ class GameProgress(BaseModel):
     current_level: int = 1
     coins: int = 0
     completed_levels: List[str] = []
+    completed_levels_bits: Optional[str] = None  # Forma compacta (base64) con ?levels=compact
+    version: int = 0  # Aumenta con cada escritura; ver /progress/changes
     last_updated: datetime = Field(default_factory=datetime.utcnow)
 
 class GameProgressUpdate(BaseModel):
     current_level: Optional[int] = None
     coins: Optional[int] = None
     completed_levels: Optional[List[str]] = None
+    add_coins: Optional[int] = None  # Incremento atómico de monedas
+    complete_level: Optional[str] = None  # Nivel a añadir a completed_levels
+
+class GameProgressChanges(BaseModel):
+    version: int
+    full: bool  # True: progreso completo (el historial no alcanzaba)
+    current_level: Optional[int] = None
+    coins: Optional[int] = None
+    completed_levels: Optional[List[str]] = None  # Solo con full=True
+    completed_levels_added: Optional[List[str]] = None
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: str
+    name: Optional[str] = None
+    coins: int
+
+class LeaderboardRank(BaseModel):
+    user_id: str
+    coins: int
+    rank: int  # Empates comparten posición
+    total_players: int
 
 class GameTile(BaseModel):
     id: str
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 
@@ -36,4 +36,20 @@ class NotificationResponse(NotificationBase):
     model_config = ConfigDict(from_attributes=True)
 
 class NotificationUpdate(BaseModel):
-    read: Optional[bool] = None 
\ No newline at end of file
+    read: Optional[bool] = None
+
+class BroadcastFilter(BaseModel):
+    """Destinatarios de un envío masivo (sin filtros: todos los usuarios)"""
+    quiz_completed: Optional[bool] = None
+    role: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class BroadcastCreate(NotificationBase):
+    filter: BroadcastFilter = BroadcastFilter()
+
+# Máximo de IDs por operación masiva
+MAX_BULK_IDS = 1000
+
+class NotificationIds(BaseModel):
+    ids: List[str] 
\ No newline at end of file
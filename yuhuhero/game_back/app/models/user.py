@@ -7,17 +7,20 @@ from passlib.context import CryptContext
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
-def create_user_dict(data: dict) -> dict:
+def create_user_dict(data: dict, hashed_password: Optional[str] = None) -> dict:
     """
     Prepara el payload que se guardará en MongoDB.
     Espera keys: name, phone, password  (y cualquier otro campo extra).
-    • Hashea la contraseña
+    • Hashea la contraseña (o usa `hashed_password` si ya se calculó en el pool)
     • Agrega timestamps y banderas por defecto
     """
+    if hashed_password is None:
+        hashed_password = pwd_context.hash(data["password"])
+
     user = {
         "name": data["name"],
         "phone": data["phone"],
-        "password": pwd_context.hash(data["password"]),
+        "password": hashed_password,
         "quizCompleted": False,
         "created_at": datetime.utcnow(),
         "role": "user",
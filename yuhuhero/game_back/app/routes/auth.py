@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from app.models.user import User, Token, UserCreate, user_entity
-from app.config.security import verify_password, create_access_token
-from app.config.database import get_user_by_phone, create_user
+from app.config.security import verify_password_async, get_password_hash_async, create_access_token
+from app.config.database import get_user_by_phone, get_user_credentials, create_user
 from pydantic import BaseModel
 import logging
 from app.models.user import create_user_dict
@@ -28,7 +28,9 @@ async def register(user_data: UserCreate):
         )
     
     # Convertir el modelo Pydantic a un diccionario para MongoDB
-    user_dict = create_user_dict(user_data.dict())
+    # (bcrypt se ejecuta en el pool de hashing, fuera del event loop)
+    hashed_password = await get_password_hash_async(user_data.password)
+    user_dict = create_user_dict(user_data.dict(), hashed_password=hashed_password)
     
     # Crear nuevo usuario
     new_user_id = await create_user(user_dict)
@@ -55,8 +57,8 @@ async def register(user_data: UserCreate):
 @router.post("/login", response_model=Token)
 async def login(form_data: LoginForm):
     """Autenticar usuario y generar token JWT"""
-    # Buscar usuario por teléfono
-    user = await get_user_by_phone(form_data.phone)
+    # Buscar usuario por teléfono (solo _id, teléfono y hash)
+    user = await get_user_credentials(form_data.phone)
     if not user:
         logger.warning(f"Intento de login con teléfono no registrado: {form_data.phone}")
         raise HTTPException(
@@ -70,7 +72,7 @@ async def login(form_data: LoginForm):
     if "hashed_password" in user:
         password_field = "hashed_password"
     
-    if not verify_password(form_data.password, user[password_field]):
+    if not await verify_password_async(form_data.password, user[password_field]):
         logger.warning(f"Contraseña incorrecta para usuario: {form_data.phone}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
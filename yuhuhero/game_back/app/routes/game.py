@@ -1,18 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import List, Literal
 import uuid
 
 from app.models.user import User
-from app.models.game import GameProgress, GameProgressUpdate, GameTile, GameMap
+from app.models.game import (
+    GameProgress, GameProgressUpdate, GameProgressChanges, GameTile, GameMap, LeaderboardEntry, LeaderboardRank
+)
 from app.dependencies import get_current_active_user
-from app.config.database import update_game_progress, get_game_progress
+from app.config.database import (
+    database, create_game_progress, get_game_progress, apply_progress_update, get_progress_changes
+)
+from app.core.catalog import catalog_response, encode_catalog
+from app.db.leaderboard import leaderboard
+from app.db.level_bits import UnknownLevelError, compact_levels, level_index
+from app.db.repositories.leaderboard import LeaderboardRepository
 
 router = APIRouter()
 
+def stable_tile_id(mission_id: str) -> str:
+    """ID de casilla derivado de la misión: igual en todos los workers y reinicios"""
+    return f"tile-{uuid.uuid5(uuid.NAMESPACE_URL, f'yuhuhero/{mission_id}')}"
+
 # Datos de ejemplo para el mapa del juego
 DEFAULT_GAME_TILES = [
     GameTile(
-        id=f"tile-{uuid.uuid4()}",
+        id=stable_tile_id("mission-intro"),
         title="Introducción a Finanzas",
         description="Aprende los conceptos básicos de finanzas personales",
         position_x=1,
@@ -22,7 +34,7 @@ DEFAULT_GAME_TILES = [
         mission_id="mission-intro"
     ),
     GameTile(
-        id=f"tile-{uuid.uuid4()}",
+        id=stable_tile_id("mission-savings"),
         title="Ahorro",
         description="Aprende a crear un plan de ahorro",
         position_x=2,
@@ -32,7 +44,7 @@ DEFAULT_GAME_TILES = [
         mission_id="mission-savings"
     ),
     GameTile(
-        id=f"tile-{uuid.uuid4()}",
+        id=stable_tile_id("mission-investment"),
         title="Inversión",
         description="Descubre cómo funciona la inversión",
         position_x=3,
@@ -42,7 +54,7 @@ DEFAULT_GAME_TILES = [
         mission_id="mission-investment"
     ),
     GameTile(
-        id=f"tile-{uuid.uuid4()}",
+        id=stable_tile_id("mission-debt"),
         title="Deudas",
         description="Manejo y reducción de deudas",
         position_x=2,
@@ -53,8 +65,20 @@ DEFAULT_GAME_TILES = [
     )
 ]
 
+LevelsFormat = Literal["list", "compact"]
+
+async def _format_levels(progress: GameProgress, levels: str) -> GameProgress:
+    """Con levels=compact, los niveles van como bitset en base64 y la lista queda vacía"""
+    if levels == "compact":
+        progress.completed_levels_bits = await compact_levels(database, progress.completed_levels)
+        progress.completed_levels = []
+    return progress
+
 @router.get("/progress", response_model=GameProgress)
-async def get_user_game_progress(current_user: User = Depends(get_current_active_user)):
+async def get_user_game_progress(
+    levels: LevelsFormat = "list",
+    current_user: User = Depends(get_current_active_user)
+):
     """Obtener el progreso del juego del usuario"""
     progress = await get_game_progress(current_user["id"])
     
@@ -66,57 +90,81 @@ async def get_user_game_progress(current_user: User = Depends(get_current_active
             coins=0,
             completed_levels=[]
         )
-        await update_game_progress(current_user["id"], default_progress.dict())
-        return default_progress
+        # Solo se inserta si sigue sin existir: un PUT concurrente no se pisa
+        progress = await create_game_progress(
+            current_user["id"], default_progress.dict(exclude={"completed_levels_bits", "version"})
+        )
+        if progress:
+            return await _format_levels(GameProgress(**progress), levels)
+        return await _format_levels(default_progress, levels)
     
-    return GameProgress(**progress)
+    return await _format_levels(GameProgress(**progress), levels)
+
+@router.get("/progress/changes", response_model=GameProgressChanges, response_model_exclude_none=True)
+async def get_user_progress_changes(
+    since: int = Query(..., ge=0),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Solo lo que cambió desde la versión `since`; 304 sin cuerpo si no hay cambios"""
+    changes = await get_progress_changes(current_user["id"], since)
+    if changes is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    return changes
 
 @router.put("/progress", response_model=GameProgress)
 async def update_user_game_progress(
     progress_data: GameProgressUpdate,
+    levels: LevelsFormat = "list",
     current_user: User = Depends(get_current_active_user)
 ):
     """Actualizar el progreso del juego del usuario"""
-    # Obtener progreso actual
-    current_progress = await get_game_progress(current_user["id"])
-    
-    if not current_progress:
-        # Si no hay progreso, crear uno nuevo
-        current_progress = {
-            "user_id": current_user["id"],
-            "current_level": 1,
-            "coins": 0,
-            "completed_levels": []
-        }
-    
-    # Actualizar datos según la solicitud
-    update_data = {}
-    
-    if progress_data.current_level is not None:
-        update_data["current_level"] = progress_data.current_level
-    
-    if progress_data.coins is not None:
-        update_data["coins"] = progress_data.coins
-    
-    if progress_data.add_coins is not None:
-        update_data["coins"] = current_progress.get("coins", 0) + progress_data.add_coins
-    
-    if progress_data.complete_level is not None:
-        completed_levels = current_progress.get("completed_levels", [])
-        if progress_data.complete_level not in completed_levels:
-            completed_levels.append(progress_data.complete_level)
-        update_data["completed_levels"] = completed_levels
+    # Una sola operación atómica ($inc / $addToSet) que devuelve el documento actualizado
+    complete_levels = [progress_data.complete_level] if progress_data.complete_level is not None else None
+    try:
+        updated_progress = await apply_progress_update(
+            current_user["id"],
+            set_level=progress_data.current_level,
+            set_coins=progress_data.coins,
+            add_coins=progress_data.add_coins,
+            complete_levels=complete_levels
+        )
+    except UnknownLevelError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    # Actualizar en la base de datos
-    await update_game_progress(current_user["id"], update_data)
+    if updated_progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al actualizar el progreso"
+        )
     
-    # Obtener progreso actualizado
-    updated_progress = await get_game_progress(current_user["id"])
-    return GameProgress(**updated_progress)
+    return await _format_levels(GameProgress(**updated_progress), levels)
+
+# Respuesta del mapa codificada una sola vez al cargar el módulo
+DEFAULT_GAME_MAP_CATALOG = encode_catalog(GameMap(tiles=DEFAULT_GAME_TILES))
+# Las casillas de este mapa son las únicas que pueden recibir posición en el bitset
+level_index.allow_tiles(tile.id for tile in DEFAULT_GAME_TILES)
 
 @router.get("/map", response_model=GameMap)
-async def get_game_map(current_user: User = Depends(get_current_active_user)):
-    """Obtener el mapa del juego"""
+async def get_game_map(request: Request, current_user: User = Depends(get_current_active_user)):
+    """Obtener el mapa del juego (bytes precodificados con ETag; 304 si no cambió)"""
     # En una implementación real, este mapa podría cargarse desde la base de datos
     # y personalizarse según el progreso del usuario
-    return GameMap(tiles=DEFAULT_GAME_TILES) 
\ No newline at end of file
+    return catalog_response(request, DEFAULT_GAME_MAP_CATALOG) 
+
+@router.get("/levels/index")
+async def get_level_index(request: Request, current_user: User = Depends(get_current_active_user)):
+    """Posición de cada casilla en el bitset de niveles"""
+    return catalog_response(request, encode_catalog(await level_index.load(database)))
+
+@router.get("/leaderboard", response_model=List[LeaderboardEntry])
+async def get_leaderboard(
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Mejores jugadores por monedas"""
+    return await LeaderboardRepository(database).top(limit)
+
+@router.get("/leaderboard/me", response_model=LeaderboardRank)
+async def get_my_rank(current_user: User = Depends(get_current_active_user)):
+    """Posición del usuario en el ranking por monedas"""
+    return await leaderboard.rank(database, current_user["id"])
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+
+from app.models.user import User
+from app.dependencies import get_admin_user
+from app.core.metrics import collect_metrics
+
+router = APIRouter()
+
+@router.get("/", response_model=Dict[str, Dict[str, Any]])
+async def get_metrics(current_user: User = Depends(get_admin_user)):
+    """Obtener estadísticas internas del proceso (solo admin)"""
+    return collect_metrics()
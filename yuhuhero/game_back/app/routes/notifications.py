@@ -1,20 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-import uuid
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
+from datetime import datetime
 
 from app.models.user import User
-from app.models.notification import Notification, NotificationCreate, NotificationUpdate
+from app.models.notification import MAX_BULK_IDS, Notification, NotificationCreate, NotificationIds, NotificationUpdate
 from app.dependencies import get_current_active_user
-from app.config.database import create_notification as db_create_notification, get_notifications
+from app.config.database import (
+    create_notification as db_create_notification,
+    delete_notifications,
+    get_notifications,
+    get_unread_count,
+    mark_all_notifications_read,
+    mark_notifications_read,
+    update_notification,
+)
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Notification])
-async def get_user_notifications(current_user: User = Depends(get_current_active_user)):
-    """Obtener todas las notificaciones del usuario"""
-    notifications = await get_notifications(current_user.id)
+async def get_user_notifications(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Obtener una página de notificaciones; la siguiente se pide con el cursor de X-Next-Cursor"""
+    try:
+        notifications, next_cursor = await get_notifications(current_user["id"], limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return notifications
 
+@router.get("/unread-count", response_model=dict)
+async def get_user_unread_count(current_user: User = Depends(get_current_active_user)):
+    """Número de notificaciones no leídas (lectura de un contador)"""
+    return {"unread": await get_unread_count(current_user["id"])}
+
 @router.post("/", response_model=Notification)
 async def create_user_notification(
     notification_data: NotificationCreate,
@@ -22,24 +45,53 @@ async def create_user_notification(
 ):
     """Crear una nueva notificación (esto normalmente sería interno, pero se expone para pruebas)"""
     # Asegurarse de que la notificación sea para el usuario actual
-    if notification_data.user_id != current_user.id:
-        notification_data.user_id = current_user.id
+    if notification_data.user_id != current_user["id"]:
+        notification_data.user_id = current_user["id"]
         
     # Create notification dict from Pydantic model
-    notification_dict = notification_data.dict()
+    notification_dict = {**notification_data.dict(), "read": False, "created_at": datetime.utcnow()}
     notification_id = await db_create_notification(notification_dict)
     
     # Return the created notification
     return Notification(**notification_dict, id=str(notification_id))
 
+def _check_bulk_size(ids: List[str]) -> None:
+    if len(ids) > MAX_BULK_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {MAX_BULK_IDS} notificaciones por operación"
+        )
+
+@router.post("/read-all", response_model=dict)
+async def mark_all_as_read(current_user: User = Depends(get_current_active_user)):
+    """Marcar todas las notificaciones del usuario como leídas"""
+    return {"modified": await mark_all_notifications_read(current_user["id"])}
+
+@router.post("/read", response_model=dict)
+async def mark_many_as_read(body: NotificationIds, current_user: User = Depends(get_current_active_user)):
+    """Marcar como leídas las notificaciones indicadas"""
+    _check_bulk_size(body.ids)
+    return {"modified": await mark_notifications_read(current_user["id"], body.ids)}
+
+@router.post("/delete", response_model=dict)
+async def delete_many(body: NotificationIds, current_user: User = Depends(get_current_active_user)):
+    """Borrar las notificaciones indicadas"""
+    _check_bulk_size(body.ids)
+    return {"deleted": await delete_notifications(current_user["id"], body.ids)}
+
 @router.put("/{notification_id}", response_model=dict)
 async def mark_notification_as_read(
     notification_id: str,
     update_data: NotificationUpdate,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Marcar una notificación como leída"""
-    # En una implementación real, verificaríamos que la notificación pertenece al usuario
-    # y actualizaríamos el estado en la base de datos
+    """Marcar una notificación como leída (o no leída)"""
+    read = update_data.read if update_data.read is not None else True
+    updated = await update_notification(notification_id, current_user["id"], {"read": read})
+    if updated is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Notificación no encontrada"
+        )
     
-    return {"success": True, "message": f"Notificación {notification_id} actualizada"} 
\ No newline at end of file
+    return {"success": True, "message": f"Notificación {notification_id} actualizada"}
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from typing import List
 import uuid
 
 from app.models.user import User
 from app.models.quiz import Quiz as FinancialQuiz, QuizQuestion, QuizOption, QuizSubmission, QuizResult
 from app.dependencies import get_current_active_user
-from app.config.database import update_quiz_status, update_game_progress, get_game_progress
+from app.config.database import update_quiz_status, add_coins
+from app.db.answer_keys import compile_answer_key
+from app.core.catalog import catalog_response, encode_catalog
 
 router = APIRouter()
 
@@ -78,10 +80,14 @@ SAMPLE_QUIZ = FinancialQuiz(
     ]
 )
 
+# Clave de respuestas y respuesta HTTP compiladas una sola vez al cargar el módulo
+SAMPLE_ANSWER_KEY = compile_answer_key(SAMPLE_QUIZ.dict())
+SAMPLE_QUIZ_CATALOG = encode_catalog(SAMPLE_QUIZ)
+
 @router.get("/financial", response_model=FinancialQuiz)
-async def get_financial_quiz(current_user: User = Depends(get_current_active_user)):
-    """Obtener el quiz financiero"""
-    return SAMPLE_QUIZ
+async def get_financial_quiz(request: Request, current_user: User = Depends(get_current_active_user)):
+    """Obtener el quiz financiero (bytes precodificados con ETag; 304 si no cambió)"""
+    return catalog_response(request, SAMPLE_QUIZ_CATALOG)
 
 @router.post("/submit", response_model=QuizResult)
 async def submit_quiz(
@@ -96,17 +102,9 @@ async def submit_quiz(
             detail="Quiz no encontrado"
         )
     
-    # Verificar respuestas
-    correct_answers = 0
-    total_questions = len(SAMPLE_QUIZ.questions)
-    
-    # Mapeo de id de pregunta a opción correcta
-    correct_options = {q.id: q.correct_option_id for q in SAMPLE_QUIZ.questions}
-    
-    for answer in submission.answers:
-        if answer.question_id in correct_options:
-            if answer.selected_option_id == correct_options[answer.question_id]:
-                correct_answers += 1
+    # Verificar respuestas con la clave precompilada (O(respuestas))
+    correct_answers = SAMPLE_ANSWER_KEY.grade(submission.answers)
+    total_questions = SAMPLE_ANSWER_KEY.total_questions
     
     # Calcular puntuación
     score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
@@ -129,15 +127,9 @@ async def submit_quiz(
             if not quiz_update_success:
                 print(f"No se pudo actualizar el estado del quiz para el usuario {current_user['id']}")
             
-            # Actualizar monedas del usuario
-            game_progress = await get_game_progress(current_user["id"])
-            current_coins = game_progress.get("coins", 0) if game_progress else 0
-            
-            progress_update_success = await update_game_progress(
-                current_user["id"],
-                {"coins": current_coins + rewards}
-            )
-            if not progress_update_success:
+            # Actualizar monedas del usuario (incremento atómico, sin leer antes)
+            updated_progress = await add_coins(current_user["id"], rewards, reason="quiz_reward")
+            if updated_progress is None:
                 print(f"No se pudo actualizar el progreso del juego para el usuario {current_user['id']}")
         except Exception as e:
             print(f"Error al procesar recompensas del quiz: {e}")
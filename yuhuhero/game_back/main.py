@@ -1,6 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth, users, quiz, game, notifications
+from fastapi.responses import JSONResponse
+from app.routes import auth, users, quiz, game, notifications, metrics, events
+from app.core.config import settings
+from app.core.events import event_hub
+from app.core.hashing import HashingQueueFullError, password_hasher
+from app.config.database import database
+from app.db.event_broker import make_broker
+from app.db.indexes import ensure_indexes
+from app.db.leaderboard import leaderboard
+from app.db.level_bits import level_index
+from app.db.notification_archiver import notification_archiver
+from app.db.progress_buffer import progress_buffer
+from app.db.progress_compactor import progress_compactor
 
 app = FastAPI(
     title="YuhuHero API",
@@ -30,6 +42,43 @@ app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(quiz.router, prefix="/api/quiz", tags=["Quiz"])
 app.include_router(game.router, prefix="/api/game", tags=["Game"])
 app.include_router(notifications.router, prefix="/api/notifications", tags=["Notifications"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["Metrics"])
+app.include_router(events.router, prefix="/api/events", tags=["Events"])
+
+@app.on_event("startup")
+async def startup_services():
+    if settings.ENSURE_INDEXES_ON_STARTUP:
+        await ensure_indexes(database)
+    await event_hub.start(make_broker(database))
+    # Posiciones del bitset para las casillas del mapa (las usa también ?levels=compact)
+    await level_index.register_tiles(database, (tile.id for tile in game.DEFAULT_GAME_TILES))
+    if settings.PROGRESS_WRITE_BEHIND:
+        progress_buffer.start(database.game_progress)
+    if settings.PROGRESS_EVENT_LOG:
+        progress_compactor.start(database)
+    if settings.LEADERBOARD_IN_MEMORY:
+        leaderboard.start(database)
+    if settings.NOTIFICATIONS_ARCHIVE_AFTER_DAYS > 0:
+        notification_archiver.start(database)
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    # Escribir el progreso pendiente antes de salir
+    await progress_buffer.stop()
+    await progress_compactor.stop()
+    await leaderboard.stop()
+    await notification_archiver.stop()
+    await event_hub.stop()
+    password_hasher.shutdown()
+
+@app.exception_handler(HashingQueueFullError)
+async def hashing_queue_full_handler(request: Request, exc: HashingQueueFullError):
+    # El pool de bcrypt está saturado: pedir al cliente que reintente
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servicio ocupado, intenta de nuevo en unos segundos"},
+        headers={"Retry-After": "1"},
+    )
 
 @app.get("/")
 async def root():
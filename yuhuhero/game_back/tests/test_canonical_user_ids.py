@@ -0,0 +1,181 @@
+"""
+Migración canonical-user-ids sobre una base en memoria con el índice único de
+`game_progress.user_id`: un usuario con progreso bajo ambas formas de ID (ObjectId y string)
+se fusiona sin violar el índice.
+"""
+import asyncio
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.db.migrations.canonical_user_ids import migrate_canonical_user_ids
+
+TYPES = {"objectId": ObjectId, "string": str}
+
+
+def matches(doc, filter):
+    for field, condition in filter.items():
+        value = doc.get(field)
+        if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            for operator, operand in condition.items():
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$exists" and (field in doc) != operand:
+                    return False
+                if operator == "$type" and not isinstance(value, TYPES[operand]):
+                    return False
+                if operator == "$not" and matches(doc, {field: operand}):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    async def to_list(self, length):
+        return self.docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class MemoryCollection:
+    def __init__(self, unique=None):
+        self.docs = []
+        self.unique = unique
+
+    def _check_unique(self, doc):
+        if self.unique and any(
+            other is not doc and other.get(self.unique) == doc.get(self.unique) for other in self.docs
+        ):
+            raise DuplicateKeyError(f"E11000 duplicate key: {self.unique}", 11000)
+
+    def find(self, filter=None, projection=None):
+        return Cursor([dict(doc) for doc in self.docs if matches(doc, filter or {})])
+
+    async def find_one(self, filter, projection=None):
+        return next((dict(doc) for doc in self.docs if matches(doc, filter)), None)
+
+    async def count_documents(self, filter):
+        return len([doc for doc in self.docs if matches(doc, filter)])
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self.docs.append(dict(doc))
+
+    async def delete_one(self, filter):
+        for doc in self.docs:
+            if matches(doc, filter):
+                self.docs.remove(doc)
+                return
+
+    async def delete_many(self, filter):
+        self.docs = [doc for doc in self.docs if not matches(doc, filter)]
+
+    def _apply(self, doc, update):
+        changed = {**doc, **update.get("$set", {})}
+        for field in update.get("$unset", {}):
+            changed.pop(field, None)
+        self._check_unique(changed)
+        doc.clear()
+        doc.update(changed)
+
+    async def update_one(self, filter, update, upsert=False):
+        doc = next((doc for doc in self.docs if matches(doc, filter)), None)
+        if doc is None and upsert:
+            doc = {"_id": filter["_id"]}
+            self.docs.append(doc)
+        if doc is not None:
+            self._apply(doc, update)
+
+    async def update_many(self, filter, update):
+        targets = [doc for doc in self.docs if matches(doc, filter)]
+        for doc in targets:
+            self._apply(doc, update)
+        return SimpleNamespace(modified_count=len(targets))
+
+    async def bulk_write(self, requests, ordered=True):
+        errors = []
+        for index, request in enumerate(requests):
+            try:
+                await self.update_one(request._filter, request._doc)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": 0})
+
+    def aggregate(self, pipeline, **kwargs):
+        # Solo la agrupación por user_id (como string) que usa la migración
+        groups = {}
+        for doc in self.docs:
+            if doc.get("user_id") is not None:
+                groups.setdefault(str(doc["user_id"]), []).append(doc["_id"])
+        return Cursor([{"_id": key, "ids": ids} for key, ids in groups.items()])
+
+
+class MemoryDatabase:
+    def __init__(self):
+        self.users = MemoryCollection(unique="phone")
+        self.game_progress = MemoryCollection(unique="user_id")
+        self.notifications = MemoryCollection()
+        self.quiz_results = MemoryCollection()
+        self.migrations = MemoryCollection()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def test_merges_progress_stored_under_both_id_forms():
+    db = MemoryDatabase()
+    user_id = ObjectId()
+    db.users.docs.append({"_id": user_id, "phone": "5550001"})
+    db.users.docs.append({"_id": "legacy-1", "phone": "5550002"})
+    db.game_progress.docs += [
+        {"_id": ObjectId(), "user_id": user_id, "coins": 5, "current_level": 3, "completed_levels": ["a"]},
+        {"_id": ObjectId(), "user_id": str(user_id), "coins": 10, "current_level": 2, "completed_levels": ["b"]},
+        {"_id": ObjectId(), "user_id": "legacy-1", "coins": 7, "current_level": 1, "completed_levels": []},
+    ]
+    db.notifications.docs.append({"_id": ObjectId(), "user_id": "legacy-1"})
+
+    report = asyncio.run(migrate_canonical_user_ids(db))
+
+    assert report["progress_duplicates_merged"] == 1
+    legacy_id = str(next(user["_id"] for user in db.users.docs if user["phone"] == "5550002"))
+    progress = {doc["user_id"]: doc for doc in db.game_progress.docs}
+    assert set(progress) == {str(user_id), legacy_id}
+    assert progress[str(user_id)]["coins"] == 10
+    assert progress[str(user_id)]["current_level"] == 3
+    assert sorted(progress[str(user_id)]["completed_levels"]) == ["a", "b"]
+    assert db.notifications.docs[0]["user_id"] == legacy_id
+
+
+def test_rerun_is_a_no_op():
+    db = MemoryDatabase()
+    user_id = ObjectId()
+    db.users.docs.append({"_id": user_id, "phone": "5550001"})
+    db.game_progress.docs += [
+        {"_id": ObjectId(), "user_id": user_id, "coins": 5},
+        {"_id": ObjectId(), "user_id": str(user_id), "coins": 10},
+    ]
+    asyncio.run(migrate_canonical_user_ids(db))
+
+    report = asyncio.run(migrate_canonical_user_ids(db))
+
+    assert report["progress_duplicates_merged"] == 0
+    assert report["references_converted"] == 0
+    assert len(db.game_progress.docs) == 1
@@ -0,0 +1,145 @@
+"""
+Comandos de MongoDB por ruta de la API: escribir y responder no debe volver a leer
+lo recién escrito. La base es un doble que registra cada comando enviado.
+"""
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import app.db.database as database
+from app.api import dependencies
+from app.api.routes import auth
+from app.main import app
+
+USER_ID = ObjectId()
+USER = {"_id": USER_ID, "name": "Ana", "phone": "5550000", "role": "admin", "quizCompleted": False}
+
+
+class RecordingCollection:
+    """Colección en memoria (por `_id`) que anota cada comando en `db.commands`"""
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.docs = {}
+
+    def _record(self, command):
+        self.db.commands.append((self.name, command))
+
+    async def find_one(self, filter, projection=None):
+        self._record("find")
+        return self.docs.get(filter.get("_id"))
+
+    async def insert_one(self, document):
+        self._record("insert")
+        document.setdefault("_id", ObjectId())
+        self.docs[document["_id"]] = dict(document)
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    async def update_one(self, filter, update, upsert=False):
+        self._record("update")
+        if filter.get("_id") in self.docs or not upsert:
+            return SimpleNamespace(upserted_id=None)
+        document = {key: value for key, value in filter.items() if not isinstance(value, dict)}
+        document.update(update.get("$setOnInsert", {}), _id=ObjectId())
+        self.docs[document["_id"]] = document
+        return SimpleNamespace(upserted_id=document["_id"])
+
+    async def find_one_and_update(self, filter, update, projection=None, upsert=False, return_document=None):
+        self._record("findAndModify")
+        document = self.docs.get(filter.get("_id"))
+        if document is None:
+            if not upsert:
+                return None
+            document = {key: value for key, value in filter.items() if not isinstance(value, dict)}
+            document.setdefault("_id", ObjectId())
+            document.update(update.get("$setOnInsert", {}))
+        document.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            document[field] = document.get(field, 0) + amount
+        self.docs[document["_id"]] = document
+        return dict(document)
+
+
+class RecordingDatabase:
+    def __init__(self):
+        self.commands = []
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = RecordingCollection(self, name)
+        return self._collections[name]
+
+    __getattr__ = __getitem__
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = RecordingDatabase()
+    monkeypatch.setattr(database, "db", db)
+
+    async def fake_hash(password):
+        return "hash:" + password
+
+    monkeypatch.setattr(auth, "get_password_hash_async", fake_hash)
+    app.dependency_overrides[dependencies.get_current_user] = lambda: USER
+    app.dependency_overrides[dependencies.get_admin_user] = lambda: USER
+    yield db
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def client():
+    # Sin `with`: no se ejecuta el arranque (conexión, índices, tareas en segundo plano)
+    return TestClient(app)
+
+
+def test_register_checks_phone_and_inserts(db, client):
+    response = client.post("/api/auth/register", json={"name": "Ana", "phone": "5551234", "password": "secreta"})
+
+    assert response.status_code == 201
+    assert db.commands == [("users", "find"), ("users", "insert")]
+
+
+def test_create_notification_inserts_and_bumps_counter(db, client):
+    response = client.post(
+        "/api/notifications",
+        json={"user_id": str(USER_ID), "title": "Hola", "message": "Bienvenida", "type": "info"},
+    )
+
+    assert response.status_code == 201
+    assert db.commands == [("notifications", "insert"), ("notification_counters", "findAndModify")]
+
+
+def test_update_notification_is_one_find_and_modify(db, client):
+    notification_id = ObjectId()
+    db.notifications.docs[notification_id] = {
+        "_id": notification_id, "user_id": str(USER_ID), "title": "Hola", "message": "Bienvenida",
+        "type": "info", "read": False, "created_at": notification_id.generation_time.replace(tzinfo=None),
+    }
+
+    response = client.put(f"/api/notifications/{notification_id}", json={"read": True})
+
+    assert response.status_code == 200
+    assert response.json()["read"] is True
+    assert db.commands == [("notifications", "findAndModify"), ("notification_counters", "findAndModify")]
+
+
+def test_put_progress_is_one_find_and_modify(db, client):
+    response = client.put("/api/game/progress", json={"current_level": 2, "coins": 10})
+
+    assert response.status_code == 200
+    assert response.json()["coins"] == 10
+    # La entrada de `progress_changes` es la sincronización incremental, no una relectura
+    assert db.commands == [("game_progress", "findAndModify"), ("progress_changes", "insert")]
+
+
+def test_get_progress_seeds_with_one_write_and_returns_stored_version(db, client):
+    response = client.get("/api/game/progress")
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+    assert db.commands == [("game_progress", "find"), ("game_progress", "update"), ("progress_changes", "insert")]
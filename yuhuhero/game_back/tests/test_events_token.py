@@ -0,0 +1,42 @@
+"""El canal de eventos acepta en la URL solo el token de corta duración, nunca el de sesión"""
+import asyncio
+from datetime import timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.api.dependencies import get_current_user, get_stream_user
+from app.core.events import EVENTS_TOKEN_SCOPE
+from app.core.security import create_access_token
+from app.db.user_cache import cache_user
+
+USER_ID = str(ObjectId())
+SESSION_TOKEN = create_access_token(USER_ID)
+STREAM_TOKEN = create_access_token(USER_ID, timedelta(seconds=60), {"scope": EVENTS_TOKEN_SCOPE})
+
+
+@pytest.fixture(autouse=True)
+def cached_user():
+    # Desde la cache en proceso: la autenticación no va a MongoDB
+    cache_user(USER_ID, {"_id": ObjectId(USER_ID), "name": "Ana"})
+
+
+def authenticate(coro):
+    try:
+        return asyncio.run(coro)["_id"]
+    except HTTPException as e:
+        return e.status_code
+
+
+def test_query_string_accepts_only_stream_token():
+    assert authenticate(get_stream_user(token=None, access_token=STREAM_TOKEN)) == ObjectId(USER_ID)
+    assert authenticate(get_stream_user(token=None, access_token=SESSION_TOKEN)) == 401
+
+
+def test_header_accepts_session_token():
+    assert authenticate(get_stream_user(token=SESSION_TOKEN, access_token=None)) == ObjectId(USER_ID)
+
+
+def test_stream_token_is_not_a_session_token():
+    assert authenticate(get_current_user(STREAM_TOKEN)) == 401
@@ -0,0 +1,122 @@
+"""Árbol de ranking y ranking en memoria, contra una lista ordenada como referencia"""
+import asyncio
+import bisect
+import random
+from datetime import datetime
+from itertools import islice
+
+from app.core.rank_tree import RankTree
+from app.db.leaderboard import CATCH_UP_OVERLAP, Leaderboard
+
+
+def oracle_rank(coins, user_id):
+    """Posición por monedas con empates compartidos, calculada recorriendo todo"""
+    return 1 + sum(1 for amount in coins.values() if amount > coins.get(user_id, 0))
+
+
+def test_rank_tree_matches_sorted_list():
+    rng = random.Random(7)
+    tree, oracle = RankTree(), []
+    for step in range(3000):
+        # Pocas cantidades distintas: muchos empates en monedas, desempatados por user_id
+        key = (-rng.randint(0, 20), f"user{rng.randint(0, 300):03d}")
+        if rng.random() < 0.4 and oracle:
+            key = rng.choice(oracle)
+            assert tree.remove(key)
+            oracle.remove(key)
+        elif key not in oracle:
+            tree.insert(key)
+            bisect.insort(oracle, key)
+        else:
+            assert tree.remove((key[0], "missing")) is False
+
+        probe = (-rng.randint(0, 20), "")
+        assert tree.count_less(probe) == bisect.bisect_left(oracle, probe)
+        assert len(tree) == len(oracle)
+        if step % 100 == 0:
+            assert list(tree) == oracle
+            # Top-N: las primeras claves en orden (más monedas; empates por user_id)
+            assert list(islice(tree, 10)) == oracle[:10]
+
+
+def test_rank_tree_build_from_sorted_keys():
+    keys = sorted((-amount, f"user{index}") for index, amount in enumerate([5, 3, 5, 0, 9, 3]))
+    tree = RankTree(keys)
+
+    assert list(tree) == keys
+    assert tree.count_less((-5, "")) == 1  # Solo el de 9 monedas
+    assert tree.remove((-5, "user0"))
+    assert list(tree) == [key for key in keys if key != (-5, "user0")]
+
+
+class FakeRepository:
+    """iter_coins en memoria; `during_load` se llama a mitad de la carga"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.updated_since = []
+        self.during_load = None
+
+    def iter_coins(self, updated_since=None):
+        self.updated_since.append(updated_since)
+        return self._iterate()
+
+    async def _iterate(self):
+        for index, row in enumerate(self.rows):
+            if index == 1 and self.during_load is not None:
+                self.during_load()
+            yield dict(row)
+
+
+def loaded_leaderboard(coins):
+    board = Leaderboard()
+    board._repository = FakeRepository([{"user_id": user_id, "coins": amount} for user_id, amount in coins.items()])
+    asyncio.run(board.load())
+    return board
+
+
+def ranks(board, user_ids):
+    return {user_id: asyncio.run(board.rank(None, user_id))["rank"] for user_id in user_ids}
+
+
+def test_ties_share_a_rank():
+    coins = {"a": 10, "b": 30, "c": 10, "d": 0}
+    board = loaded_leaderboard(coins)
+
+    assert ranks(board, coins) == {user_id: oracle_rank(coins, user_id) for user_id in coins}
+    assert ranks(board, coins) == {"a": 2, "b": 1, "c": 2, "d": 4}
+
+
+def test_updates_move_a_player():
+    coins = {"a": 10, "b": 30, "c": 10}
+    board = loaded_leaderboard(coins)
+
+    board.record("c", 50)
+    board.record("e", 20)  # Jugador nuevo
+    coins.update(c=50, e=20)
+
+    assert ranks(board, coins) == {user_id: oracle_rank(coins, user_id) for user_id in coins}
+    assert asyncio.run(board.rank(None, "a"))["total_players"] == 4
+
+
+def test_write_during_load_wins_over_loaded_value():
+    board = Leaderboard()
+    board._repository = FakeRepository([{"user_id": "a", "coins": 10}, {"user_id": "b", "coins": 5}])
+    board._repository.during_load = lambda: board.record("b", 99)
+
+    asyncio.run(board.load())
+
+    assert ranks(board, ["a", "b"]) == {"a": 2, "b": 1}
+
+
+def test_catch_up_applies_other_workers_changes_from_watermark():
+    board = loaded_leaderboard({"a": 10, "b": 5})
+    watermark = board._watermark
+    board._repository.rows = [{"user_id": "b", "coins": 40}]
+
+    before = datetime.utcnow()
+    assert asyncio.run(board.catch_up()) == 1
+
+    assert board._repository.updated_since[-1] == watermark
+    assert board._watermark >= before - CATCH_UP_OVERLAP
+    assert ranks(board, ["a", "b"]) == {"a": 2, "b": 1}
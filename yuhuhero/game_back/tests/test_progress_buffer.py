@@ -0,0 +1,82 @@
+"""Write-behind del progreso: el lote en vuelo es visible y un reintento no duplica $inc"""
+import asyncio
+
+from pymongo.errors import AutoReconnect
+
+from app.db.progress_buffer import FLUSH_TOKEN_FIELD, ProgressWriteBuffer
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class ProgressCollection:
+    """`game_progress` en memoria; `fail_after_write` simula un timeout tras aplicar el lote"""
+
+    def __init__(self):
+        self.docs = {}
+        self.fail_after_write = False
+        self.on_write = None
+
+    def find(self, filter, projection=None):
+        return Cursor([
+            doc for user_id, doc in self.docs.items()
+            if user_id in filter["user_id"]["$in"] and doc.get(FLUSH_TOKEN_FIELD) == filter[FLUSH_TOKEN_FIELD]
+        ])
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.on_write is not None:
+            self.on_write()
+        for request in requests:
+            filter, update = request._filter, request._doc
+            doc = self.docs.setdefault(filter["user_id"], {"user_id": filter["user_id"], "coins": 0, "version": 0})
+            if doc.get(FLUSH_TOKEN_FIELD) == filter[FLUSH_TOKEN_FIELD]["$ne"]:
+                continue
+            for field, amount in update["$inc"].items():
+                doc[field] += amount
+            doc.update(update["$set"])
+        if self.fail_after_write:
+            self.fail_after_write = False
+            raise AutoReconnect("timeout")
+
+
+def make_buffer():
+    buffer = ProgressWriteBuffer()
+    buffer._collection = ProgressCollection()
+    return buffer, buffer._collection
+
+
+def test_retry_after_ambiguous_failure_does_not_apply_twice():
+    buffer, collection = make_buffer()
+    collection.fail_after_write = True
+    buffer.stage("u1", add_coins=5)
+
+    assert asyncio.run(buffer.flush()) == 0
+    buffer.stage("u1", add_coins=1)
+    asyncio.run(buffer.flush())  # Confirma el lote en vuelo (ya aplicado)
+    asyncio.run(buffer.flush())
+
+    assert collection.docs["u1"]["coins"] == 6
+    assert collection.docs["u1"]["version"] == 2
+
+
+def test_in_flight_batch_is_visible_to_reads():
+    buffer, collection = make_buffer()
+    buffer.stage("u1", add_coins=5)
+    seen = []
+    # Lectura mientras el bulk_write está en curso, antes de que llegue a MongoDB
+    collection.on_write = lambda: seen.append(buffer.overlay("u1", None)["coins"])
+
+    asyncio.run(buffer.flush())
+
+    assert seen == [5]
+    # Ya aplicado: el documento tiene el token y no se vuelve a sumar
+    assert buffer.overlay("u1", collection.docs["u1"])["coins"] == 5